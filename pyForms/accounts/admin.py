@@ -6,7 +6,7 @@ from .models import UserProfile
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
-    list_display = ('user', 'dark_mode', 'email_notifications', 'created_at')
-    list_filter = ('dark_mode', 'email_notifications', 'created_at')
+    list_display = ('user', 'dark_mode', 'email_notifications', 'notification_digest_minutes', 'created_at')
+    list_filter = ('dark_mode', 'email_notifications', 'notification_digest_minutes', 'created_at')
     search_fields = ('user__username', 'user__email', 'user__first_name', 'user__last_name')
     readonly_fields = ('created_at', 'updated_at')
\ No newline at end of file
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='notification_digest_minutes',
+            field=models.PositiveIntegerField(choices=[(0, 'Send every response immediately'), (5, 'Every 5 minutes'), (15, 'Every 15 minutes'), (60, 'Hourly'), (1440, 'Daily')], default=0, help_text='Group new-response emails into one summary per window'),
+        ),
+    ]
@@ -4,10 +4,22 @@ from django.db import models
 from django.db import models
 from django.contrib.auth.models import User
 
+DIGEST_CHOICES = [
+    (0, 'Send every response immediately'),
+    (5, 'Every 5 minutes'),
+    (15, 'Every 15 minutes'),
+    (60, 'Hourly'),
+    (1440, 'Daily'),
+]
+
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     dark_mode = models.BooleanField(default=False)
     email_notifications = models.BooleanField(default=True)
+    notification_digest_minutes = models.PositiveIntegerField(
+        choices=DIGEST_CHOICES, default=0,
+        help_text='Group new-response emails into one summary per window',
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -2,7 +2,70 @@ from django.contrib import admin
 
 # Register your models here.
 from django.contrib import admin
-from .models import Form, Question, Option, Response, Answer,Change
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import ValidationError
+from django import forms
+from .models import Form, Question, Option, Response, Answer, ChangeRollup, Notification
+from .pagination import EstimatedCountPaginator
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """Filter on a foreign key through the admin's autocomplete search instead of listing every related object
+
+    The related model's admin needs search_fields, as for autocomplete_fields.
+    """
+    template = 'admin/forms/autocomplete_filter.html'
+    
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f'{field_path}__{field.target_field.name}__exact'
+        super().__init__(field, request, params, model, model_admin, field_path)
+        value = self.used_parameters.get(self.lookup_kwarg)
+        value = value[-1] if isinstance(value, list) else value
+        if value is not None:
+            # The widget looks the object up by this value; the changelist turns this into ?e=1
+            try:
+                value = field.target_field.to_python(value)
+            except ValidationError as error:
+                raise IncorrectLookupParameters(error)
+        choice_field = forms.ModelChoiceField(
+            queryset=field.related_model._default_manager.all(),
+            widget=AutocompleteSelect(field, model_admin.admin_site, attrs={'data-lookup': self.lookup_kwarg}),
+            required=False,
+        )
+        # Renders only the selected object, if any
+        self.widget = choice_field.widget.render(f'autocomplete-{self.lookup_kwarg}', value)
+    
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+    
+    def choices(self, changelist):
+        yield {
+            'selected': self.lookup_kwarg not in self.used_parameters,
+            'query_string': changelist.get_query_string(remove=[self.lookup_kwarg]),
+            'display': 'All',
+        }
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelists for tables that grow with every submission
+
+    No COUNT(*) over the whole table (EstimatedCountPaginator, and no second
+    count for the "N total" link), no per-choice facet counts, and the media
+    of any autocomplete filters.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    
+    @property
+    def media(self):
+        media = super().media
+        if any(isinstance(list_filter, tuple) and issubclass(list_filter[1], AutocompleteFilter)
+               for list_filter in self.list_filter):
+            # The same scripts for every field
+            media += AutocompleteSelect(None, self.admin_site).media
+        return media
 
 class OptionInline(admin.TabularInline):
     model = Option
@@ -16,8 +79,9 @@ class QuestionInline(admin.TabularInline):
     readonly_fields = ('created_at',)
 
 @admin.register(Form)
-class FormAdmin(admin.ModelAdmin):
+class FormAdmin(LargeTableAdmin):
     list_display = ('title', 'user', 'is_published', 'response_count', 'created_at')
+    list_select_related = ('user',)
     list_filter = ('is_published', 'theme_color', 'created_at')
     search_fields = ('title', 'description', 'user__username', 'user__email')
     readonly_fields = ('uuid', 'created_at', 'updated_at', 'response_count')
@@ -45,10 +109,12 @@ class FormAdmin(admin.ModelAdmin):
     )
 
 @admin.register(Question)
-class QuestionAdmin(admin.ModelAdmin):
+class QuestionAdmin(LargeTableAdmin):
     list_display = ('text_preview', 'form', 'question_type', 'is_required', 'order')
-    list_filter = ('question_type', 'is_required', 'created_at')
+    list_select_related = ('form',)
+    list_filter = ('question_type', 'is_required', 'created_at', ('form', AutocompleteFilter))
     search_fields = ('text', 'help_text', 'form__title')
+    autocomplete_fields = ('form',)
     list_editable = ('order',)
     inlines = [OptionInline]
     
@@ -57,11 +123,16 @@ class QuestionAdmin(admin.ModelAdmin):
     text_preview.short_description = 'Question Text'
 
 @admin.register(Response)
-class ResponseAdmin(admin.ModelAdmin):
+class ResponseAdmin(LargeTableAdmin):
     list_display = ('form', 'respondent_name', 'respondent_email', 'submitted_at', 'ip_address')
-    list_filter = ('submitted_at', 'form')
+    list_select_related = ('form',)
+    list_filter = ('submitted_at', ('form', AutocompleteFilter))
     search_fields = ('respondent_name', 'respondent_email', 'form__title')
     readonly_fields = ('submitted_at', 'ip_address', 'user_agent')
+    autocomplete_fields = ('form',)
+    # Newest first by primary key; Meta.ordering's submitted_at has no index
+    # of its own, so it would sort the whole table for every page
+    ordering = ('-id',)
     
     fieldsets = (
         ('Response Information', {
@@ -74,10 +145,25 @@ class ResponseAdmin(admin.ModelAdmin):
     )
 
 @admin.register(Answer)
-class AnswerAdmin(admin.ModelAdmin):
+class AnswerAdmin(LargeTableAdmin):
     list_display = ('response', 'question_preview', 'display_answer', 'response_date')
-    list_filter = ('response__submitted_at', 'question__question_type')
+    # Response.__str__ shows the form title
+    list_select_related = ('response__form', 'question')
+    list_filter = ('response__submitted_at', 'question__question_type', ('response__form', AutocompleteFilter))
     search_fields = ('answer_text', 'question__text', 'response__respondent_name')
+    autocomplete_fields = ('response', 'question')
+    raw_id_fields = ('selected_options',)
+    
+    def get_ordering(self, request):
+        if 'response__form__id__exact' in request.GET:
+            # Walks response_form_recent_idx and each response's answers
+            # instead of sorting every answer to the form
+            return ('-response__submitted_at', '-response_id', '-id')
+        return ('-id',)
+    
+    def get_queryset(self, request):
+        # display_answer reads the options of every row
+        return super().get_queryset(request).prefetch_related('selected_options')
     
     def question_preview(self, obj):
         return obj.question.text[:30] + '...' if len(obj.question.text) > 30 else obj.question.text
@@ -87,12 +173,20 @@ class AnswerAdmin(admin.ModelAdmin):
         return obj.response.submitted_at
     response_date.short_description = 'Response Date'
     
-@admin.register(Change)
-class ChangeAdmin(admin.ModelAdmin):
-    list_display = ('id', 'change_date')
-    list_filter = ('change_date',)
+@admin.register(ChangeRollup)
+class ChangeRollupAdmin(admin.ModelAdmin):
+    list_display = ('change_date', 'form', 'count')
+    list_select_related = ('form',)
     date_hierarchy = 'change_date'
     ordering = ('-change_date',)
+    readonly_fields = ('form', 'change_date', 'count')
+
+@admin.register(Notification)
+class NotificationAdmin(LargeTableAdmin):
+    list_display = ('subject', 'recipient', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('recipient', 'subject')
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
 
 # Customize admin site header
 admin.site.site_header = 'pyForms Administration'
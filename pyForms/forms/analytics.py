@@ -0,0 +1,205 @@
+from collections import Counter
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+from .counters import ANSWERED, counter_tallies, option_key, stored_counts, value_key
+from .models import Answer, AnswerCounter, Form
+from .schema import CHOICE_QUESTION_TYPES, get_form_schema, schema_version
+from .stats import ScaleStats
+from .text_index import VALUE_TALLY_LIMIT, top_terms
+
+# Text answers shown per question on the analytics page
+TEXT_SAMPLE_SIZE = 10
+
+# Seconds a computed payload stays cached; new responses change the key anyway
+ANALYTICS_CACHE_TIMEOUT = getattr(settings, 'FORM_ANALYTICS_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def option_tallies(form_obj):
+    """Times each option was selected, for every choice question of the form (one query)
+
+    Legacy selections of another question's option are left out, as they
+    are when answers are counted on submission.
+    """
+    through = Answer.selected_options.through
+    rows = (
+        through.objects
+        .filter(answer__question__form=form_obj, option__question=F('answer__question'))
+        .values('option_id')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    return {row['option_id']: row['count'] for row in rows}
+
+
+def scale_tallies(form_obj):
+    """Answer counts keyed by (question id, value) for every linear scale question (one query)"""
+    rows = (
+        Answer.objects
+        .filter(question__form=form_obj, answer_number__isnull=False)
+        .values('question_id', 'answer_number')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    return {(row['question_id'], row['answer_number']): row['count'] for row in rows}
+
+
+def text_samples(form_obj, limit=TEXT_SAMPLE_SIZE):
+    """The first `limit` non-empty text answers of every question (one query)"""
+    rows = (
+        Answer.objects
+        .filter(question__form=form_obj)
+        .exclude(question__question_type__in=CHOICE_QUESTION_TYPES + ('linear_scale',))
+        .exclude(Q(answer_text__isnull=True) | Q(answer_text=''))
+        .annotate(position=Window(RowNumber(), partition_by=F('question_id'), order_by=F('id').asc()))
+        .filter(position__lte=limit)
+        .order_by('question_id', 'position')
+        .values_list('question_id', 'answer_text')
+    )
+    samples = {}
+    for question_id, answer_text in rows:
+        samples.setdefault(question_id, []).append(answer_text)
+    return samples
+
+
+def question_scale_stats(question, scale_counts):
+    return ScaleStats.from_counts(question.scale_min, question.scale_max, {
+        value: scale_counts.get((question.id, value), 0) for value in question.scale_values
+    })
+
+
+def build_analytics_data(schema, option_counts, scale_counts, samples, terms=None):
+    """Shape tallies into the per-question dict the analytics template expects"""
+    analytics_data = {}
+    for question in schema.questions:
+        if question.question_type in CHOICE_QUESTION_TYPES:
+            analytics_data[question.id] = {
+                'type': 'chart',
+                'question': question.text,
+                'data': {option.text: option_counts.get(option.id, 0) for option in question.options},
+            }
+        elif question.question_type == 'linear_scale':
+            analytics_data[question.id] = {
+                'type': 'chart',
+                'question': question.text,
+                'data': {str(i): scale_counts.get((question.id, i), 0) for i in question.scale_values},
+                'stats': question_scale_stats(question, scale_counts).as_dict(),
+            }
+        else:
+            index = (terms or {}).get(question.id, {})
+            distinct_values = index.get('distinct_values', 0)
+            analytics_data[question.id] = {
+                'type': 'text',
+                'question': question.text,
+                'answers': samples.get(question.id, []),
+                'terms': index.get('term', []),
+                'bigrams': index.get('bigram', []),
+                'distinct_values': distinct_values,
+                # Exact tallies only make sense for questions like "department"
+                'values': index.get('value', []) if 0 < distinct_values <= VALUE_TALLY_LIMIT else [],
+            }
+    return analytics_data
+
+
+def form_analytics_data(form_obj):
+    """Per-question analytics for a form
+
+    Option and scale tallies come from the materialized counters (one query
+    over O(questions) rows), top terms from the text index (three queries) and
+    text samples from one window query, plus the schema when it is not cached.
+    """
+    option_counts, scale_counts = counter_tallies(form_obj)
+    return build_analytics_data(
+        get_form_schema(form_obj),
+        option_counts,
+        scale_counts,
+        text_samples(form_obj),
+        top_terms(form_obj),
+    )
+
+
+def touch_analytics(form_id):
+    """Move the form's analytics version on, e.g. after responses are deleted
+
+    The newest response id does not change when an older response is
+    deleted, so the ETag carries this too. It is a column rather than a
+    cache entry so that every process, including export workers, agrees on it.
+    """
+    Form.objects.filter(pk=form_id).update(analytics_version=F('analytics_version') + 1)
+
+
+def analytics_etag(form_obj):
+    """Version of the form's analytics: newest response, schema version and analytics_version (one query)"""
+    last_response_id = form_obj.responses.order_by('-id').values_list('id', flat=True).first() or 0
+    return f'{last_response_id}-{schema_version(form_obj)}-{form_obj.analytics_version}'
+
+
+def cached_analytics_data(form_obj, etag=None):
+    """form_analytics_data, computed once per analytics version"""
+    key = f'form_analytics:{form_obj.uuid}:{etag or analytics_etag(form_obj)}'
+    analytics_data = cache.get(key)
+    if analytics_data is None:
+        analytics_data = form_analytics_data(form_obj)
+        cache.set(key, analytics_data, ANALYTICS_CACHE_TIMEOUT)
+    return analytics_data
+
+
+def scale_stats_data(form_obj):
+    """Summary statistics for every linear scale question, read from the counters"""
+    _, scale_counts = counter_tallies(form_obj)
+    return {
+        question.id: {'question': question.text, **question_scale_stats(question, scale_counts).as_dict()}
+        for question in get_form_schema(form_obj).questions
+        if question.question_type == 'linear_scale'
+    }
+
+
+def recount(form_obj):
+    """What the form's AnswerCounter rows should hold, computed from Answer"""
+    counts = Counter()
+    answered = (
+        Answer.objects
+        .filter(question__form=form_obj)
+        .values('question_id')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    for row in answered:
+        counts[row['question_id'], ANSWERED] = row['count']
+
+    option_map = get_form_schema(form_obj).option_map
+    for option_id, count in option_tallies(form_obj).items():
+        question_id = option_map.get(option_id)
+        if question_id is not None:
+            counts[question_id, option_key(option_id)] = count
+
+    for (question_id, value), count in scale_tallies(form_obj).items():
+        counts[question_id, value_key(value)] = count
+    return counts
+
+
+def check_counters(form_obj):
+    """Differences between stored counters and a full recount, as {(question id, key): (stored, actual)}"""
+    stored = stored_counts(form_obj)
+    actual = recount(form_obj)
+    return {
+        pair: (stored.get(pair, 0), actual.get(pair, 0))
+        for pair in stored.keys() | actual.keys()
+        if stored.get(pair, 0) != actual.get(pair, 0)
+    }
+
+
+def rebuild_counters(form_obj):
+    """Replace the form's counters with a full recount
+
+    Submissions that land while this runs may be missed; run it when the
+    form is quiet and confirm with check_counters.
+    """
+    with transaction.atomic():
+        AnswerCounter.objects.filter(question__form=form_obj).delete()
+        AnswerCounter.objects.bulk_create([
+            AnswerCounter(question_id=question_id, key=key, count=count)
+            for (question_id, key), count in recount(form_obj).items()
+        ])
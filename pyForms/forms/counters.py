@@ -0,0 +1,125 @@
+"""Materialized per-question answer tallies
+
+Every saved submission adds to AnswerCounter rows in the same transaction and
+deleting a response or a single answer takes it back out, so analytics can read
+O(questions) rows instead of scanning Answer. ``manage.py
+rebuild_analytics_counters`` recomputes them from scratch or checks them
+against a full recount (see forms.analytics).
+"""
+from collections import Counter, defaultdict
+from django.db.models import Case, F, Q, Value, When
+from .models import Answer, AnswerCounter
+
+ANSWERED = 'answered'
+
+# Counter keys written per INSERT/UPDATE pair
+UPDATE_CHUNK_SIZE = 500
+
+
+def option_key(option_id):
+    return f'option:{option_id}'
+
+
+def value_key(value):
+    return f'value:{value}'
+
+
+def answer_keys(answer_number, option_ids):
+    """The counter keys a single answer contributes to"""
+    keys = [ANSWERED]
+    keys.extend(option_key(option_id) for option_id in option_ids)
+    if answer_number is not None:
+        keys.append(value_key(answer_number))
+    return keys
+
+
+def answer_deltas(answers, sign=1):
+    """Counter of (question id, key) -> n for (question id, answer_number, option ids) triples"""
+    deltas = Counter()
+    for question_id, answer_number, option_ids in answers:
+        for key in answer_keys(answer_number, option_ids):
+            deltas[question_id, key] += sign
+    return deltas
+
+
+def apply_counts(model, fields, deltas):
+    """Add a Counter of key tuple -> n to a counter table with a `count` column
+
+    `fields` names the model fields making up each key tuple, in order, and
+    must match a unique constraint. Missing rows are inserted at zero, then a
+    single UPDATE adds each row's delta with a CASE expression; keys are
+    processed UPDATE_CHUNK_SIZE at a time, so a normal submission costs two
+    queries whatever its size.
+    """
+    deltas = [(key, n) for key, n in deltas.items() if n]
+    for start in range(0, len(deltas), UPDATE_CHUNK_SIZE):
+        chunk = deltas[start:start + UPDATE_CHUNK_SIZE]
+        model.objects.bulk_create(
+            [model(**dict(zip(fields, key))) for key, _ in chunk],
+            ignore_conflicts=True,
+        )
+
+        # One WHEN per (key prefix, delta) keeps the statement small for large batches
+        *prefix_fields, last_field = fields
+        grouped = defaultdict(list)
+        for key, n in chunk:
+            grouped[key[:-1], n].append(key[-1])
+        whens = [
+            When(**dict(zip(prefix_fields, prefix)), **{f'{last_field}__in': values}, then=Value(n))
+            for (prefix, n), values in grouped.items()
+        ]
+        model.objects.filter(**{
+            f'{field}__in': {key[i] for key, _ in chunk} for i, field in enumerate(fields)
+        }).update(count=F('count') + Case(*whens, default=Value(0)))
+
+
+def apply_deltas(deltas):
+    """Add a Counter of (question id, key) -> n to the stored AnswerCounter rows"""
+    apply_counts(AnswerCounter, ('question_id', 'key'), deltas)
+
+
+def removed_answer_deltas(answers):
+    """Counter of (question id, key) -> -n taking back the answers of an Answer queryset"""
+    through = Answer.selected_options.through
+    options = defaultdict(list)
+    # Selections of another question's option were never counted
+    selections = through.objects.filter(answer__in=answers, option__question=F('answer__question'))
+    for answer_id, option_id in selections.values_list('answer_id', 'option_id'):
+        options[answer_id].append(option_id)
+
+    return answer_deltas(
+        (
+            (question_id, answer_number, options.get(answer_id, ()))
+            for answer_id, question_id, answer_number in answers.values_list('id', 'question_id', 'answer_number')
+        ),
+        sign=-1,
+    )
+
+
+def response_deltas(responses):
+    """Counter of (question id, key) -> -n taking back the answers of a Response queryset"""
+    return removed_answer_deltas(Answer.objects.filter(response__in=responses))
+
+
+def stored_counts(form_obj):
+    return Counter({
+        (question_id, key): count
+        for question_id, key, count in AnswerCounter.objects.filter(question__form=form_obj).values_list('question_id', 'key', 'count')
+        if count
+    })
+
+
+def counter_tallies(form_obj):
+    """Option and scale tallies in the shape of option_tallies/scale_tallies, read from the counters (one query)"""
+    option_counts = {}
+    scale_counts = {}
+    rows = AnswerCounter.objects.filter(question__form=form_obj).filter(
+        Q(key__startswith='option:') | Q(key__startswith='value:')
+    ).values_list('question_id', 'key', 'count')
+    for question_id, key, count in rows:
+        kind, _, value = key.partition(':')
+        if kind == 'option':
+            option_counts[int(value)] = count
+        else:
+            scale_counts[question_id, int(value)] = count
+    return option_counts, scale_counts
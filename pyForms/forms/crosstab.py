@@ -0,0 +1,229 @@
+"""Cross-tabulation of two choice questions
+
+Each question's ticked options are read in one query as a flat column of
+integer codes (response id * number of options + option position), so the
+database does the option lookup and no per-row tuples are built. With NumPy
+the codes are split with divmod, joined on response id (a lookup table
+indexed by response id, or sort + searchsorted for checkboxes) and counted
+with bincount; without it a dict-of-lists join into a flat array of counters
+does the same work. Checkbox questions count every pair of options a
+respondent ticked.
+"""
+import math
+from django.db import connections
+from django.db.models import Case, F, Value, When
+from .models import Answer
+from .schema import CHOICE_QUESTION_TYPES, get_form_schema
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class CrosstabError(ValueError):
+    pass
+
+
+def fetch_codes(question_id, option_ids, use_numpy=False):
+    """[response id * len(option_ids) + option position] for every option ticked on the question (one query)
+
+    Read through answer_question_response_idx. Options no longer on the
+    question are left out by the query. With use_numpy the codes come back
+    as an int64 array.
+    """
+    if not option_ids:
+        return np.empty(0, dtype=np.int64) if use_numpy else []
+    through = Answer.selected_options.through
+    # Unknown options map to NULL, filtered out after the join rather than
+    # probing the through table once per option
+    position = Case(*(When(option_id=option_id, then=Value(i)) for i, option_id in enumerate(option_ids)))
+    codes = (
+        through.objects
+        .filter(answer__question_id=question_id)
+        .annotate(code=F('answer__response_id') * len(option_ids) + position)
+        .filter(code__isnull=False)
+        .values_list('code', flat=True)
+        .order_by()
+    )
+    # Straight off the cursor: iterating a million rows through the ORM costs
+    # about as much as running the query
+    sql, params = codes.query.sql_with_params()
+    with connections[codes.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        if use_numpy:
+            return np.fromiter((code for (code,) in cursor), dtype=np.int64)
+        return [code for (code,) in cursor.fetchall()]
+
+
+def _count_python(row_codes, col_codes, num_rows, num_cols):
+    cols_by_response = {}
+    for code in col_codes:
+        response_id, col = divmod(code, num_cols)
+        cols_by_response.setdefault(response_id, []).append(col)
+
+    flat = [0] * (num_rows * num_cols)
+    for code in row_codes:
+        response_id, row = divmod(code, num_rows)
+        base = row * num_cols
+        for col in cols_by_response.get(response_id, ()):
+            flat[base + col] += 1
+    return [flat[i:i + num_cols] for i in range(0, len(flat), num_cols)]
+
+
+def _join_numpy(row_responses, row_positions, col_responses, col_positions):
+    """Pairs of (row position, column position) answered by the same response"""
+    low = min(row_responses.min(), col_responses.min())
+    span = int(max(row_responses.max(), col_responses.max()) - low) + 1
+    if span <= 4 * (len(row_responses) + len(col_responses)):
+        # Dense ids: when every response answered the column question at most
+        # once (single choice), a lookup table indexed by response id is the join
+        if np.bincount(col_responses - low, minlength=span).max() <= 1:
+            lookup = np.full(span, -1, dtype=np.int64)
+            lookup[col_responses - low] = col_positions
+            joined_cols = lookup[row_responses - low]
+            matched = joined_cols >= 0
+            return row_positions[matched], joined_cols[matched]
+
+    # General case (checkboxes, sparse ids): sort both sides, then join every
+    # row answer with the run of column answers from the same response
+    order = np.argsort(row_responses, kind='stable')
+    row_responses, row_positions = row_responses[order], row_positions[order]
+    order = np.argsort(col_responses, kind='stable')
+    col_responses, col_positions = col_responses[order], col_positions[order]
+    start = np.searchsorted(col_responses, row_responses, 'left')
+    matches = np.searchsorted(col_responses, row_responses, 'right') - start
+    total = int(matches.sum())
+    first = np.repeat(start - (np.cumsum(matches) - matches), matches)
+    return np.repeat(row_positions, matches), col_positions[first + np.arange(total)]
+
+
+def _count_numpy(row_codes, col_codes, num_rows, num_cols):
+    row_responses, row_positions = np.divmod(np.asarray(row_codes, dtype=np.int64), num_rows)
+    col_responses, col_positions = np.divmod(np.asarray(col_codes, dtype=np.int64), num_cols)
+    joined_rows, joined_cols = _join_numpy(row_responses, row_positions, col_responses, col_positions)
+    counts = np.bincount(joined_rows * num_cols + joined_cols, minlength=num_rows * num_cols)
+    return counts.reshape(num_rows, num_cols).tolist()
+
+
+def contingency_table(row_codes, col_codes, num_rows, num_cols, use_numpy=None):
+    """Counts as a list of num_rows rows, from the fetch_codes of both questions"""
+    if not len(row_codes) or not len(col_codes):
+        return [[0] * num_cols for _ in range(num_rows)]
+    if use_numpy is None:
+        use_numpy = np is not None
+    if use_numpy:
+        return _count_numpy(row_codes, col_codes, num_rows, num_cols)
+    return _count_python(row_codes, col_codes, num_rows, num_cols)
+
+
+def chi_square_p_value(chi2, dof):
+    """Upper tail of the chi-square distribution, Q(dof / 2, chi2 / 2)"""
+    if dof <= 0:
+        return None
+    a, x = dof / 2, chi2 / 2
+    if x <= 0:
+        return 1.0
+    log_prefix = a * math.log(x) - x - math.lgamma(a)
+    if x < a + 1:
+        # Series for the lower tail
+        term = total = 1 / a
+        n = a
+        for _ in range(1000):
+            n += 1
+            term *= x / n
+            total += term
+            if abs(term) < abs(total) * 1e-15:
+                break
+        return max(0.0, 1 - total * math.exp(log_prefix))
+    # Continued fraction for the upper tail (modified Lentz)
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    for i in range(1, 1000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return min(1.0, math.exp(log_prefix) * h)
+
+
+def chi_square(counts):
+    """Pearson's chi-square test of independence, ignoring empty rows and columns"""
+    row_totals = [sum(row) for row in counts]
+    col_totals = [sum(col) for col in zip(*counts)] if counts else []
+    total = sum(row_totals)
+    rows = [i for i, n in enumerate(row_totals) if n]
+    cols = [j for j, n in enumerate(col_totals) if n]
+    if not total or len(rows) < 2 or len(cols) < 2:
+        return {'chi2': None, 'dof': 0, 'p_value': None, 'cramers_v': None}
+
+    chi2 = 0.0
+    for i in rows:
+        for j in cols:
+            expected = row_totals[i] * col_totals[j] / total
+            chi2 += (counts[i][j] - expected) ** 2 / expected
+    dof = (len(rows) - 1) * (len(cols) - 1)
+    return {
+        'chi2': chi2,
+        'dof': dof,
+        'p_value': chi_square_p_value(chi2, dof),
+        'cramers_v': math.sqrt(chi2 / (total * (min(len(rows), len(cols)) - 1))),
+    }
+
+
+def row_percentages(counts, row_totals):
+    return [[round(100 * count / total, 2) if total else 0.0 for count in row] for row, total in zip(counts, row_totals)]
+
+
+def column_percentages(counts, col_totals):
+    return [[round(100 * count / total, 2) if total else 0.0 for count, total in zip(row, col_totals)] for row in counts]
+
+
+def build_crosstab(form_obj, row_question_id, col_question_id, use_numpy=None):
+    """Contingency table, percentages and chi-square for two choice questions of a form"""
+    schema = get_form_schema(form_obj)
+    row_question = schema.question(row_question_id)
+    col_question = schema.question(col_question_id)
+    for question in (row_question, col_question):
+        if question is None or question.question_type not in CHOICE_QUESTION_TYPES:
+            raise CrosstabError('Both questions must be choice questions of this form')
+    if row_question.id == col_question.id:
+        raise CrosstabError('Pick two different questions')
+
+    if use_numpy is None:
+        use_numpy = np is not None
+    row_option_ids = [option.id for option in row_question.options]
+    col_option_ids = [option.id for option in col_question.options]
+    counts = contingency_table(
+        fetch_codes(row_question.id, row_option_ids, use_numpy),
+        fetch_codes(col_question.id, col_option_ids, use_numpy),
+        len(row_option_ids),
+        len(col_option_ids),
+        use_numpy,
+    )
+    row_totals = [sum(row) for row in counts]
+    col_totals = [sum(col) for col in zip(*counts)] if counts else [0] * len(col_question.options)
+    stats = chi_square(counts)
+    return {
+        'rows': {'question_id': row_question.id, 'question': row_question.text,
+                 'labels': [option.text for option in row_question.options]},
+        'columns': {'question_id': col_question.id, 'question': col_question.text,
+                    'labels': [option.text for option in col_question.options]},
+        'counts': counts,
+        'row_totals': row_totals,
+        'column_totals': col_totals,
+        'total': sum(row_totals),
+        'row_percentages': row_percentages(counts, row_totals),
+        'column_percentages': column_percentages(counts, col_totals),
+        'chi_square': {key: (round(value, 6) if isinstance(value, float) else value) for key, value in stats.items()},
+    }
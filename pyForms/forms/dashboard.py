@@ -0,0 +1,80 @@
+"""Per-user dashboard totals: forms, published forms and responses
+
+The totals live in one DashboardStats row per user. Submissions and response
+deletes shift total_responses with an F() update in their own transaction;
+creating, publishing or deleting a form recounts the row with a single
+UPDATE whose values are aggregate subqueries, so the count and the write
+cannot be split by a concurrent submission. A missing row is counted on first use, so the dashboard
+header never scans the user's forms itself.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from .models import DashboardStats, Form
+
+
+def count_dashboard_stats(user_id):
+    """The totals counted from scratch, in one aggregate query"""
+    return Form.objects.filter(user_id=user_id).aggregate(
+        total_forms=Count('id'),
+        published_forms=Count('id', filter=Q(is_published=True)),
+        total_responses=Coalesce(Sum('response_count'), 0),
+    )
+
+
+def _forms_total(aggregate):
+    """`aggregate` over the forms of the DashboardStats row being updated"""
+    per_user = (
+        Form.objects
+        .filter(user_id=OuterRef('user_id'))
+        .order_by()
+        .values('user_id')
+        .annotate(total=aggregate)
+        .values('total')
+    )
+    return Coalesce(Subquery(per_user), 0)
+
+
+def refresh_dashboard_stats(user_id):
+    """Recount a user's stored totals in one UPDATE; a user without a row yet is counted on first use instead
+
+    Reading the counts first and writing them back would overwrite the
+    F() increments of submissions committed in between.
+    """
+    return DashboardStats.objects.filter(user_id=user_id).update(
+        total_forms=_forms_total(Count('id')),
+        published_forms=_forms_total(Count('id', filter=Q(is_published=True))),
+        total_responses=_forms_total(Sum('response_count')),
+    )
+
+
+def dashboard_stats(user):
+    """The user's DashboardStats row, counted and stored the first time"""
+    stats = DashboardStats.objects.filter(user=user).first()
+    if stats is not None:
+        return stats
+    try:
+        with transaction.atomic():
+            return DashboardStats.objects.create(user=user, **count_dashboard_stats(user.pk))
+    except IntegrityError:
+        # Another request stored it first
+        return DashboardStats.objects.get(user=user)
+
+
+def add_responses(form_id, count):
+    """Shift the form owner's response total; a missing row is counted when next needed"""
+    DashboardStats.objects.filter(user__created_forms=form_id).update(total_responses=F('total_responses') + count)
+
+
+def check_dashboard_stats(user_id):
+    """{total name: (stored, actual)} for stored totals that disagree with a recount"""
+    stored = (
+        DashboardStats.objects
+        .filter(user_id=user_id)
+        .values('total_forms', 'published_forms', 'total_responses')
+        .first()
+    )
+    if stored is None:
+        return {}
+    actual = count_dashboard_stats(user_id)
+    return {name: (stored[name], actual[name]) for name in actual if stored[name] != actual[name]}
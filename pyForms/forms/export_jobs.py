@@ -0,0 +1,243 @@
+"""Background exports written to disk by the run_export_jobs worker
+
+An owner asks for an export and gets an ExportJob; the worker claims pending
+jobs (at most EXPORT_MAX_WORKERS running at a time across every worker, each
+worker running its share in a local process pool) and
+streams each one through the EXPORT_FORMATS writers into a file under
+EXPORT_ROOT, recording how many responses are written as it goes. A finished
+export is handed out again for as long as its data_version matches the
+form's data_version, i.e. until a response is added or removed or the
+form's questions change.
+"""
+import os
+import re
+from datetime import timedelta
+from pathlib import Path
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+from .analytics import analytics_etag
+from .exports import EXPORT_FORMATS, iter_responses
+from .models import ExportJob
+from .schema import get_form_schema
+
+# Exports running at once, counted in the database across every
+# run_export_jobs process; the rest wait as pending jobs, so a burst of
+# export requests cannot take every CPU and database connection away from
+# submissions
+MAX_WORKERS = getattr(settings, 'EXPORT_MAX_WORKERS', 2)
+
+# Responses between two progress updates
+PROGRESS_EVERY = 1000
+
+# A running job not updated for this long belonged to a worker that died
+STALE_SECONDS = 10 * 60
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def export_root():
+    return Path(getattr(settings, 'EXPORT_ROOT', Path(settings.BASE_DIR) / 'exports'))
+
+
+def job_file(job):
+    return export_root() / job.file_path if job.file_path else None
+
+
+def data_version(form_obj):
+    """What an export of the form reflects, read from the database only
+
+    The web process and the worker processes compute this independently, so
+    nothing here may come from a per-process cache.
+    """
+    return f'{form_obj.response_count}-{analytics_etag(form_obj)}'
+
+
+def request_export(form_obj, export_format):
+    """(job, reused): the job already queued or still current for this export, or a new pending one"""
+    version = data_version(form_obj)
+    job = (
+        ExportJob.objects
+        .filter(form=form_obj, export_format=export_format)
+        .filter(
+            Q(status='pending')
+            # A job just claimed has not recorded its data version yet
+            | Q(status='running', data_version__in=[version, ''])
+            | Q(status='done', data_version=version)
+        )
+        .order_by('-created_at', '-id')
+        .first()
+    )
+    if job is not None and (job.status != 'done' or job_file(job).exists()):
+        return job, True
+    return ExportJob.objects.create(form=form_obj, export_format=export_format), False
+
+
+def job_status(job):
+    """What the responses page polls for"""
+    return {
+        'id': job.pk,
+        'format': job.export_format,
+        'status': job.status,
+        'written': job.written,
+        'total': job.total,
+        'progress': job.progress,
+        'file_size': job.file_size,
+        'error': job.last_error if job.status == 'failed' else None,
+        'status_url': reverse('export_job_status', args=[job.pk]),
+        'download_url': reverse('export_job_download', args=[job.pk]) if job.status == 'done' else None,
+    }
+
+
+def claim_jobs(limit, max_running=MAX_WORKERS):
+    """Mark pending jobs as running, oldest first, and return their ids
+
+    At most `limit` jobs are claimed, and never so many that more than
+    `max_running` would be running across every run_export_jobs process. The
+    queued and running rows are locked before counting, so two runners
+    claiming at the same moment take turns instead of both seeing the same
+    free slots.
+    """
+    if limit <= 0:
+        return []
+    with transaction.atomic():
+        queue = list(
+            ExportJob.objects
+            .select_for_update()
+            .filter(status__in=['pending', 'running'])
+            .order_by('created_at', 'id')
+            .values_list('id', 'status')
+        )
+        free = min(limit, max_running - sum(status == 'running' for _, status in queue))
+        job_ids = [job_id for job_id, status in queue if status == 'pending'][:max(free, 0)]
+        if job_ids:
+            ExportJob.objects.filter(pk__in=job_ids).update(status='running', updated_at=timezone.now())
+    return job_ids
+
+
+def requeue_stale_jobs(exclude=()):
+    """Put running jobs whose worker stopped reporting back in the queue"""
+    cutoff = timezone.now() - timedelta(seconds=STALE_SECONDS)
+    return (
+        ExportJob.objects
+        .filter(status='running', updated_at__lt=cutoff)
+        .exclude(pk__in=list(exclude))
+        .update(status='pending', data_version='', written=0, updated_at=timezone.now())
+    )
+
+
+class _Progress:
+    """Counts responses on their way to the writer, saving the count every PROGRESS_EVERY"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.written = 0
+
+    def track(self, responses):
+        for response in responses:
+            yield response
+            self.written += 1
+            if self.written % PROGRESS_EVERY == 0:
+                ExportJob.objects.filter(pk=self.job_id).update(written=self.written, updated_at=timezone.now())
+
+
+def _fail(job_id, error):
+    now = timezone.now()
+    ExportJob.objects.filter(pk=job_id).update(status='failed', last_error=error, finished_at=now, updated_at=now)
+
+
+def run_export(job_id):
+    """Write one claimed job's export to disk; runs in a worker process
+
+    The file is written as <name>.part and renamed once complete, so a
+    download never sees half an export. Returns whether the job succeeded.
+    """
+    close_old_connections()
+    job = ExportJob.objects.select_related('form').get(pk=job_id)
+    form_obj = job.form
+    export = EXPORT_FORMATS.get(job.export_format)
+    if export is None:
+        _fail(job.pk, f'Unknown export format "{job.export_format}"')
+        return False
+
+    # Taken before reading, so responses arriving meanwhile make the file stale rather than missing
+    job.data_version = data_version(form_obj)
+    job.total = form_obj.response_count
+    job.written = 0
+    job.save(update_fields=['data_version', 'total', 'written', 'updated_at'])
+
+    relative = Path(str(form_obj.uuid)) / f'{job.pk}.{export.extension}'
+    path = export_root() / relative
+    partial = path.with_name(path.name + '.part')
+    progress = _Progress(job.pk)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        responses = progress.track(iter_responses(form_obj, typed=export.typed))
+        with open(partial, 'wb') as out:
+            for chunk in export.stream(form_obj, get_form_schema(form_obj).questions, responses):
+                out.write(chunk.encode() if isinstance(chunk, str) else chunk)
+        os.replace(partial, path)
+    except Exception as e:
+        partial.unlink(missing_ok=True)
+        _fail(job.pk, str(e))
+        return False
+
+    now = timezone.now()
+    ExportJob.objects.filter(pk=job.pk).update(
+        status='done',
+        written=progress.written,
+        total=progress.written,
+        file_path=relative.as_posix(),
+        file_size=path.stat().st_size,
+        finished_at=now,
+        updated_at=now,
+    )
+    # Earlier exports of the same kind are superseded; their files go with them (see signals)
+    superseded = ExportJob.objects.filter(form=form_obj, export_format=job.export_format, status='done')
+    for old_job in superseded.exclude(pk=job.pk):
+        old_job.delete()
+    return True
+
+
+def process_export_jobs(executor, running, max_workers=MAX_WORKERS):
+    """One pass of the worker loop: reap finished jobs and start pending ones
+
+    `running` maps job ids to the futures of jobs this worker started and is
+    updated in place. Returns the number of jobs started.
+    """
+    for job_id, future in list(running.items()):
+        if future.done():
+            del running[job_id]
+    requeue_stale_jobs(exclude=running)
+    job_ids = claim_jobs(max_workers - len(running), max_workers)
+    for job_id in job_ids:
+        running[job_id] = executor.submit(run_export, job_id)
+    return len(job_ids)
+
+
+def byte_range(header, size):
+    """(first, last) byte of a single-range Range header, clipped to the file
+
+    None when the header is absent, malformed or asks for several ranges, in
+    which case the whole file is sent; ValueError when the range lies
+    entirely past the end of the file (416).
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if not length or not size:
+            raise ValueError('Empty range')
+        return max(size - length, 0), size - 1
+    first = int(first)
+    if last and int(last) < first:
+        return None
+    if first >= size:
+        raise ValueError('Range starts past the end of the file')
+    last = min(int(last), size - 1) if last else size - 1
+    return first, last
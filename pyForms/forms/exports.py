@@ -0,0 +1,400 @@
+"""Streaming exports of a form's responses, one column per question
+
+CSV and JSON Lines are always available; Parquet and Arrow IPC need pyarrow
+and give typed columns (scale, date, time) and dictionary-encoded choices.
+
+Responses are read in keyset chunks and their answers and options fetched
+one chunk at a time, as plain rows rather than model instances, so memory
+stays flat however many responses a form has. The CSV header goes
+out before the first query, so the download starts at once.
+
+Uploaded answer files are bundled into a ZIP written on the fly: each file
+is copied block by block into a stored (uncompressed) entry and handed out
+as it goes, so neither the archive nor a whole file is ever held.
+"""
+import contextlib
+import csv
+import io
+import json
+import tempfile
+import zipfile
+from collections import defaultdict
+from datetime import date, datetime, time
+from itertools import islice
+from pathlib import PurePosixPath
+from typing import NamedTuple
+from django.db.models import Q
+from django.utils import timezone
+from .models import Answer, Response
+from .schema import CHOICE_QUESTION_TYPES, get_form_schema
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+EXPORT_CHUNK_SIZE = 1000
+
+# Responses per Parquet row group / Arrow record batch
+ROW_GROUP_SIZE = 50_000
+
+# How checkbox answers are flattened into one CSV cell
+OPTION_SEPARATOR = '; '
+
+# Bytes read from an uploaded file per write into the ZIP
+FILE_BLOCK_SIZE = 64 * 1024
+
+# Manifest bytes kept in memory before its rows are spooled to disk
+MANIFEST_SPOOL_SIZE = 1024 * 1024
+
+
+class Echo:
+    """File-like object whose write() hands the line back, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def column_labels(questions):
+    """Question texts made unique, used as CSV headers and JSONL keys"""
+    labels = []
+    seen = {}
+    for question in questions:
+        label = question.text
+        seen[label] = seen.get(label, 0) + 1
+        if seen[label] > 1:
+            label = f'{label} ({seen[label]})'
+        labels.append(label)
+    return labels
+
+
+class ExportRow(NamedTuple):
+    id: int
+    submitted_at: datetime
+    respondent_name: str
+    respondent_email: str
+    # question id -> answer text, scale number or file name; option texts for choice answers
+    answers: dict
+
+
+def _chunk_answers(response_ids, typed=False):
+    """Answers of a chunk of responses as {response id: {question id: value}} (two queries)
+
+    With `typed`, date and time answers come back as date and time objects
+    from the typed Answer columns instead of their text.
+    """
+    answers = defaultdict(dict)
+    rows = (
+        Answer.objects
+        .filter(response_id__in=response_ids)
+        .values_list('response_id', 'question_id', 'answer_text', 'answer_number', 'answer_date', 'answer_time',
+                     'file_upload')
+        .order_by()
+    )
+    for response_id, question_id, answer_text, answer_number, answer_date, answer_time, file_upload in rows:
+        if file_upload:
+            value = file_upload
+        elif answer_number is not None:
+            value = answer_number
+        elif typed and answer_date is not None:
+            value = answer_date
+        elif typed and answer_time is not None:
+            value = answer_time
+        else:
+            value = answer_text or ''
+        answers[response_id][question_id] = value
+
+    through = Answer.selected_options.through
+    options = (
+        through.objects
+        .filter(answer__response_id__in=response_ids)
+        .values_list('answer__response_id', 'answer__question_id', 'option__text')
+        .order_by('option__order', 'option_id')
+    )
+    for response_id, question_id, option_text in options:
+        value = answers[response_id].get(question_id)
+        if not isinstance(value, list):
+            value = answers[response_id][question_id] = []
+        value.append(option_text)
+    return answers
+
+
+def _response_chunks(queryset, chunk_size):
+    """Lists of (id, submitted_at, name, email), oldest first, one short keyset query per chunk
+
+    No cursor stays open between chunks: under SQLite's default journal mode
+    an unfinished read holds off every writer, submissions included, for as
+    long as a slow download or a long export job takes.
+    """
+    queryset = queryset.order_by('submitted_at', 'id').values_list(
+        'id', 'submitted_at', 'respondent_name', 'respondent_email')
+    chunk = list(queryset[:chunk_size])
+    while chunk:
+        yield chunk
+        if len(chunk) < chunk_size:
+            return
+        last_id, last_submitted_at = chunk[-1][:2]
+        chunk = list(
+            queryset.filter(Q(submitted_at__gte=last_submitted_at) & ~Q(submitted_at=last_submitted_at, id__lte=last_id))
+            [:chunk_size]
+        )
+
+
+def iter_responses(form_obj, queryset=None, chunk_size=EXPORT_CHUNK_SIZE, typed=False):
+    """ExportRows oldest first; answers and options are fetched per chunk of responses"""
+    queryset = Response.objects.filter(form=form_obj) if queryset is None else queryset
+    for chunk in _response_chunks(queryset, chunk_size):
+        answers = _chunk_answers([row[0] for row in chunk], typed)
+        for row in chunk:
+            yield ExportRow(*row, answers.get(row[0], {}))
+
+
+def response_values(response, questions):
+    """Answer values of one response, in question order (None when unanswered)
+
+    Checkbox answers are lists of option texts, other choice answers the one text.
+    """
+    values = []
+    for question in questions:
+        value = response.answers.get(question.id)
+        if isinstance(value, list) and question.question_type != 'checkboxes':
+            value = value[0]
+        values.append(value)
+    return values
+
+
+def csv_rows(form_obj, questions, responses):
+    """Lists of cells: a header, then one row per response"""
+    respondent = ['Name', 'Email'] if form_obj.collect_email else []
+    yield ['Response ID', 'Submitted at', *respondent, *column_labels(questions)]
+    for response in responses:
+        cells = [response.id, response.submitted_at.isoformat()]
+        if form_obj.collect_email:
+            cells += [response.respondent_name or '', response.respondent_email or '']
+        for value in response_values(response, questions):
+            cells.append(OPTION_SEPARATOR.join(value) if isinstance(value, list) else ('' if value is None else value))
+        yield cells
+
+
+def stream_csv(form_obj, questions, responses):
+    writer = csv.writer(Echo())
+    for row in csv_rows(form_obj, questions, responses):
+        yield writer.writerow(row)
+
+
+def stream_jsonl(form_obj, questions, responses):
+    """One JSON object per line; checkbox answers stay lists"""
+    labels = column_labels(questions)
+    for response in responses:
+        record = {'response_id': response.id, 'submitted_at': response.submitted_at.isoformat()}
+        if form_obj.collect_email:
+            record['respondent_name'] = response.respondent_name or ''
+            record['respondent_email'] = response.respondent_email or ''
+        record['answers'] = dict(zip(labels, response_values(response, questions)))
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+class _StreamSink:
+    """Write-only file for pyarrow writers whose bytes are handed out as they are produced"""
+
+    closed = False
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def _arrow_column(question):
+    """(Arrow type, function turning a list of answer values into an array) for one question"""
+    if question.question_type == 'linear_scale':
+        return pa.int16(), lambda values: pa.array([v if isinstance(v, int) else None for v in values], pa.int16())
+    if question.question_type == 'date':
+        return pa.date32(), lambda values: pa.array([v if isinstance(v, date) else None for v in values], pa.date32())
+    if question.question_type == 'time':
+        return pa.time64('us'), lambda values: pa.array(
+            [v if isinstance(v, time) else None for v in values], pa.time64('us'))
+
+    if question.question_type in CHOICE_QUESTION_TYPES:
+        # Dictionary-encoded on the option texts, in the form's option order
+        index = {text: i for i, text in enumerate(dict.fromkeys(option.text for option in question.options))}
+        dictionary = pa.array(list(index), pa.string())
+        value_type = pa.dictionary(pa.int32(), pa.string())
+
+        if question.question_type != 'checkboxes':
+            def single(values):
+                indices = [index.get(v) if isinstance(v, str) else None for v in values]
+                return pa.DictionaryArray.from_arrays(pa.array(indices, pa.int32()), dictionary)
+            return value_type, single
+
+        def multiple(values):
+            offsets, indices, missing = [0], [], []
+            for v in values:
+                ticked = v if isinstance(v, list) else []
+                indices.extend(index[text] for text in ticked if text in index)
+                offsets.append(len(indices))
+                missing.append(not isinstance(v, list))
+            return pa.ListArray.from_arrays(
+                pa.array(offsets, pa.int32()),
+                pa.DictionaryArray.from_arrays(pa.array(indices, pa.int32()), dictionary),
+                mask=pa.array(missing),
+            )
+        return pa.list_(value_type), multiple
+
+    return pa.string(), lambda values: pa.array(
+        [None if v is None else (', '.join(v) if isinstance(v, list) else str(v)) for v in values], pa.string())
+
+
+def arrow_schema(form_obj, questions):
+    fields = [pa.field('response_id', pa.int64()), pa.field('submitted_at', pa.timestamp('us', tz='UTC'))]
+    if form_obj.collect_email:
+        fields += [pa.field('respondent_name', pa.string()), pa.field('respondent_email', pa.string())]
+    fields += [pa.field(label, _arrow_column(question)[0]) for label, question in zip(column_labels(questions), questions)]
+    return pa.schema(fields)
+
+
+def record_batches(form_obj, questions, responses, batch_size=ROW_GROUP_SIZE):
+    """Arrow record batches of up to `batch_size` responses, built column by column"""
+    schema = arrow_schema(form_obj, questions)
+    converters = [_arrow_column(question)[1] for question in questions]
+    while rows := list(islice(responses, batch_size)):
+        columns = [
+            pa.array([row.id for row in rows], pa.int64()),
+            pa.array([row.submitted_at for row in rows], pa.timestamp('us', tz='UTC')),
+        ]
+        if form_obj.collect_email:
+            columns.append(pa.array([row.respondent_name for row in rows], pa.string()))
+            columns.append(pa.array([row.respondent_email for row in rows], pa.string()))
+        values_by_row = [response_values(row, questions) for row in rows]
+        for i, convert in enumerate(converters):
+            columns.append(convert([values[i] for values in values_by_row]))
+        yield pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def stream_parquet(form_obj, questions, responses):
+    """A zstd-compressed Parquet file, one row group per batch of responses"""
+    sink = _StreamSink()
+    with pq.ParquetWriter(sink, arrow_schema(form_obj, questions), compression='zstd') as writer:
+        for batch in record_batches(form_obj, questions, responses):
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def stream_arrow(form_obj, questions, responses):
+    """An Arrow IPC stream (zstd-compressed), one record batch per batch of responses"""
+    sink = _StreamSink()
+    options = pa.ipc.IpcWriteOptions(compression='zstd')
+    with pa.ipc.new_stream(sink, arrow_schema(form_obj, questions), options=options) as writer:
+        yield sink.drain()
+        for batch in record_batches(form_obj, questions, responses):
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def answer_files(form_obj, queryset=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """(response id, submitted_at, question id, stored name) of every uploaded file, one short query per chunk"""
+    answers = Answer.objects.filter(response__form=form_obj).exclude(file_upload='').exclude(file_upload__isnull=True)
+    if queryset is not None:
+        answers = answers.filter(response_id__in=queryset.values('id'))
+    answers = answers.order_by('id').values_list(
+        'id', 'response_id', 'response__submitted_at', 'question_id', 'file_upload')
+    last_id = 0
+    while chunk := list(answers.filter(id__gt=last_id)[:chunk_size]):
+        for row in chunk:
+            yield row[1:]
+        last_id = chunk[-1][0]
+
+
+def stream_answer_files(form_obj, queryset=None, manifest=False):
+    """A ZIP of the form's uploaded files, one response_<id>/ folder per response
+
+    Files are named q<question id>-<original name>. With `manifest`, a
+    manifest.csv listing every file (and any missing from storage) is added
+    last; its rows are written to a temporary file as the files go out, which
+    stays in memory up to MANIFEST_SPOOL_SIZE and moves to disk beyond.
+    """
+    storage = Answer._meta.get_field('file_upload').storage
+    questions = {question.id: question.text for question in get_form_schema(form_obj).questions}
+    sink = _StreamSink()
+    with contextlib.ExitStack() as stack:
+        if manifest:
+            manifest_file = stack.enter_context(
+                tempfile.SpooledTemporaryFile(MANIFEST_SPOOL_SIZE, mode='w+', encoding='utf-8', newline='')
+            )
+            writer = csv.writer(manifest_file)
+            writer.writerow(['Response ID', 'Submitted at', 'Question', 'File', 'Path', 'Size', 'Status'])
+        archive = stack.enter_context(zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED))
+        for response_id, submitted_at, question_id, name in answer_files(form_obj, queryset):
+            file_name = PurePosixPath(name).name
+            row = [response_id, submitted_at.isoformat(), questions.get(question_id, ''), file_name]
+            try:
+                source = storage.open(name, 'rb')
+            except OSError:
+                if manifest:
+                    writer.writerow(row + ['', '', 'missing'])
+                continue
+
+            path = f'response_{response_id}/q{question_id}-{file_name}'
+            entry = zipfile.ZipInfo(path, date_time=timezone.localtime(submitted_at).timetuple()[:6])
+            # A known size lets zipfile pick ZIP64 headers for large files up front
+            entry.file_size = source.size
+            with source, archive.open(entry, 'w') as target:
+                while block := source.read(FILE_BLOCK_SIZE):
+                    target.write(block)
+                    yield sink.drain()
+            if manifest:
+                writer.writerow(row + [path, entry.file_size, 'included'])
+
+        if manifest:
+            manifest_file.seek(0)
+            entry = zipfile.ZipInfo('manifest.csv', date_time=timezone.localtime().timetuple()[:6])
+            entry.compress_type = zipfile.ZIP_DEFLATED
+            # The size is not known up front, so allow for a large manifest
+            with archive.open(entry, 'w', force_zip64=True) as target:
+                while block := manifest_file.read(FILE_BLOCK_SIZE):
+                    target.write(block.encode('utf-8'))
+                    yield sink.drain()
+    yield sink.drain()
+
+
+class ExportFormat(NamedTuple):
+    stream: object
+    content_type: str
+    extension: str
+    label: str
+    # Whether the stream wants date/time objects rather than answer text
+    typed: bool = False
+
+
+EXPORT_FORMATS = {
+    'csv': ExportFormat(stream_csv, 'text/csv; charset=utf-8', 'csv', 'CSV'),
+    'jsonl': ExportFormat(stream_jsonl, 'application/x-ndjson; charset=utf-8', 'jsonl', 'JSON Lines'),
+}
+if pa is not None:
+    EXPORT_FORMATS.update({
+        'parquet': ExportFormat(stream_parquet, 'application/vnd.apache.parquet', 'parquet', 'Parquet', typed=True),
+        'arrow': ExportFormat(stream_arrow, 'application/vnd.apache.arrow.stream', 'arrows', 'Arrow IPC stream',
+                              typed=True),
+    })
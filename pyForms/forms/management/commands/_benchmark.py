@@ -0,0 +1,52 @@
+"""Shared helpers for the bench_* management commands"""
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from forms.models import Form, Question, Option
+
+# Question types cycled through when seeding a benchmark form
+SEED_TYPES = ['short_text', 'checkboxes', 'multiple_choice', 'linear_scale', 'dropdown', 'long_text']
+
+
+@contextmanager
+def rolled_back():
+    """Run the block in a transaction that is always rolled back"""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+@contextmanager
+def timed(results, key):
+    start = time.perf_counter()
+    yield
+    results[key] = time.perf_counter() - start
+
+
+def seed_form(num_questions, options_per_question=8, types=SEED_TYPES):
+    """Create a published form owned by a throwaway user"""
+    user, _ = User.objects.get_or_create(username='__benchmark__')
+    form_obj = Form.objects.create(user=user, title='Benchmark form', is_published=True,
+                                   send_email_notifications=False)
+
+    questions = Question.objects.bulk_create([
+        Question(
+            form=form_obj,
+            text=f'Question {i}',
+            question_type=types[i % len(types)],
+            order=i,
+            scale_min=1,
+            scale_max=5,
+        )
+        for i in range(num_questions)
+    ])
+    Option.objects.bulk_create([
+        Option(question=question, text=f'Option {j}', order=j)
+        for question in questions
+        if question.question_type in ('checkboxes', 'multiple_choice', 'dropdown')
+        for j in range(options_per_question)
+    ])
+    return form_obj
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from forms.models import Form
+from forms.timeseries import backfill_buckets
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the hourly and daily response counts from Response.submitted_at'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--form', dest='form_uuid', help='Only this form (uuid); default is every form')
+
+    def handle(self, *args, **options):
+        forms = Form.objects.order_by('id')
+        if options['form_uuid']:
+            forms = forms.filter(uuid=options['form_uuid'])
+            if not forms.exists():
+                raise CommandError(f'No form with uuid {options["form_uuid"]}')
+
+        for form_obj in forms.iterator():
+            buckets = backfill_buckets(form_obj)
+            self.stdout.write(f'"{form_obj.title}" ({form_obj.uuid}): {buckets} bucket(s)')
@@ -0,0 +1,66 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from forms.analytics import form_analytics_data
+from forms.models import Answer
+from forms.schema import compile_form_schema
+from forms.submissions import parse_submission, save_submissions
+from .bench_submissions import build_post
+from ._benchmark import rolled_back, seed_form
+
+
+def per_option_analytics(form_obj):
+    """The previous implementation: one COUNT per option and per scale value"""
+    for question in form_obj.questions.all().order_by('order'):
+        if question.question_type in ['multiple_choice', 'dropdown', 'checkboxes']:
+            for option in question.options.all():
+                Answer.objects.filter(question=question, selected_options=option).count()
+        elif question.question_type == 'linear_scale':
+            for i in range((question.scale_min or 1), (question.scale_max or 5) + 1):
+                Answer.objects.filter(question=question, answer_text=str(i)).count()
+        else:
+            list(Answer.objects.filter(question=question).exclude(answer_text__isnull=True)
+                 .exclude(answer_text='').values_list('answer_text', flat=True))[:10]
+
+
+class Command(BaseCommand):
+    help = 'Compare analytics queries and time for grouped tallies against per-option counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='5,10,30', help='Comma separated question counts')
+        parser.add_argument('--options', type=int, default=8, help='Options per choice question')
+        parser.add_argument('--responses', type=int, default=2000, help='Responses seeded per form')
+
+    def measure(self, func, form_obj):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            func(form_obj)
+            elapsed = time.perf_counter() - start
+        return len(ctx.captured_queries), elapsed
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        meta = {'REMOTE_ADDR': '127.0.0.1', 'HTTP_USER_AGENT': 'bench'}
+
+        self.stdout.write(f'{options["responses"]} responses per form, {options["options"]} options per choice question')
+        self.stdout.write(f'{"questions":>10} {"old queries":>12} {"old ms":>9} {"new queries":>12} {"new ms":>9}')
+        with rolled_back():
+            for size in sizes:
+                form_obj = seed_form(size, options['options'])
+                schema = compile_form_schema(form_obj)
+                submissions = [
+                    parse_submission(form_obj, schema, build_post(form_obj), {}, meta)
+                    for _ in range(options['responses'])
+                ]
+                for start in range(0, len(submissions), 500):
+                    save_submissions(form_obj, submissions[start:start + 500])
+
+                old_queries, old_elapsed = self.measure(per_option_analytics, form_obj)
+                new_queries, new_elapsed = self.measure(form_analytics_data, form_obj)
+                self.stdout.write(
+                    f'{size:>10} {old_queries:>12} {old_elapsed * 1000:>9.1f} '
+                    f'{new_queries:>12} {new_elapsed * 1000:>9.1f}'
+                )
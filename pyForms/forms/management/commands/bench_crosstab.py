@@ -0,0 +1,106 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from forms import crosstab
+from forms.crosstab import build_crosstab, chi_square, contingency_table
+from forms.models import Answer, Response
+from forms.schema import compile_form_schema
+from ._benchmark import rolled_back, seed_form
+
+# Rows written per bulk_create when seeding the database
+SEED_BATCH = 20_000
+
+
+def correlated_answers(responses, num_options, seed):
+    """(row position, column position) per response, with the column following the row 30% of the time"""
+    rng = random.Random(seed)
+    for _ in range(responses):
+        row = rng.randrange(num_options)
+        yield row, row if rng.random() < 0.3 else rng.randrange(num_options)
+
+
+def synthetic_codes(responses, num_options, seed):
+    """The fetch_codes output of two correlated single-choice questions"""
+    row_codes = []
+    col_codes = []
+    for response_id, (row, col) in enumerate(correlated_answers(responses, num_options, seed), start=1):
+        row_codes.append(response_id * num_options + row)
+        col_codes.append(response_id * num_options + col)
+    return row_codes, col_codes
+
+
+def seed_answers(form_obj, schema, responses, seed):
+    """Bulk-insert responses answering both choice questions, skipping the per-submission counters"""
+    through = Answer.selected_options.through
+    row_question, col_question = schema.questions
+    pairs = correlated_answers(responses, len(row_question.options), seed)
+    now = timezone.now()
+    for start in range(0, responses, SEED_BATCH):
+        batch = [next(pairs) for _ in range(min(SEED_BATCH, responses - start))]
+        saved = Response.objects.bulk_create([Response(form=form_obj, submitted_at=now) for _ in batch])
+        answers = Answer.objects.bulk_create([
+            Answer(response=response, question_id=question.id)
+            for response in saved
+            for question in (row_question, col_question)
+        ])
+        through.objects.bulk_create([
+            through(answer_id=answer.id, option_id=question.options[position].id)
+            for answer, question, position in zip(
+                answers,
+                [row_question, col_question] * len(batch),
+                [position for pair in batch for position in pair],
+            )
+        ])
+
+
+class Command(BaseCommand):
+    help = 'Time contingency tables and chi-square for two choice questions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--responses', type=int, default=1_000_000, help='Synthetic responses counted in memory')
+        parser.add_argument('--options', type=int, default=8)
+        parser.add_argument('--db-responses', type=int, default=1_000_000,
+                            help='Responses seeded for the end-to-end run (0 to skip it)')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def time_counting(self, label, codes, num_options, use_numpy):
+        start = time.perf_counter()
+        counts = contingency_table(*codes, num_options, num_options, use_numpy)
+        stats = chi_square(counts)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f'{label:<26} {elapsed:>8.3f}s  chi2={stats["chi2"]:.1f} p={stats["p_value"]:.3g}')
+        return counts
+
+    def handle(self, *args, **options):
+        num_options = options['options']
+        codes = synthetic_codes(options['responses'], num_options, options['seed'])
+
+        self.stdout.write(f'{options["responses"]} responses, {num_options}x{num_options} table, in memory')
+        counts = self.time_counting('pure Python', codes, num_options, use_numpy=False)
+        if crosstab.np is not None:
+            vectorized = self.time_counting('NumPy', codes, num_options, use_numpy=True)
+            self.stdout.write(f'tables match: {vectorized == counts}')
+        else:
+            self.stdout.write('NumPy is not installed; skipped the vectorized run')
+
+        if not options['db_responses']:
+            return
+        with rolled_back():
+            form_obj = seed_form(2, num_options, types=['multiple_choice', 'dropdown'])
+            schema = compile_form_schema(form_obj)
+            start = time.perf_counter()
+            seed_answers(form_obj, schema, options['db_responses'], options['seed'])
+            self.stdout.write(f'Seeded {options["db_responses"]} responses in {time.perf_counter() - start:.1f}s')
+
+            rows, cols = (question.id for question in schema.questions)
+            for label, use_numpy in (('pure Python', False), ('NumPy', True)):
+                if use_numpy and crosstab.np is None:
+                    continue
+                start = time.perf_counter()
+                result = build_crosstab(form_obj, rows, cols, use_numpy)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f'{options["db_responses"]} responses from the database, end to end, '
+                                  f'{label}: {elapsed:.3f}s (total {result["total"]})')
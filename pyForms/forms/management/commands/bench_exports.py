@@ -0,0 +1,85 @@
+import csv
+import io
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from forms import exports
+from forms.exports import EXPORT_FORMATS, iter_responses
+from forms.schema import compile_form_schema
+from forms.submissions import parse_submission, save_submissions
+from .bench_submissions import build_post
+from ._benchmark import rolled_back, seed_form
+
+WORDS = 'delivery late refund great support slow price quality friendly staff broken order app checkout'.split()
+
+
+class Command(BaseCommand):
+    help = 'Compare the size and load time of CSV, JSON Lines, Parquet and Arrow exports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--responses', type=int, default=10_000)
+        parser.add_argument('--questions', type=int, default=12)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def seed(self, options):
+        random.seed(options['seed'])
+        form_obj = seed_form(options['questions'])
+        schema = compile_form_schema(form_obj)
+        text_fields = [question.field_name for question in schema.questions if question.question_type.endswith('_text')]
+        meta = {'REMOTE_ADDR': '127.0.0.1', 'HTTP_USER_AGENT': 'bench'}
+        submissions = []
+        for _ in range(options['responses']):
+            post = build_post(form_obj)
+            for field_name in text_fields:
+                post[field_name] = ' '.join(random.choices(WORDS, k=random.randint(2, 12)))
+            submissions.append(parse_submission(form_obj, schema, post, {}, meta))
+        for start in range(0, len(submissions), 500):
+            save_submissions(form_obj, submissions[start:start + 500])
+        return form_obj, schema
+
+    def load(self, name, data):
+        """Read an export back the way an analyst would, returning the row count"""
+        if name == 'parquet':
+            return exports.pq.read_table(io.BytesIO(data)).num_rows
+        if name == 'arrow':
+            return exports.pa.ipc.open_stream(data).read_all().num_rows
+        if name == 'csv' and exports.pa is not None:
+            import pyarrow.csv
+            return pyarrow.csv.read_csv(io.BytesIO(data)).num_rows
+        if name == 'csv':
+            return sum(1 for _ in csv.reader(io.StringIO(data.decode()))) - 1
+        return sum(1 for line in data.splitlines() if json.loads(line))
+
+    def handle(self, *args, **options):
+        if exports.pa is None:
+            self.stdout.write('pyarrow is not installed; only CSV and JSON Lines are compared')
+
+        with rolled_back():
+            form_obj, schema = self.seed(options)
+            self.stdout.write(f'{options["responses"]} responses, {options["questions"]} questions')
+            self.stdout.write(f'{"format":<10} {"bytes":>12} {"vs CSV":>8} {"export":>9} {"load":>9}')
+            csv_size = None
+            for name, export in EXPORT_FORMATS.items():
+                start = time.perf_counter()
+                responses = iter_responses(form_obj, typed=export.typed)
+                data = b''.join(
+                    chunk.encode() if isinstance(chunk, str) else chunk
+                    for chunk in export.stream(form_obj, schema.questions, responses)
+                )
+                exported = time.perf_counter() - start
+
+                # Best of three, so one-off reader initialisation is not charged to a format
+                loads = []
+                for _ in range(3):
+                    start = time.perf_counter()
+                    rows = self.load(name, data)
+                    loads.append(time.perf_counter() - start)
+                    assert rows == options['responses'], (name, rows)
+                loaded = min(loads)
+
+                csv_size = csv_size or len(data)
+                self.stdout.write(f'{name:<10} {len(data):>12} {csv_size / len(data):>7.1f}x '
+                                  f'{exported:>8.2f}s {loaded * 1000:>7.1f}ms')
@@ -0,0 +1,65 @@
+import random
+import statistics
+import time
+from array import array
+
+from django.core.management.base import BaseCommand
+
+from forms.stats import ScaleStats
+
+
+class Command(BaseCommand):
+    help = 'Check ScaleStats against list-based statistics on synthetic linear scale answers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--answers', type=int, default=10_000_000)
+        parser.add_argument('--chunk-size', type=int, default=1_000_000)
+        parser.add_argument('--scale-min', type=int, default=0)
+        parser.add_argument('--scale-max', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        values = list(range(options['scale_min'], options['scale_max'] + 1))
+        # Skewed towards the top of the scale, like most satisfaction surveys
+        weights = [1 + i * i for i in range(len(values))]
+        total, chunk_size = options['answers'], options['chunk_size']
+
+        stats = ScaleStats(options['scale_min'], options['scale_max'])
+        kept = array('i')
+        stream_elapsed = 0.0
+        generated = 0
+        while generated < total:
+            chunk = rng.choices(values, weights, k=min(chunk_size, total - generated))
+            generated += len(chunk)
+            start = time.perf_counter()
+            stats.update(chunk)
+            stream_elapsed += time.perf_counter() - start
+            kept.extend(chunk)
+
+        start = time.perf_counter()
+        summary = stats.as_dict()
+        summary_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        data = sorted(kept)
+        cut_points = statistics.quantiles(data, n=100, method='inclusive')
+        reference = {
+            'mean': statistics.fmean(data),
+            'median': statistics.median(data),
+            'std': statistics.pstdev(map(float, data)),
+            'percentiles': {p: cut_points[int(p) - 1] for p in summary['percentiles']},
+        }
+        reference_elapsed = time.perf_counter() - start
+
+        self.stdout.write(f'{total} answers on a {options["scale_min"]}..{options["scale_max"]} scale')
+        self.stdout.write(f'streaming: {stream_elapsed:.2f}s to ingest, {summary_elapsed * 1000:.3f} ms to summarise, '
+                          f'{len(stats.histogram)} counters held')
+        self.stdout.write(f'list-based: {reference_elapsed:.2f}s, {len(kept)} values held')
+
+        self.stdout.write(f'{"statistic":<10} {"streaming":>12} {"reference":>12} {"abs error":>12}')
+        rows = [(name, getattr(stats, name), reference[name]) for name in ('mean', 'median', 'std')]
+        rows += [(f'p{p}', stats.percentile(int(p)), reference['percentiles'][p]) for p in summary['percentiles']]
+        for name, ours, theirs in rows:
+            self.stdout.write(f'{name:<10} {ours:>12.4f} {theirs:>12.4f} {abs(ours - theirs):>12.2e}')
+        self.stdout.write(f'buckets {summary["buckets"]}, NPS {summary["nps"]}')
@@ -0,0 +1,77 @@
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from forms import spool
+from forms.schema import compile_form_schema
+from forms.submissions import parse_submission, save_submission
+from .bench_submissions import build_post
+from ._benchmark import seed_form
+
+
+class Command(BaseCommand):
+    help = 'Compare peak submissions per second with and without the write-behind spool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--per-thread', type=int, default=200)
+        parser.add_argument('--questions', type=int, default=20)
+
+    def run_threads(self, target, threads):
+        errors = []
+        workers = [threading.Thread(target=target, args=(errors,)) for _ in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return time.perf_counter() - start, len(errors)
+
+    def report(self, label, count, elapsed, errors):
+        self.stdout.write(f'{label:<22} {count / elapsed:>10.0f}/s {elapsed:>8.2f}s {errors:>7} errors')
+
+    def handle(self, *args, **options):
+        threads, per_thread = options['threads'], options['per_thread']
+        total = threads * per_thread
+        meta = {'REMOTE_ADDR': '127.0.0.1', 'HTTP_USER_AGENT': 'bench'}
+
+        # Worker threads need to see the form, so it is committed and deleted afterwards
+        form_obj = seed_form(options['questions'])
+        schema = compile_form_schema(form_obj)
+        post = build_post(form_obj)
+        spool_file = Path(tempfile.mkdtemp()) / 'bench-spool.sqlite3'
+
+        def direct(errors):
+            for _ in range(per_thread):
+                try:
+                    save_submission(form_obj, parse_submission(form_obj, schema, post, {}, meta))
+                except OperationalError as e:
+                    errors.append(e)
+            connection.close()
+
+        def spooled(errors):
+            for _ in range(per_thread):
+                try:
+                    spool.append(form_obj, parse_submission(form_obj, schema, post, {}, meta), path=spool_file)
+                except Exception as e:
+                    errors.append(e)
+
+        try:
+            self.stdout.write(f'{total} submissions from {threads} threads, {options["questions"]} questions each')
+            elapsed, errors = self.run_threads(direct, threads)
+            self.report('direct to database', total - errors, elapsed, errors)
+
+            elapsed, errors = self.run_threads(spooled, threads)
+            self.report('append to spool', total - errors, elapsed, errors)
+
+            start = time.perf_counter()
+            flushed = spool.flush_all(path=spool_file)
+            self.report('spool flush (1 thread)', flushed, time.perf_counter() - start, 0)
+        finally:
+            user = form_obj.user
+            form_obj.delete()
+            user.delete()
@@ -0,0 +1,65 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.http import QueryDict
+from django.test.utils import CaptureQueriesContext
+
+from forms.models import Option
+from forms.schema import compile_form_schema
+from forms.submissions import parse_submission, save_submission
+from ._benchmark import rolled_back, seed_form
+
+
+def build_post(form_obj):
+    """Build a POST body that answers every question of the form"""
+    post = QueryDict(mutable=True)
+    options = {}
+    for option in Option.objects.filter(question__form=form_obj):
+        options.setdefault(option.question_id, []).append(option.id)
+
+    for question in form_obj.questions.all():
+        field_name = f'question_{question.id}'
+        choices = options.get(question.id, [])
+        if question.question_type == 'checkboxes':
+            post.setlist(field_name, [str(i) for i in random.sample(choices, min(3, len(choices)))])
+        elif question.question_type in ('multiple_choice', 'dropdown'):
+            post[field_name] = str(random.choice(choices))
+        elif question.question_type == 'linear_scale':
+            post[field_name] = str(random.randint(1, 5))
+        else:
+            post[field_name] = 'Benchmark answer'
+    return post
+
+
+class Command(BaseCommand):
+    help = 'Show that submission queries stay constant as the number of questions grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='5,10,20,40,80', help='Comma separated question counts')
+        parser.add_argument('--repeat', type=int, default=20, help='Submissions per size')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        meta = {'REMOTE_ADDR': '127.0.0.1', 'HTTP_USER_AGENT': 'bench'}
+
+        self.stdout.write(f'{"questions":>10} {"queries":>8} {"ms/submission":>14}')
+        with rolled_back():
+            for size in sizes:
+                form_obj = seed_form(size)
+                schema = compile_form_schema(form_obj)
+                post = build_post(form_obj)
+
+                with CaptureQueriesContext(connection) as ctx:
+                    submission = parse_submission(form_obj, schema, post, {}, meta)
+                    save_submission(form_obj, submission)
+                queries = len(ctx.captured_queries)
+
+                start = time.perf_counter()
+                for _ in range(options['repeat']):
+                    submission = parse_submission(form_obj, schema, post, {}, meta)
+                    save_submission(form_obj, submission)
+                elapsed = (time.perf_counter() - start) / options['repeat']
+
+                self.stdout.write(f'{size:>10} {queries:>8} {elapsed * 1000:>14.2f}')
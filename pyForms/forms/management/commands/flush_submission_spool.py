@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from forms import spool
+
+
+class Command(BaseCommand):
+    help = 'Write spooled public form submissions into the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Spool entries written per transaction')
+        parser.add_argument('--loop', action='store_true', help='Keep draining the spool instead of exiting')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            flushed = spool.flush_all(options['batch_size'])
+            if flushed or not options['loop']:
+                self.stdout.write(f'Flushed {flushed} submission(s), {spool.pending()} pending, '
+                                  f'{spool.dead_letters()} in dead_letter')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from forms.analytics import check_counters, rebuild_counters
+from forms.dashboard import check_dashboard_stats, refresh_dashboard_stats
+from forms.models import Form
+from forms.text_index import check_text_index, rebuild_text_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized analytics counters, text index and dashboard totals, or check them against a full recount'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--form', dest='form_uuid', help='Only this form (uuid); default is every form')
+        parser.add_argument('--check', action='store_true', help='Report mismatches instead of rebuilding')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Answers fetched per round trip when streaming text')
+
+    def handle(self, *args, **options):
+        forms = Form.objects.order_by('id')
+        if options['form_uuid']:
+            forms = forms.filter(uuid=options['form_uuid'])
+            if not forms.exists():
+                raise CommandError(f'No form with uuid {options["form_uuid"]}')
+
+        mismatched = 0
+        for form_obj in forms.iterator():
+            if not options['check']:
+                rebuild_counters(form_obj)
+                rebuild_text_index(form_obj, options['chunk_size'])
+                self.stdout.write(f'Rebuilt counters for "{form_obj.title}" ({form_obj.uuid})')
+                continue
+
+            differences = check_counters(form_obj)
+            term_differences = check_text_index(form_obj, options['chunk_size'])
+            if differences or term_differences:
+                mismatched += 1
+                self.stdout.write(self.style.WARNING(
+                    f'"{form_obj.title}" ({form_obj.uuid}): {len(differences)} mismatched counter(s), '
+                    f'{len(term_differences)} mismatched term(s)'
+                ))
+                for (question_id, key), (stored, actual) in sorted(differences.items()):
+                    self.stdout.write(f'  question {question_id} {key}: stored {stored}, actual {actual}')
+                for (question_id, kind, term), (stored, actual) in sorted(term_differences.items())[:20]:
+                    self.stdout.write(f'  question {question_id} {kind} {term!r}: stored {stored}, actual {actual}')
+
+        for user_id in sorted(set(forms.values_list('user_id', flat=True))):
+            if not options['check']:
+                refresh_dashboard_stats(user_id)
+                continue
+            differences = check_dashboard_stats(user_id)
+            if differences:
+                mismatched += 1
+                self.stdout.write(self.style.WARNING(f'Dashboard totals of user {user_id}: ' + ', '.join(
+                    f'{name} stored {stored}, actual {actual}' for name, (stored, actual) in differences.items()
+                )))
+
+        if options['check']:
+            if mismatched:
+                raise CommandError(f'{mismatched} form(s) or user(s) have inconsistent counters; run without --check to rebuild')
+            self.stdout.write(self.style.SUCCESS('All counters match a full recount'))
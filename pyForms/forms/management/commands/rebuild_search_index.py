@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from forms.search import rebuild_search_index, search_backend
+
+
+class Command(BaseCommand):
+    help = 'Recreate the SQLite full-text index over answers and respondents (tables, triggers and contents)'
+
+    def handle(self, *args, **options):
+        if rebuild_search_index():
+            self.stdout.write('Rebuilt forms_answer_fts and forms_response_fts')
+        else:
+            self.stdout.write(f'Nothing to rebuild: the {search_backend()} search backend is maintained by the database')
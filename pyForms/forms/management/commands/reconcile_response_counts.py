@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from forms.models import Form
+from forms.submissions import reconcile_response_counts
+
+
+class Command(BaseCommand):
+    help = 'Recount Form.response_count for forms where it has drifted from the Response table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--form', dest='form_uuid', help='Only this form (uuid); default is every form')
+        parser.add_argument('--check', action='store_true', help='Report mismatches instead of fixing them')
+        parser.add_argument('--loop', action='store_true', help='Keep reconciling periodically instead of exiting')
+        parser.add_argument('--interval', type=float, default=3600.0, help='Seconds between runs with --loop')
+
+    def handle(self, *args, **options):
+        forms = Form.objects.all()
+        if options['form_uuid']:
+            forms = forms.filter(uuid=options['form_uuid'])
+            if not forms.exists():
+                raise CommandError(f'No form with uuid {options["form_uuid"]}')
+
+        while True:
+            mismatched = reconcile_response_counts(forms, check=options['check'])
+            for form_id, (stored, actual) in mismatched.items():
+                self.stdout.write(f'  form {form_id}: stored {stored}, actual {actual}')
+            if options['check'] and mismatched:
+                raise CommandError(f'{len(mismatched)} form(s) have a wrong response count; run without --check to fix')
+            self.stdout.write(f'{"Found" if options["check"] else "Fixed"} {len(mismatched)} mismatched response count(s)')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
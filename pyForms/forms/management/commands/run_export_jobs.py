@@ -0,0 +1,40 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+
+from forms.export_jobs import MAX_WORKERS, process_export_jobs
+
+
+class Command(BaseCommand):
+    help = 'Write queued response exports to EXPORT_ROOT in a pool of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-workers', type=int, default=MAX_WORKERS, help='Exports running at once')
+        parser.add_argument('--niceness', type=int, default=10, help='Added to the CPU niceness of the workers')
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting when the queue is empty')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        if options['niceness'] and hasattr(os, 'nice'):
+            # Inherited by the pool, so exports yield the CPU to the web processes
+            os.nice(options['niceness'])
+
+        running = {}
+        # Spawned workers set Django up from scratch rather than forking this
+        # process's database connection
+        with ProcessPoolExecutor(
+            max_workers=options['max_workers'],
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        ) as executor:
+            while True:
+                started = process_export_jobs(executor, running, options['max_workers'])
+                if started:
+                    self.stdout.write(f'Started {started} export(s), {len(running)} running')
+                if not options['loop'] and not running:
+                    break
+                time.sleep(options['interval'])
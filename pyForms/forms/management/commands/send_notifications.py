@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from forms.notifications import MAX_ATTEMPTS, deliver_pending
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued email notifications'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Messages sent per SMTP connection')
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS, help='Give up after this many failures')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the queue instead of exiting')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = deliver_pending(options['batch_size'], options['max_attempts'])
+            if sent or failed or not options['loop']:
+                self.stdout.write(f'Sent {sent} notification(s), {failed} failed')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:28
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0004_notification_is_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='response',
+            name='spool_id',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='response',
+            name='submitted_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:29
+
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def collapse_changes(apps, schema_editor):
+    """One rollup row per date for the existing Change rows (they never had a form)"""
+    Change = apps.get_model('forms', 'Change')
+    ChangeRollup = apps.get_model('forms', 'ChangeRollup')
+    ChangeRollup.objects.bulk_create(
+        ChangeRollup(form=None, change_date=row['change_date'], count=row['count'])
+        for row in Change.objects.values('change_date').annotate(count=Count('id')).order_by()
+    )
+
+
+def expand_changes(apps, schema_editor):
+    Change = apps.get_model('forms', 'Change')
+    ChangeRollup = apps.get_model('forms', 'ChangeRollup')
+    for rollup in ChangeRollup.objects.all():
+        Change.objects.bulk_create(
+            (Change(change_date=rollup.change_date) for _ in range(rollup.count)),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0005_response_spool_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('change_date', models.DateField(default=datetime.date.today, help_text='Date when the change occurred')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('form', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='change_rollups', to='forms.form')),
+            ],
+            options={
+                'verbose_name': 'Daily change count',
+                'verbose_name_plural': 'Daily change counts',
+                'ordering': ['-change_date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='changerollup',
+            constraint=models.UniqueConstraint(fields=('form', 'change_date'), name='unique_change_rollup_per_day'),
+        ),
+        migrations.RunPython(collapse_changes, expand_changes),
+        migrations.DeleteModel(
+            name='Change',
+        ),
+    ]
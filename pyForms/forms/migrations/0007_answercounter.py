@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_counters(apps, schema_editor):
+    """Same tallies as forms.analytics.recount, for every form at once"""
+    Answer = apps.get_model('forms', 'Answer')
+    AnswerCounter = apps.get_model('forms', 'AnswerCounter')
+    through = Answer.selected_options.through
+
+    counters = [
+        AnswerCounter(question_id=row['question_id'], key='answered', count=row['count'])
+        for row in Answer.objects.values('question_id').annotate(count=Count('id')).order_by()
+    ]
+    counters.extend(
+        AnswerCounter(question_id=row['option__question_id'], key=f"option:{row['option_id']}", count=row['count'])
+        for row in through.objects.values('option_id', 'option__question_id').annotate(count=Count('id')).order_by()
+    )
+    scale_rows = (
+        Answer.objects
+        .filter(question__question_type='linear_scale')
+        .values('question_id', 'answer_text')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    counters.extend(
+        AnswerCounter(question_id=row['question_id'], key=f"value:{row['answer_text']}", count=row['count'])
+        for row in scale_rows
+        if row['answer_text'] and len(row['answer_text']) <= 10 and row['answer_text'].isdigit()
+    )
+    AnswerCounter.objects.bulk_create(counters, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0006_change_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnswerCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64)),
+                ('count', models.BigIntegerField(default=0)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counters', to='forms.question')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('question', 'key'), name='unique_answer_counter')],
+            },
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
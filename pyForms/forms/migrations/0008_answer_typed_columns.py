@@ -0,0 +1,102 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:34
+
+from datetime import datetime, time
+
+from django.db import migrations, models
+from django.db.models import Count
+
+BATCH_SIZE = 2000
+
+
+def typed_columns(question_type, answer_text, scale_min, scale_max):
+    """Copy of QuestionSchema.typed_columns as it was when this migration was written"""
+    if not answer_text:
+        return {}
+    try:
+        if question_type == 'linear_scale':
+            number = int(answer_text)
+            return {'answer_number': number} if (scale_min or 1) <= number <= (scale_max or 5) else {}
+        if question_type == 'date':
+            return {'answer_date': datetime.strptime(answer_text, '%Y-%m-%d').date()}
+        if question_type == 'time':
+            return {'answer_time': time.fromisoformat(answer_text)}
+    except ValueError:
+        pass
+    return {}
+
+
+def backfill_typed_columns(apps, schema_editor):
+    Answer = apps.get_model('forms', 'Answer')
+    AnswerCounter = apps.get_model('forms', 'AnswerCounter')
+
+    # Walk the table in id order so updates never disturb the rows still to be read
+    answers = (
+        Answer.objects
+        .filter(question__question_type__in=['linear_scale', 'date', 'time'])
+        .exclude(answer_text__isnull=True)
+        .order_by('id')
+    )
+    last_id = 0
+    while True:
+        rows = list(
+            answers.filter(id__gt=last_id)
+            .values_list('id', 'question__question_type', 'answer_text', 'question__scale_min', 'question__scale_max')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        batch = []
+        for answer_id, question_type, answer_text, scale_min, scale_max in rows:
+            columns = typed_columns(question_type, answer_text, scale_min, scale_max)
+            if columns:
+                batch.append(Answer(id=answer_id, **columns))
+        Answer.objects.bulk_update(batch, ['answer_number', 'answer_date', 'answer_time'])
+
+    # Scale counters are now keyed by the typed value rather than the raw text
+    AnswerCounter.objects.filter(key__startswith='value:').delete()
+    AnswerCounter.objects.bulk_create(
+        [
+            AnswerCounter(question_id=row['question_id'], key=f"value:{row['answer_number']}", count=row['count'])
+            for row in Answer.objects.filter(answer_number__isnull=False)
+            .values('question_id', 'answer_number').annotate(count=Count('id')).order_by()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0007_answercounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='answer_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='answer',
+            name='answer_number',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='answer',
+            name='answer_time',
+            field=models.TimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['question', 'answer_number'], name='answer_question_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['question', 'answer_date'], name='answer_question_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['question', 'answer_time'], name='answer_question_time_idx'),
+        ),
+        migrations.RunPython(backfill_typed_columns, migrations.RunPython.noop),
+    ]
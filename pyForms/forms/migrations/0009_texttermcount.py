@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Q
+
+from forms.text_index import TEXT_QUESTION_TYPES, term_deltas
+
+
+def backfill_terms(apps, schema_editor):
+    """Index every existing text answer, as forms.text_index.rebuild_text_index does per form"""
+    Answer = apps.get_model('forms', 'Answer')
+    TextTermCount = apps.get_model('forms', 'TextTermCount')
+    answers = (
+        Answer.objects
+        .filter(question__question_type__in=TEXT_QUESTION_TYPES)
+        .exclude(Q(answer_text__isnull=True) | Q(answer_text=''))
+        .values_list('question_id', 'question__question_type', 'answer_text')
+        .iterator(chunk_size=2000)
+    )
+    TextTermCount.objects.bulk_create(
+        (TextTermCount(question_id=question_id, kind=kind, term=term, count=count)
+         for (question_id, kind, term), count in term_deltas(answers).items()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0008_answer_typed_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TextTermCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('term', 'Term'), ('bigram', 'Bigram'), ('value', 'Whole value')], max_length=10)),
+                ('term', models.CharField(max_length=100)),
+                ('count', models.BigIntegerField(default=0)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='term_counts', to='forms.question')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['question', 'kind', '-count'], name='term_count_top_idx')],
+                'constraints': [models.UniqueConstraint(fields=('question', 'kind', 'term'), name='unique_text_term_count')],
+            },
+        ),
+        migrations.RunPython(backfill_terms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+
+def backfill_buckets(apps, schema_editor):
+    """Group existing responses into buckets, as forms.timeseries.backfill_buckets does per form"""
+    Response = apps.get_model('forms', 'Response')
+    ResponseBucket = apps.get_model('forms', 'ResponseBucket')
+    tz = timezone.get_default_timezone()
+    for granularity in ('hour', 'day'):
+        rows = (
+            Response.objects
+            .annotate(bucket=Trunc('submitted_at', granularity, tzinfo=tz))
+            .values('form_id', 'bucket')
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+        ResponseBucket.objects.bulk_create(
+            (ResponseBucket(form_id=row['form_id'], granularity=granularity, bucket_start=row['bucket'], count=row['count'])
+             for row in rows),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0009_texttermcount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResponseBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily')], max_length=4)),
+                ('bucket_start', models.DateTimeField()),
+                ('count', models.BigIntegerField(default=0)),
+                ('form', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='response_buckets', to='forms.form')),
+            ],
+            options={
+                'ordering': ['bucket_start'],
+                'constraints': [models.UniqueConstraint(fields=('form', 'granularity', 'bucket_start'), name='unique_response_bucket')],
+            },
+        ),
+        migrations.RunPython(backfill_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0010_responsebucket'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='form',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='form_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='response',
+            index=models.Index(fields=['form', '-submitted_at', '-id'], name='response_form_recent_idx'),
+        ),
+    ]
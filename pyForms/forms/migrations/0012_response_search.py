@@ -0,0 +1,108 @@
+from django.db import migrations
+
+# External-content FTS5 tables: the text lives in forms_answer/forms_response,
+# the index is kept in step by triggers and searched through forms.search.
+# Frozen copy of forms.search.SQLITE_SCHEMA and SQLITE_REINDEX as of this
+# migration, which must not import app code that can change under it; the
+# live definition is the one in forms.search, applied by rebuild_search_index.
+SQLITE_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS forms_answer_fts USING fts5(
+        answer_text, content='forms_answer', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS forms_answer_fts_insert AFTER INSERT ON forms_answer BEGIN
+        INSERT INTO forms_answer_fts(rowid, answer_text) VALUES (new.id, new.answer_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS forms_answer_fts_delete AFTER DELETE ON forms_answer BEGIN
+        INSERT INTO forms_answer_fts(forms_answer_fts, rowid, answer_text) VALUES ('delete', old.id, old.answer_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS forms_answer_fts_update AFTER UPDATE OF answer_text ON forms_answer BEGIN
+        INSERT INTO forms_answer_fts(forms_answer_fts, rowid, answer_text) VALUES ('delete', old.id, old.answer_text);
+        INSERT INTO forms_answer_fts(rowid, answer_text) VALUES (new.id, new.answer_text);
+    END""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS forms_response_fts USING fts5(
+        respondent_name, respondent_email, content='forms_response', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS forms_response_fts_insert AFTER INSERT ON forms_response BEGIN
+        INSERT INTO forms_response_fts(rowid, respondent_name, respondent_email)
+        VALUES (new.id, new.respondent_name, new.respondent_email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS forms_response_fts_delete AFTER DELETE ON forms_response BEGIN
+        INSERT INTO forms_response_fts(forms_response_fts, rowid, respondent_name, respondent_email)
+        VALUES ('delete', old.id, old.respondent_name, old.respondent_email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS forms_response_fts_update AFTER UPDATE OF respondent_name, respondent_email
+    ON forms_response BEGIN
+        INSERT INTO forms_response_fts(forms_response_fts, rowid, respondent_name, respondent_email)
+        VALUES ('delete', old.id, old.respondent_name, old.respondent_email);
+        INSERT INTO forms_response_fts(rowid, respondent_name, respondent_email)
+        VALUES (new.id, new.respondent_name, new.respondent_email);
+    END""",
+]
+
+SQLITE_REINDEX = [
+    "INSERT INTO forms_answer_fts(forms_answer_fts) VALUES ('rebuild')",
+    "INSERT INTO forms_response_fts(forms_response_fts) VALUES ('rebuild')",
+]
+
+SQLITE_FORWARD = SQLITE_SCHEMA + SQLITE_REINDEX
+
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS forms_answer_fts_insert',
+    'DROP TRIGGER IF EXISTS forms_answer_fts_delete',
+    'DROP TRIGGER IF EXISTS forms_answer_fts_update',
+    'DROP TRIGGER IF EXISTS forms_response_fts_insert',
+    'DROP TRIGGER IF EXISTS forms_response_fts_delete',
+    'DROP TRIGGER IF EXISTS forms_response_fts_update',
+    'DROP TABLE IF EXISTS forms_answer_fts',
+    'DROP TABLE IF EXISTS forms_response_fts',
+]
+
+# Expression indexes matching the tsvector expressions in forms.search
+POSTGRES_FORWARD = [
+    """CREATE INDEX forms_answer_search_idx ON forms_answer
+        USING gin (to_tsvector('simple', coalesce(answer_text, '')))""",
+    """CREATE INDEX forms_response_search_idx ON forms_response
+        USING gin (to_tsvector('simple', coalesce(respondent_name, '') || ' ' || coalesce(respondent_email, '')))""",
+]
+
+POSTGRES_BACKWARD = [
+    'DROP INDEX IF EXISTS forms_answer_search_idx',
+    'DROP INDEX IF EXISTS forms_response_search_idx',
+]
+
+
+def sqlite_has_fts5(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return 'ENABLE_FTS5' in {row[0] for row in cursor.fetchall()}
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite' and sqlite_has_fts5(schema_editor):
+        statements = SQLITE_FORWARD
+    elif vendor == 'postgresql':
+        statements = POSTGRES_FORWARD
+    else:
+        # No index: forms.search falls back to icontains
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for statement in {'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD}.get(vendor, []):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0011_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
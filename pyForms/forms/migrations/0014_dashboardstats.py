@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('forms', '0013_exportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='dashboard_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_forms', models.BigIntegerField(default=0)),
+                ('published_forms', models.BigIntegerField(default=0)),
+                ('total_responses', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Dashboard stats',
+            },
+        ),
+    ]
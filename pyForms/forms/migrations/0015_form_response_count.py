@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:23
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_response_counts(apps, schema_editor):
+    """Count every form's responses in one UPDATE, as forms.submissions.reconcile_response_counts does"""
+    Form = apps.get_model('forms', 'Form')
+    Response = apps.get_model('forms', 'Response')
+    counts = Response.objects.filter(form=OuterRef('pk')).order_by().values('form').annotate(n=Count('id')).values('n')
+    Form.objects.update(response_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0014_dashboardstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='form',
+            name='response_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_response_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The plain question index Django created for the foreign key; every lookup
+# it served is covered by answer_question_response_idx
+QUESTION_INDEX = 'forms_answer_question_id_5acbe460'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0015_form_response_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['question', 'response'], name='answer_question_response_idx'),
+        ),
+        # Dropped directly: an AlterField would make SQLite rebuild forms_answer,
+        # which copies every answer and drops the search triggers of 0012
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='answer',
+                    name='question',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='forms.question'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    f'DROP INDEX IF EXISTS "{QUESTION_INDEX}"',
+                    f'CREATE INDEX "{QUESTION_INDEX}" ON "forms_answer" ("question_id")',
+                ),
+            ],
+        ),
+    ]
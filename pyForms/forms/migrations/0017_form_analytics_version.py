@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0016_answer_question_response_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='form',
+            name='analytics_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -29,6 +29,19 @@ THEME_CHOICES = [
     ('custom', 'Custom'),
 ]
 
+NOTIFICATION_STATUS_CHOICES = [
+    ('pending', 'Pending'),
+    ('sent', 'Sent'),
+    ('failed', 'Failed'),
+]
+
+EXPORT_STATUS_CHOICES = [
+    ('pending', 'Pending'),
+    ('running', 'Running'),
+    ('done', 'Done'),
+    ('failed', 'Failed'),
+]
+
 class Form(models.Model):
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_forms')
@@ -50,15 +63,36 @@ class Form(models.Model):
     # Email notifications
     send_email_notifications = models.BooleanField(default=True)
     
+    # Only ever changed with F() updates: by save_submissions and the Response delete
+    # signal, and by reconcile_response_counts
+    response_count = models.PositiveIntegerField(default=0, editable=False)
+    # Bumped with F() whenever responses or answers are deleted or a question
+    # changes type; part of the analytics ETag and of export data versions
+    analytics_version = models.PositiveIntegerField(default=0, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the dashboard
+            models.Index(fields=['user', '-created_at', '-id'], name='form_user_recent_idx'),
+        ]
     
     def __str__(self):
         return self.title
     
+    def save(self, *args, **kwargs):
+        # A full save would write back this instance's copies of the counters
+        # over submissions and deletions made since it was loaded
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in ('response_count', 'analytics_version')
+            ]
+        super().save(*args, **kwargs)
+    
     @property
     def is_open(self):
         now = timezone.now()
@@ -68,10 +102,6 @@ class Form(models.Model):
             return False
         return True
     
-    @property
-    def response_count(self):
-        return self.responses.count()
-    
     @property
     def share_url(self):
         return f'/form/{self.uuid}/'
@@ -111,7 +141,8 @@ class Option(models.Model):
 
 class Response(models.Model):
     form = models.ForeignKey(Form, on_delete=models.CASCADE, related_name='responses')
-    submitted_at = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add: spooled submissions keep the time they were accepted
+    submitted_at = models.DateTimeField(default=timezone.now, editable=False)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(blank=True, null=True)
     
@@ -119,39 +150,213 @@ class Response(models.Model):
     respondent_email = models.EmailField(blank=True, null=True)
     respondent_name = models.CharField(max_length=255, blank=True, null=True)
     
+    # Id of the spool entry this response was flushed from, for exactly-once replay
+    spool_id = models.BigIntegerField(unique=True, null=True, blank=True, editable=False)
+    
     class Meta:
         ordering = ['-submitted_at']
+        indexes = [
+            # Keyset pagination of a form's responses
+            models.Index(fields=['form', '-submitted_at', '-id'], name='response_form_recent_idx'),
+        ]
     
     def __str__(self):
         return f"Response to {self.form.title} at {self.submitted_at}"
 
 class Answer(models.Model):
     response = models.ForeignKey(Response, on_delete=models.CASCADE, related_name='answers')
-    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    # Indexed by answer_question_response_idx below
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, db_index=False)
     answer_text = models.TextField(blank=True, null=True)
+    # Typed copies of answer_text, filled from the question type when saved
+    answer_number = models.IntegerField(null=True, blank=True, editable=False)
+    answer_date = models.DateField(null=True, blank=True, editable=False)
+    answer_time = models.TimeField(null=True, blank=True, editable=False)
     selected_options = models.ManyToManyField(Option, blank=True)
     file_upload = models.FileField(upload_to='answer_files/', blank=True, null=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['question', 'answer_number'], name='answer_question_number_idx'),
+            models.Index(fields=['question', 'answer_date'], name='answer_question_date_idx'),
+            models.Index(fields=['question', 'answer_time'], name='answer_question_time_idx'),
+            # Covers the (response, option) reads of a cross-tabulation
+            models.Index(fields=['question', 'response'], name='answer_question_response_idx'),
+        ]
+    
     def __str__(self):
         return f"Answer to: {self.question.text[:30]}"
     
     @property
     def display_answer(self):
-        if self.selected_options.exists():
-            return ', '.join([option.text for option in self.selected_options.all()])
+        # .all() rather than .exists() so prefetched options are used
+        options = self.selected_options.all()
+        if options:
+            return ', '.join([option.text for option in options])
         elif self.file_upload:
             return f"File: {self.file_upload.name}"
         return self.answer_text or 'No answer'
 
 
-class Change(models.Model):
+class AnswerCounter(models.Model):
+    """Running tally for one question, kept up to date as responses come and go
+
+    Keys are 'answered', 'option:<option id>' and 'value:<scale value>'.
+    """
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='counters')
+    key = models.CharField(max_length=64)
+    count = models.BigIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['question', 'key'], name='unique_answer_counter'),
+        ]
+    
+    def __str__(self):
+        return f"{self.key} = {self.count}"
+
+
+TERM_KIND_CHOICES = [
+    ('term', 'Term'),
+    ('bigram', 'Bigram'),
+    ('value', 'Whole value'),
+]
+
+
+class TextTermCount(models.Model):
+    """How many answers to a text question mention a term, bigram or exact value"""
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='term_counts')
+    kind = models.CharField(max_length=10, choices=TERM_KIND_CHOICES)
+    term = models.CharField(max_length=100)
+    count = models.BigIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['question', 'kind', 'term'], name='unique_text_term_count'),
+        ]
+        indexes = [
+            models.Index(fields=['question', 'kind', '-count'], name='term_count_top_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} {self.term!r} = {self.count}"
+
+
+GRANULARITY_CHOICES = [
+    ('hour', 'Hourly'),
+    ('day', 'Daily'),
+]
+
+
+class ResponseBucket(models.Model):
+    """Responses received by a form in one hour or day of settings.TIME_ZONE"""
+    form = models.ForeignKey(Form, on_delete=models.CASCADE, related_name='response_buckets')
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField()
+    count = models.BigIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['bucket_start']
+        constraints = [
+            models.UniqueConstraint(fields=['form', 'granularity', 'bucket_start'], name='unique_response_bucket'),
+        ]
+    
+    def __str__(self):
+        return f"{self.count} response(s) in the {self.granularity} from {self.bucket_start}"
+
+
+class DashboardStats(models.Model):
+    """A user's totals for the dashboard header, kept up to date as forms and responses come and go"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='dashboard_stats')
+    total_forms = models.BigIntegerField(default=0)
+    published_forms = models.BigIntegerField(default=0)
+    total_responses = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name_plural = 'Dashboard stats'
+    
+    def __str__(self):
+        return f"{self.user}: {self.total_forms} form(s), {self.total_responses} response(s)"
+
+
+class ChangeRollup(models.Model):
+    """Number of submissions per change date, one row per form and day"""
+    # Null for rows carried over from the old per-submission Change table
+    form = models.ForeignKey(Form, on_delete=models.CASCADE, related_name='change_rollups', null=True, blank=True)
     change_date = models.DateField(default=date.today, help_text="Date when the change occurred")
+    count = models.PositiveIntegerField(default=0)
     
     class Meta:
-        db_table = 'forms_change'
-        verbose_name = 'Change'
-        verbose_name_plural = 'Changes'
+        verbose_name = 'Daily change count'
+        verbose_name_plural = 'Daily change counts'
         ordering = ['-change_date']
+        constraints = [
+            models.UniqueConstraint(fields=['form', 'change_date'], name='unique_change_rollup_per_day'),
+        ]
+    
+    def __str__(self):
+        return f"{self.count} change(s) on {self.change_date}"
+
+
+class Notification(models.Model):
+    """An outgoing email waiting in the local delivery queue"""
+    form = models.ForeignKey(Form, on_delete=models.CASCADE, related_name='notifications', null=True, blank=True)
+    recipient = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    # Digest entries are summarised per recipient instead of sent one by one
+    is_digest = models.BooleanField(default=False)
+    
+    status = models.CharField(max_length=20, choices=NOTIFICATION_STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, null=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.subject} -> {self.recipient} ({self.status})"
+
+
+class ExportJob(models.Model):
+    """An export of a form's responses, written to EXPORT_ROOT by the export worker"""
+    form = models.ForeignKey(Form, on_delete=models.CASCADE, related_name='export_jobs')
+    export_format = models.CharField(max_length=20)
+    status = models.CharField(max_length=20, choices=EXPORT_STATUS_CHOICES, default='pending')
+    # export_jobs.data_version of the form when the export ran; a done job is reused while it still matches
+    data_version = models.CharField(max_length=100, blank=True)
+    
+    total = models.PositiveIntegerField(default=0)
+    written = models.PositiveIntegerField(default=0)
+    # Relative to EXPORT_ROOT
+    file_path = models.CharField(max_length=255, blank=True)
+    file_size = models.BigIntegerField(null=True, blank=True)
+    last_error = models.TextField(blank=True, null=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Touched on every progress update, so jobs of a dead worker can be spotted
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
     
     def __str__(self):
-        return f"Change on {self.change_date}"
\ No newline at end of file
+        return f"{self.export_format} export of {self.form.title} ({self.status})"
+    
+    @property
+    def progress(self):
+        if self.status == 'done':
+            return 100
+        return int(100 * self.written / self.total) if self.total else 0
\ No newline at end of file
@@ -0,0 +1,254 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Count, F, Max
+from django.utils import timezone
+from .models import Notification
+
+try:
+    from accounts.models import UserProfile
+except ImportError:
+    UserProfile = None
+
+# Retry schedule: base * 2 ** (attempt - 1), capped
+RETRY_BASE_SECONDS = getattr(settings, 'NOTIFICATION_RETRY_BASE_SECONDS', 30)
+RETRY_MAX_SECONDS = getattr(settings, 'NOTIFICATION_RETRY_MAX_SECONDS', 60 * 60)
+MAX_ATTEMPTS = getattr(settings, 'NOTIFICATION_MAX_ATTEMPTS', 6)
+
+# How long a claimed batch is hidden from other workers
+CLAIM_SECONDS = 5 * 60
+
+# Claimed digest entries updated per query
+CLAIM_CHUNK_SIZE = 1000
+
+
+def _owner_profile(user):
+    if UserProfile is None:
+        return None
+    return UserProfile.objects.filter(user=user).first()
+
+
+def digest_deadline(now, minutes):
+    """End of the digest window containing `now`; windows are aligned to the epoch"""
+    window = minutes * 60
+    return datetime.fromtimestamp((int(now.timestamp()) // window + 1) * window, tz=dt_timezone.utc)
+
+
+def enqueue_response_notification(form_obj, responses_url, count=1):
+    """Queue the 'new response' email(s) for the form owner, if they want them
+
+    Owners with a digest window get digest entries due at the end of the
+    current window; the worker folds those into one message per owner.
+    """
+    owner = form_obj.user
+    if not form_obj.send_email_notifications or not owner.email:
+        return []
+
+    profile = _owner_profile(owner)
+    if profile and not profile.email_notifications:
+        return []
+
+    fields = {
+        'form': form_obj,
+        'recipient': owner.email,
+        'subject': f'New Response: {form_obj.title}',
+    }
+    if profile and profile.notification_digest_minutes:
+        fields.update(
+            body=responses_url,
+            is_digest=True,
+            next_attempt_at=digest_deadline(timezone.now(), profile.notification_digest_minutes),
+        )
+    else:
+        fields['body'] = f'You have received a new response for your form "{form_obj.title}".\n\nView responses: {responses_url}'
+
+    return Notification.objects.bulk_create([Notification(**fields) for _ in range(count)])
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS))
+
+
+def claim_due(batch_size):
+    """Lease up to batch_size due notifications so concurrent workers skip them"""
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            Notification.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='pending', is_digest=False, next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        if batch:
+            Notification.objects.filter(pk__in=[n.pk for n in batch]).update(
+                next_attempt_at=now + timedelta(seconds=CLAIM_SECONDS)
+            )
+    return batch
+
+
+def _record_failure(notification, error, now, max_attempts):
+    notification.attempts += 1
+    notification.last_error = str(error)
+    if notification.attempts >= max_attempts:
+        notification.status = 'failed'
+    else:
+        notification.next_attempt_at = now + retry_delay(notification.attempts)
+
+
+def deliver(batch, max_attempts=MAX_ATTEMPTS):
+    """Send a batch over one mail connection and record each outcome
+
+    Returns a (sent, failed) tuple; failed includes notifications that will be retried.
+    """
+    if not batch:
+        return 0, 0
+
+    now = timezone.now()
+    sent = failed = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        for notification in batch:
+            _record_failure(notification, e, now, max_attempts)
+        failed = len(batch)
+    else:
+        try:
+            for notification in batch:
+                message = EmailMessage(
+                    subject=notification.subject,
+                    body=notification.body,
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    to=[notification.recipient],
+                    connection=connection,
+                )
+                try:
+                    message.send()
+                except Exception as e:
+                    _record_failure(notification, e, now, max_attempts)
+                    failed += 1
+                else:
+                    notification.status = 'sent'
+                    notification.sent_at = timezone.now()
+                    notification.attempts += 1
+                    notification.last_error = None
+                    sent += 1
+        finally:
+            connection.close()
+
+    Notification.objects.bulk_update(
+        batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+    )
+    return sent, failed
+
+
+def build_digest(recipient, form_rows):
+    total = sum(row['count'] for row in form_rows)
+    lines = [f'You have received {total} new response(s) across {len(form_rows)} form(s).', '']
+    for row in form_rows:
+        lines.append(f'- {row["form__title"]}: {row["count"]} new response(s)')
+        lines.append(f'  View responses: {row["url"]}')
+    return EmailMessage(
+        subject=f'pyForms digest: {total} new response(s)',
+        body='\n'.join(lines),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[recipient],
+    )
+
+
+def claim_digests(now):
+    """Lease every due digest entry, as claim_due does for single notifications
+
+    The leased entries are marked by their new next_attempt_at, which is
+    returned (None when nothing was due); entries arriving afterwards, or
+    locked by another worker, are left for the next run.
+    """
+    lease = now + timedelta(seconds=CLAIM_SECONDS)
+    with transaction.atomic():
+        entry_ids = list(
+            Notification.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='pending', is_digest=True, next_attempt_at__lte=now)
+            .values_list('id', flat=True)
+        )
+        for start in range(0, len(entry_ids), CLAIM_CHUNK_SIZE):
+            Notification.objects.filter(pk__in=entry_ids[start:start + CLAIM_CHUNK_SIZE]).update(next_attempt_at=lease)
+    return lease if entry_ids else None
+
+
+def _record_digest_failure(entries, attempts, error, now, max_attempts):
+    """Settle a failed summary the way _record_failure settles one notification"""
+    attempt = attempts + 1
+    if attempt >= max_attempts:
+        entries.update(status='failed', attempts=F('attempts') + 1, last_error=str(error))
+    else:
+        entries.update(attempts=F('attempts') + 1, last_error=str(error), next_attempt_at=now + retry_delay(attempt))
+
+
+def deliver_digests(max_attempts=MAX_ATTEMPTS):
+    """Send one summary per recipient for every due digest entry
+
+    Entries are claimed first, so overlapping runs never send the same
+    summary twice, and aggregated in the database, so the cost depends on
+    the number of owners rather than the number of responses. All summaries
+    share a single mail connection. Returns a (sent, failed) tuple counted in
+    messages.
+    """
+    now = timezone.now()
+    lease = claim_digests(now)
+    if lease is None:
+        return 0, 0
+
+    claimed = Notification.objects.filter(status='pending', is_digest=True, next_attempt_at=lease)
+    digests = {}
+    for row in (
+        claimed.values('recipient', 'form_id', 'form__title')
+        .annotate(count=Count('id'), url=Max('body'), attempts=Max('attempts'))
+        .order_by('recipient', 'form__title')
+    ):
+        digests.setdefault(row['recipient'], []).append(row)
+
+    sent = failed = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        # Could not reach the mail server at all; every summary counts as an attempt
+        for recipient, form_rows in digests.items():
+            attempts = max(row['attempts'] for row in form_rows)
+            _record_digest_failure(claimed.filter(recipient=recipient), attempts, e, now, max_attempts)
+        return 0, len(digests)
+
+    try:
+        for recipient, form_rows in digests.items():
+            entries = claimed.filter(recipient=recipient)
+            message = build_digest(recipient, form_rows)
+            message.connection = connection
+            try:
+                message.send()
+            except Exception as e:
+                _record_digest_failure(entries, max(row['attempts'] for row in form_rows), e, now, max_attempts)
+                failed += 1
+            else:
+                entries.update(status='sent', sent_at=timezone.now(), attempts=F('attempts') + 1, last_error=None)
+                sent += 1
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def deliver_pending(batch_size=100, max_attempts=MAX_ATTEMPTS):
+    """Drain every currently due notification
+
+    Digests share one connection; individual notifications use one per batch.
+    """
+    total_sent, total_failed = deliver_digests(max_attempts)
+    while True:
+        batch = claim_due(batch_size)
+        if not batch:
+            break
+        sent, failed = deliver(batch, max_attempts)
+        total_sent += sent
+        total_failed += failed
+    return total_sent, total_failed
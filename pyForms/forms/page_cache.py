@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils import timezone
+from .schema import get_form_schema, schema_version
+
+# Rendered into the cached HTML in place of the real token, swapped per request
+CSRF_PLACEHOLDER = 'pyformsCsrfTokenPlaceholder'
+
+PAGE_CACHE_TIMEOUT = getattr(settings, 'FORM_PAGE_CACHE_TIMEOUT', 60 * 60)
+
+HITS_KEY = 'form_page_cache:hits'
+MISSES_KEY = 'form_page_cache:misses'
+
+
+def page_cache_key(form_obj):
+    return f'form_page:{form_obj.uuid}:{schema_version(form_obj)}'
+
+
+def _timeout(form_obj):
+    """Never keep a page cached past the form's close date"""
+    timeout = PAGE_CACHE_TIMEOUT
+    if form_obj.close_date:
+        remaining = int((form_obj.close_date - timezone.now()).total_seconds())
+        timeout = max(1, min(timeout, remaining))
+    return timeout
+
+
+def _count(key):
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr(); losing one tick is fine
+        pass
+
+
+def render_form_page(form_obj):
+    """Render the public form with a placeholder instead of the CSRF token"""
+    schema = get_form_schema(form_obj)
+    return render_to_string('forms/form_public.html', {
+        'form': form_obj,
+        'questions': schema.questions,
+        'csrf_token': CSRF_PLACEHOLDER,
+    })
+
+
+def warm_form_page(form_obj):
+    """Render and cache the public page, if the form is currently accepting responses"""
+    if not form_obj.is_published or not form_obj.is_open:
+        return None
+    html = render_form_page(form_obj)
+    cache.set(page_cache_key(form_obj), html, _timeout(form_obj))
+    return html
+
+
+def evict_form_page(form_obj):
+    cache.delete(page_cache_key(form_obj))
+
+
+def get_form_page(request, form_obj):
+    """Return the public form HTML for this request, from cache when possible
+
+    The caller is responsible for checking that the form is published and open.
+    """
+    html = cache.get(page_cache_key(form_obj))
+    if html is None:
+        _count(MISSES_KEY)
+        html = warm_form_page(form_obj) or render_form_page(form_obj)
+    else:
+        _count(HITS_KEY)
+    return html.replace(CSRF_PLACEHOLDER, get_token(request))
+
+
+def page_cache_stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else None,
+    }
+
+
+def reset_page_cache_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
@@ -0,0 +1,30 @@
+"""A page of responses pivoted into one row per response, one cell per question"""
+from dataclasses import dataclass
+from django.db.models import Prefetch, prefetch_related_objects
+from .models import Answer
+
+
+@dataclass(frozen=True)
+class ResponseRow:
+    response: object
+    # Display text for each question, in question order; None when unanswered
+    cells: tuple
+
+
+def build_response_grid(responses, questions):
+    """Rows for a page of responses (two queries, whatever the page and form size)
+
+    Answers and their selected options are prefetched for the whole page and
+    pivoted by question id in a single pass.
+    """
+    responses = list(responses)
+    prefetch_related_objects(
+        responses,
+        Prefetch('answers', queryset=Answer.objects.order_by('id').prefetch_related('selected_options')),
+    )
+    question_ids = [question.id for question in questions]
+    rows = []
+    for response in responses:
+        by_question = {answer.question_id: answer.display_answer for answer in response.answers.all()}
+        rows.append(ResponseRow(response, tuple(by_question.get(question_id) for question_id in question_ids)))
+    return rows
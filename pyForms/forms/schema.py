@@ -0,0 +1,133 @@
+from dataclasses import dataclass, field
+from functools import cached_property
+from datetime import datetime, time
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from .models import Form, Option
+
+CHOICE_QUESTION_TYPES = ('multiple_choice', 'checkboxes', 'dropdown')
+
+# Seconds a compiled schema stays cached; edits change the key anyway
+SCHEMA_CACHE_TIMEOUT = getattr(settings, 'FORM_SCHEMA_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+@dataclass(frozen=True)
+class OptionSchema:
+    id: int
+    text: str
+
+
+@dataclass(frozen=True)
+class QuestionSchema:
+    id: int
+    text: str
+    help_text: str
+    question_type: str
+    is_required: bool
+    order: int
+    scale_min: int
+    scale_max: int
+    scale_min_label: str
+    scale_max_label: str
+    options: tuple = ()
+
+    @property
+    def field_name(self):
+        return f'question_{self.id}'
+
+    @property
+    def scale_values(self):
+        return range(self.scale_min, self.scale_max + 1)
+
+    def typed_columns(self, answer_text):
+        """Typed Answer columns for a text answer to this question; unparseable values stay null"""
+        if not answer_text:
+            return {}
+        try:
+            if self.question_type == 'linear_scale':
+                number = int(answer_text)
+                return {'answer_number': number} if number in self.scale_values else {}
+            if self.question_type == 'date':
+                return {'answer_date': datetime.strptime(answer_text, '%Y-%m-%d').date()}
+            if self.question_type == 'time':
+                return {'answer_time': time.fromisoformat(answer_text)}
+        except ValueError:
+            pass
+        return {}
+
+
+@dataclass(frozen=True)
+class FormSchema:
+    """Immutable snapshot of a form's questions and options"""
+    form_id: int
+    version: str
+    questions: tuple
+    # option id -> question id, used to validate submitted choices
+    option_map: dict = field(default_factory=dict, compare=False)
+
+    @cached_property
+    def _questions_by_id(self):
+        return {question.id: question for question in self.questions}
+
+    def question(self, question_id):
+        return self._questions_by_id.get(question_id)
+
+
+def schema_version(form_obj):
+    return str(int(form_obj.updated_at.timestamp() * 1_000_000))
+
+
+def schema_cache_key(form_obj):
+    return f'form_schema:{form_obj.uuid}:{schema_version(form_obj)}'
+
+
+def compile_form_schema(form_obj):
+    """Build a FormSchema from the database (two queries)"""
+    options_by_question = {}
+    option_map = {}
+    for option in Option.objects.filter(question__form=form_obj).order_by('order', 'id'):
+        options_by_question.setdefault(option.question_id, []).append(OptionSchema(option.id, option.text))
+        option_map[option.id] = option.question_id
+
+    questions = tuple(
+        QuestionSchema(
+            id=question.id,
+            text=question.text,
+            help_text=question.help_text or '',
+            question_type=question.question_type,
+            is_required=question.is_required,
+            order=question.order,
+            scale_min=question.scale_min or 1,
+            scale_max=question.scale_max or 5,
+            scale_min_label=question.scale_min_label or '',
+            scale_max_label=question.scale_max_label or '',
+            options=tuple(options_by_question.get(question.id, ())),
+        )
+        for question in form_obj.questions.all().order_by('order')
+    )
+    return FormSchema(form_obj.id, schema_version(form_obj), questions, option_map)
+
+
+def get_form_schema(form_obj):
+    """Return the cached schema for the form's current version, compiling it on a miss"""
+    key = schema_cache_key(form_obj)
+    schema = cache.get(key)
+    if schema is None:
+        schema = compile_form_schema(form_obj)
+        cache.set(key, schema, SCHEMA_CACHE_TIMEOUT)
+    return schema
+
+
+def invalidate_form_schema(form_obj):
+    """Drop the cached schema for the form's current version
+
+    Callers must save the form afterwards so ``updated_at`` (and with it the
+    schema version) moves on.
+    """
+    cache.delete(schema_cache_key(form_obj))
+
+
+def touch_form_schema(**lookup):
+    """Move the matching form's schema version on, e.g. after its questions were edited in the admin"""
+    Form.objects.filter(**lookup).update(updated_at=timezone.now())
@@ -0,0 +1,188 @@
+"""Full-text search and structured filters over a form's responses
+
+Answer text and the respondent name/email are indexed by the database:
+FTS5 tables kept in step by triggers on SQLite, GIN indexes over tsvector
+expressions on PostgreSQL (both created by migration 0012). Without either,
+search falls back to icontains scans. Filters on selected options and on
+the submission date compile to subqueries on indexed columns, and the
+result is an unordered Response queryset ready for keyset_page.
+"""
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from .models import Answer, Response
+
+SEARCH_TOKEN_RE = re.compile(r'\w+')
+
+# Longest search input used; anything beyond is ignored
+MAX_QUERY_TERMS = 10
+
+# The definition of the SQLite index. rebuild_search_index applies it, which
+# is also how a SQLite table rebuild (altering forms_answer or forms_response
+# in a migration) gets its dropped triggers back. Migration 0012 carries a
+# frozen copy; a change here needs a migration of its own.
+SQLITE_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS forms_answer_fts USING fts5(
+        answer_text, content='forms_answer', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS forms_answer_fts_insert AFTER INSERT ON forms_answer BEGIN
+        INSERT INTO forms_answer_fts(rowid, answer_text) VALUES (new.id, new.answer_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS forms_answer_fts_delete AFTER DELETE ON forms_answer BEGIN
+        INSERT INTO forms_answer_fts(forms_answer_fts, rowid, answer_text) VALUES ('delete', old.id, old.answer_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS forms_answer_fts_update AFTER UPDATE OF answer_text ON forms_answer BEGIN
+        INSERT INTO forms_answer_fts(forms_answer_fts, rowid, answer_text) VALUES ('delete', old.id, old.answer_text);
+        INSERT INTO forms_answer_fts(rowid, answer_text) VALUES (new.id, new.answer_text);
+    END""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS forms_response_fts USING fts5(
+        respondent_name, respondent_email, content='forms_response', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS forms_response_fts_insert AFTER INSERT ON forms_response BEGIN
+        INSERT INTO forms_response_fts(rowid, respondent_name, respondent_email)
+        VALUES (new.id, new.respondent_name, new.respondent_email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS forms_response_fts_delete AFTER DELETE ON forms_response BEGIN
+        INSERT INTO forms_response_fts(forms_response_fts, rowid, respondent_name, respondent_email)
+        VALUES ('delete', old.id, old.respondent_name, old.respondent_email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS forms_response_fts_update AFTER UPDATE OF respondent_name, respondent_email
+    ON forms_response BEGIN
+        INSERT INTO forms_response_fts(forms_response_fts, rowid, respondent_name, respondent_email)
+        VALUES ('delete', old.id, old.respondent_name, old.respondent_email);
+        INSERT INTO forms_response_fts(rowid, respondent_name, respondent_email)
+        VALUES (new.id, new.respondent_name, new.respondent_email);
+    END""",
+]
+
+SQLITE_REINDEX = [
+    "INSERT INTO forms_answer_fts(forms_answer_fts) VALUES ('rebuild')",
+    "INSERT INTO forms_response_fts(forms_response_fts) VALUES ('rebuild')",
+]
+
+SQLITE_MATCH = (
+    'SELECT forms_answer.response_id FROM forms_answer_fts '
+    'JOIN forms_answer ON forms_answer.id = forms_answer_fts.rowid WHERE forms_answer_fts MATCH %s '
+    'UNION SELECT rowid FROM forms_response_fts WHERE forms_response_fts MATCH %s'
+)
+
+# Must match the indexed expressions of migration 0012
+POSTGRES_MATCH = (
+    "SELECT response_id FROM forms_answer "
+    "WHERE to_tsvector('simple', coalesce(answer_text, '')) @@ to_tsquery('simple', %s) "
+    "UNION SELECT id FROM forms_response "
+    "WHERE to_tsvector('simple', coalesce(respondent_name, '') || ' ' || coalesce(respondent_email, '')) "
+    "@@ to_tsquery('simple', %s)"
+)
+
+
+@dataclass
+class ResponseFilters:
+    """Search text and structured filters taken from the query string"""
+    text: str = ''
+    option_ids: list = field(default_factory=list)
+    date_from: date = None
+    date_to: date = None
+
+    @classmethod
+    def from_query(cls, params):
+        """Parse request.GET, dropping values that do not parse"""
+        return cls(
+            text=params.get('q', '').strip(),
+            option_ids=[int(value) for value in params.getlist('option') if value.isdigit()],
+            date_from=_parse_date(params.get('from')),
+            date_to=_parse_date(params.get('to')),
+        )
+
+    def __bool__(self):
+        return bool(self.text or self.option_ids or self.date_from or self.date_to)
+
+    def query_params(self):
+        """The filters as (name, value) pairs, for links that keep them"""
+        params = [('q', self.text)] if self.text else []
+        params += [('option', option_id) for option_id in self.option_ids]
+        params += [(name, value.isoformat()) for name, value in (('from', self.date_from), ('to', self.date_to)) if value]
+        return params
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def search_terms(text):
+    return SEARCH_TOKEN_RE.findall(text.casefold())[:MAX_QUERY_TERMS]
+
+
+def search_backend():
+    """'fts5', 'postgresql' or 'like', depending on what the database offers"""
+    if connection.vendor == 'postgresql':
+        return 'postgresql'
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' "
+                "AND name IN ('forms_answer_fts', 'forms_response_fts')"
+            )
+            if cursor.fetchone()[0] == 2:
+                return 'fts5'
+    return 'like'
+
+
+def text_condition(text, backend=None):
+    """Q matching responses whose answers or respondent fields contain every search term (as a prefix)"""
+    terms = search_terms(text)
+    if not terms:
+        return Q()
+    backend = backend or search_backend()
+    if backend == 'fts5':
+        # Quoted terms cannot be read as FTS5 operators
+        query = ' '.join(f'"{term}"*' for term in terms)
+        return Q(id__in=RawSQL(SQLITE_MATCH, [query, query]))
+    if backend == 'postgresql':
+        query = ' & '.join(f'{term}:*' for term in terms)
+        return Q(id__in=RawSQL(POSTGRES_MATCH, [query, query]))
+
+    condition = Q()
+    for term in terms:
+        matching_answers = Answer.objects.filter(answer_text__icontains=term).values('response_id')
+        condition &= (
+            Q(id__in=matching_answers) | Q(respondent_name__icontains=term) | Q(respondent_email__icontains=term)
+        )
+    return condition
+
+
+def search_responses(form_obj, filters, backend=None):
+    """Unordered queryset of the form's responses matching `filters`"""
+    queryset = Response.objects.filter(form=form_obj)
+    if filters.text:
+        queryset = queryset.filter(text_condition(filters.text, backend))
+    through = Answer.selected_options.through
+    for option_id in filters.option_ids:
+        # One indexed lookup on the through table per option; options combine with AND
+        queryset = queryset.filter(id__in=through.objects.filter(option_id=option_id).values('answer__response_id'))
+    tz = timezone.get_default_timezone()
+    if filters.date_from:
+        queryset = queryset.filter(submitted_at__gte=datetime.combine(filters.date_from, time(0), tzinfo=tz))
+    if filters.date_to:
+        queryset = queryset.filter(
+            submitted_at__lt=datetime.combine(filters.date_to + timedelta(days=1), time(0), tzinfo=tz)
+        )
+    return queryset
+
+
+def rebuild_search_index():
+    """Recreate the SQLite FTS5 tables and triggers if missing and reindex everything"""
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        for statement in SQLITE_SCHEMA + SQLITE_REINDEX:
+            cursor.execute(statement)
+    return True
@@ -0,0 +1,139 @@
+from collections import Counter, defaultdict
+from django.contrib.auth.models import User
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from .analytics import touch_analytics
+from .counters import apply_deltas, option_key, removed_answer_deltas, response_deltas
+from .dashboard import add_responses, refresh_dashboard_stats
+from .export_jobs import job_file
+from .submissions import shift_response_count
+from .models import Answer, AnswerCounter, ExportJob, Form, Option, Question, Response
+from .schema import touch_form_schema
+from .text_index import apply_term_deltas, rebuild_text_index, removed_term_deltas, response_term_deltas
+from .timeseries import apply_bucket_deltas, bucket_deltas
+
+
+def _cascades_from(origin, *models):
+    """Whether a delete was started on one of `models`, as an instance or a queryset"""
+    if isinstance(origin, QuerySet):
+        return issubclass(origin.model, models)
+    return isinstance(origin, models)
+
+
+def _deleted_batch(origin, instance):
+    """The rows deleted together with `instance`, or None once its batch has been handled
+
+    pre_delete fires for every row before any row is deleted, so the first
+    row of a queryset delete (e.g. the admin's delete_selected) can take the
+    whole queryset out of the counters in one pass and the rest skip.
+    """
+    model = type(instance)
+    if not (isinstance(origin, QuerySet) and origin.model is model):
+        return model._base_manager.filter(pk=instance.pk)
+    if instance.pk in getattr(origin, '_handled_pks', ()):
+        return None
+    origin._handled_pks = set(origin.values_list('pk', flat=True))
+    return model._base_manager.filter(pk__in=origin.values('pk'))
+
+
+@receiver(pre_delete, sender=Response)
+def remove_response_from_counters(sender, instance, origin=None, **kwargs):
+    """Take deleted responses back out of their forms' response counts and the analytics, time series and dashboard counters"""
+    if _cascades_from(origin, Form, User):
+        # The whole form is going; its counters are deleted with its questions
+        return
+    responses = _deleted_batch(origin, instance)
+    if responses is None:
+        return
+    moments_by_form = defaultdict(list)
+    for form_id, submitted_at in responses.values_list('form_id', 'submitted_at'):
+        moments_by_form[form_id].append(submitted_at)
+
+    apply_deltas(response_deltas(responses))
+    apply_term_deltas(response_term_deltas(responses))
+    buckets = Counter()
+    for form_id, moments in moments_by_form.items():
+        buckets.update(bucket_deltas(form_id, moments, sign=-1))
+    apply_bucket_deltas(buckets)
+    for form_id, moments in moments_by_form.items():
+        shift_response_count(form_id, -len(moments))
+        add_responses(form_id, -len(moments))
+        touch_analytics(form_id)
+
+
+@receiver(pre_delete, sender=Answer)
+def remove_answer_from_counters(sender, instance, origin=None, **kwargs):
+    """Take answers deleted on their own, e.g. from the admin, back out of the analytics counters"""
+    if _cascades_from(origin, Response, Question, Form, User):
+        # Handled by the response's own hook, or the counters go with the question
+        return
+    answers = _deleted_batch(origin, instance)
+    if answers is None:
+        return
+    apply_deltas(removed_answer_deltas(answers))
+    apply_term_deltas(removed_term_deltas(answers))
+    for form_id in answers.order_by().values_list('question__form_id', flat=True).distinct():
+        touch_analytics(form_id)
+
+
+@receiver(pre_save, sender=Question)
+def remember_question_type(sender, instance, **kwargs):
+    instance._stored_question_type = (
+        Question.objects.filter(pk=instance.pk).values_list('question_type', flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Question)
+def recount_terms_on_type_change(sender, instance, created, **kwargs):
+    """Whether and how a text answer is indexed depends on the question type"""
+    stored_type = getattr(instance, '_stored_question_type', None)
+    if not created and stored_type is not None and stored_type != instance.question_type:
+        rebuild_text_index(instance.form, question=instance)
+        touch_analytics(instance.form_id)
+
+
+@receiver(post_save, sender=Form)
+def recount_dashboard_on_save(sender, instance, created, update_fields=None, **kwargs):
+    """New forms and publishing changes; saves that only touch other fields are skipped"""
+    if created or update_fields is None or 'is_published' in update_fields:
+        refresh_dashboard_stats(instance.user_id)
+
+
+@receiver(post_delete, sender=Form)
+def recount_dashboard_on_delete(sender, instance, origin=None, **kwargs):
+    if _cascades_from(origin, User):
+        # The user's DashboardStats row goes too
+        return
+    # Its responses were deleted with origin=Form and left the totals alone
+    refresh_dashboard_stats(instance.user_id)
+
+
+@receiver(post_delete, sender=Option)
+def remove_option_counter(sender, instance, origin=None, **kwargs):
+    if _cascades_from(origin, Form, Question, User):
+        # The question's counters are deleted with it
+        return
+    AnswerCounter.objects.filter(question_id=instance.question_id, key=option_key(instance.pk)).delete()
+    touch_form_schema(questions=instance.question_id)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def touch_schema_on_question_change(sender, instance, origin=None, **kwargs):
+    """Edits made outside the form views, e.g. in the admin, must reach the cached schema too"""
+    if not _cascades_from(origin, Form, User):
+        touch_form_schema(pk=instance.form_id)
+
+
+@receiver(post_save, sender=Option)
+def touch_schema_on_option_save(sender, instance, **kwargs):
+    touch_form_schema(questions=instance.question_id)
+
+
+@receiver(post_delete, sender=ExportJob)
+def remove_export_file(sender, instance, **kwargs):
+    path = job_file(instance)
+    if path is not None:
+        path.unlink(missing_ok=True)
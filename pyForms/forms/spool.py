@@ -0,0 +1,214 @@
+"""Write-behind spool for public form submissions
+
+When SUBMISSION_SPOOL_ENABLED is set, validated submissions are appended to a
+local WAL-mode SQLite file instead of the main database, and the
+``flush_submission_spool`` command drains them into Response/Answer rows in
+large batches. Every flushed Response records its spool id, so replaying a
+batch after a crash never creates duplicates. Entries that fail to save are
+moved to a dead_letter table in the same file instead of blocking the
+rest of the spool.
+"""
+import json
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+from pathlib import Path
+from django.conf import settings
+from django.utils import timezone
+from .models import Form, Response
+from .schema import get_form_schema
+from .submissions import ParsedAnswer, Submission, save_submissions
+
+_local = threading.local()
+
+
+def spool_enabled():
+    return getattr(settings, 'SUBMISSION_SPOOL_ENABLED', False)
+
+
+def spool_path():
+    return getattr(settings, 'SUBMISSION_SPOOL_PATH', Path(settings.BASE_DIR) / 'spool' / 'submissions.sqlite3')
+
+
+def connect(path=None):
+    """Per-thread connection to the spool file, created on first use"""
+    path = str(path or spool_path())
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    if path not in connections:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=FULL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS spool ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, form_id INTEGER NOT NULL, '
+            'responses_url TEXT, payload TEXT NOT NULL)'
+        )
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS dead_letter ('
+            'id INTEGER PRIMARY KEY, form_id INTEGER NOT NULL, responses_url TEXT, '
+            'payload TEXT NOT NULL, error TEXT NOT NULL, failed_at TEXT NOT NULL)'
+        )
+        # Start ids at the current time in microseconds, so a recreated spool
+        # file never reuses an id that is already recorded on a Response
+        conn.execute(
+            "INSERT INTO sqlite_sequence (name, seq) SELECT 'spool', ? "
+            "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'spool')",
+            (int(time.time() * 1_000_000),),
+        )
+        connections[path] = conn
+    return connections[path]
+
+
+def accepts(submission):
+    """File uploads have to be stored immediately, so they bypass the spool"""
+    return spool_enabled() and not submission.has_files
+
+
+def encode(submission):
+    return json.dumps({
+        'respondent_email': submission.respondent_email,
+        'respondent_name': submission.respondent_name,
+        'ip_address': submission.ip_address,
+        'user_agent': submission.user_agent,
+        'change_date': submission.change_date.isoformat(),
+        'submitted_at': submission.submitted_at.isoformat(),
+        'answers': [[a.question_id, a.answer_text, a.option_ids] for a in submission.answers],
+    })
+
+
+def decode(spool_id, payload):
+    data = json.loads(payload)
+    return Submission(
+        [ParsedAnswer(question_id, answer_text, option_ids) for question_id, answer_text, option_ids in data['answers']],
+        respondent_email=data['respondent_email'],
+        respondent_name=data['respondent_name'],
+        ip_address=data['ip_address'],
+        user_agent=data['user_agent'],
+        change_date=date.fromisoformat(data['change_date']),
+        submitted_at=datetime.fromisoformat(data['submitted_at']),
+        spool_id=spool_id,
+    )
+
+
+def append(form_obj, submission, responses_url=None, path=None):
+    """Durably record a submission; returns its spool id"""
+    cursor = connect(path).execute(
+        'INSERT INTO spool (form_id, responses_url, payload) VALUES (?, ?, ?)',
+        (form_obj.id, responses_url, encode(submission)),
+    )
+    return cursor.lastrowid
+
+
+def pending(path=None):
+    return connect(path).execute('SELECT COUNT(*) FROM spool').fetchone()[0]
+
+
+def dead_letters(path=None):
+    return connect(path).execute('SELECT COUNT(*) FROM dead_letter').fetchone()[0]
+
+
+def drop_stale_answers(schema, submission):
+    """Drop answers to questions or options deleted since the submission was spooled
+
+    The same answers parse_submission would have ignored had the edit come
+    first; an answer left without any of its options goes too.
+    """
+    answers = []
+    for parsed in submission.answers:
+        if schema.question(parsed.question_id) is None:
+            continue
+        option_ids = [
+            option_id for option_id in parsed.option_ids if schema.option_map.get(option_id) == parsed.question_id
+        ]
+        if parsed.option_ids and not option_ids:
+            continue
+        parsed.option_ids = option_ids
+        answers.append(parsed)
+    submission.answers = answers
+    return submission
+
+
+def _describe(error):
+    return f'{type(error).__name__}: {error}'
+
+
+def _save(form_obj, submissions, responses_url):
+    """Save a form's share of the batch; {spool id: error} for entries that fail
+
+    The group is written in one transaction. If that fails, its entries are
+    retried one transaction each, so a single bad entry cannot hold back the
+    others. Any error counts, not only constraint violations: an entry left at
+    the head of the spool would be retried, and block the spool, forever.
+    """
+    try:
+        save_submissions(form_obj, submissions, responses_url)
+        return {}
+    except Exception as e:
+        if len(submissions) == 1:
+            return {submissions[0].spool_id: _describe(e)}
+    rejected = {}
+    for submission in submissions:
+        try:
+            save_submissions(form_obj, [submission], responses_url)
+        except Exception as e:
+            rejected[submission.spool_id] = _describe(e)
+    return rejected
+
+
+def flush(batch_size=500, path=None):
+    """Move up to batch_size spooled submissions into the main database
+
+    Each form's share of the batch is written in one transaction, falling
+    back to one entry at a time when it fails; entries that still fail are
+    moved to dead_letter with their error. Spool rows are only deleted after
+    the commits; if the process dies in between, the next flush finds the
+    already-saved spool ids and skips them. Run a single flusher per spool
+    file. Returns the number of spool entries consumed.
+    """
+    conn = connect(path)
+    rows = conn.execute(
+        'SELECT id, form_id, responses_url, payload FROM spool ORDER BY id LIMIT ?', (batch_size,)
+    ).fetchall()
+    if not rows:
+        return 0
+
+    spool_ids = [row[0] for row in rows]
+    already_saved = set(Response.objects.filter(spool_id__in=spool_ids).values_list('spool_id', flat=True))
+    forms = Form.objects.select_related('user').in_bulk({row[1] for row in rows})
+
+    by_form = {}
+    for spool_id, form_id, responses_url, payload in rows:
+        if spool_id in already_saved or form_id not in forms:
+            continue
+        by_form.setdefault((form_id, responses_url), []).append(decode(spool_id, payload))
+
+    rejected = {}
+    for (form_id, responses_url), submissions in by_form.items():
+        form_obj = forms[form_id]
+        schema = get_form_schema(form_obj)
+        submissions = [drop_stale_answers(schema, submission) for submission in submissions]
+        rejected.update(_save(form_obj, submissions, responses_url))
+
+    if rejected:
+        failed_at = timezone.now().isoformat()
+        # OR REPLACE: a replay after a crash moves the same entries again
+        conn.executemany(
+            'INSERT OR REPLACE INTO dead_letter (id, form_id, responses_url, payload, error, failed_at) '
+            'SELECT id, form_id, responses_url, payload, ?, ? FROM spool WHERE id = ?',
+            [(error, failed_at, spool_id) for spool_id, error in rejected.items()],
+        )
+    conn.execute('DELETE FROM spool WHERE id <= ?', (spool_ids[-1],))
+    return len(rows)
+
+
+def flush_all(batch_size=500, path=None):
+    total = 0
+    while True:
+        flushed = flush(batch_size, path)
+        if not flushed:
+            return total
+        total += flushed
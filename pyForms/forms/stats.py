@@ -0,0 +1,134 @@
+"""Summary statistics for linear scale answers
+
+Scale answers are small integers on a known range, so a histogram with one
+slot per scale value is a complete summary: mean, standard deviation, exact
+percentiles and net-promoter buckets all come from it in O(scale size),
+however many answers were added.
+"""
+import math
+from collections import Counter
+
+# Net-promoter style buckets as fractions of the scale span; on a 0-10 scale
+# these are the usual 9-10 promoters and 7-8 passives
+PROMOTER_FROM = 0.9
+PASSIVE_FROM = 0.7
+
+DEFAULT_PERCENTILES = (10, 25, 50, 75, 90)
+
+
+class ScaleStats:
+    """One-pass, bounded-memory statistics for answers on an integer scale"""
+
+    def __init__(self, scale_min=1, scale_max=5):
+        self.scale_min = scale_min
+        self.scale_max = scale_max
+        # An inverted range (a question saved with min > max) is an empty
+        # scale: no values, no answers, None for every statistic
+        self.histogram = [0] * max(scale_max - scale_min + 1, 0)
+        self.count = 0
+
+    @classmethod
+    def from_counts(cls, scale_min, scale_max, counts):
+        """Build from a {value: count} mapping; values outside the scale are ignored"""
+        stats = cls(scale_min, scale_max)
+        for value, count in counts.items():
+            if scale_min <= value <= scale_max:
+                stats.add(value, count)
+        return stats
+
+    @property
+    def values(self):
+        return range(self.scale_min, self.scale_max + 1)
+
+    def add(self, value, count=1):
+        index = value - self.scale_min
+        if not 0 <= index < len(self.histogram):
+            raise ValueError(f'{value} is outside the scale {self.scale_min}..{self.scale_max}')
+        self.histogram[index] += count
+        self.count += count
+
+    def update(self, values):
+        """Add every value of an iterable, counting in C before touching the histogram"""
+        for value, count in Counter(values).items():
+            self.add(value, count)
+
+    def merge(self, other):
+        if (other.scale_min, other.scale_max) != (self.scale_min, self.scale_max):
+            raise ValueError('Cannot merge statistics for different scales')
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+        self.count += other.count
+        return self
+
+    @property
+    def mean(self):
+        if not self.count:
+            return None
+        return sum(value * count for value, count in zip(self.values, self.histogram)) / self.count
+
+    @property
+    def std(self):
+        """Population standard deviation, from exact integer sums"""
+        if not self.count:
+            return None
+        total = sum(value * count for value, count in zip(self.values, self.histogram))
+        squares = sum(value * value * count for value, count in zip(self.values, self.histogram))
+        return math.sqrt(self.count * squares - total * total) / self.count
+
+    def _value_at(self, rank):
+        """The rank-th smallest answer (0-based)"""
+        seen = 0
+        for value, count in zip(self.values, self.histogram):
+            seen += count
+            if rank < seen:
+                return value
+        return self.scale_max
+
+    def percentile(self, p):
+        """Percentile with linear interpolation between answers, like numpy's default"""
+        if not self.count:
+            return None
+        position = (self.count - 1) * p / 100
+        lower = math.floor(position)
+        low, high = self._value_at(lower), self._value_at(min(lower + 1, self.count - 1))
+        return low + (high - low) * (position - lower)
+
+    @property
+    def median(self):
+        return self.percentile(50)
+
+    def buckets(self):
+        span = self.scale_max - self.scale_min
+        promoter_from = self.scale_min + PROMOTER_FROM * span
+        passive_from = self.scale_min + PASSIVE_FROM * span
+        buckets = {'promoters': 0, 'passives': 0, 'detractors': 0}
+        for value, count in zip(self.values, self.histogram):
+            if value >= promoter_from:
+                buckets['promoters'] += count
+            elif value >= passive_from:
+                buckets['passives'] += count
+            else:
+                buckets['detractors'] += count
+        return buckets
+
+    @property
+    def nps(self):
+        """Percentage of promoters minus percentage of detractors"""
+        if not self.count:
+            return None
+        buckets = self.buckets()
+        return 100 * (buckets['promoters'] - buckets['detractors']) / self.count
+
+    def as_dict(self, percentiles=DEFAULT_PERCENTILES):
+        def rounded(value):
+            return None if value is None else round(value, 4)
+
+        return {
+            'count': self.count,
+            'mean': rounded(self.mean),
+            'median': rounded(self.median),
+            'std': rounded(self.std),
+            'percentiles': {str(p): rounded(self.percentile(p)) for p in percentiles},
+            'buckets': self.buckets(),
+            'nps': rounded(self.nps),
+            'histogram': dict(zip((str(value) for value in self.values), self.histogram)),
+        }
@@ -0,0 +1,241 @@
+from collections import Counter
+from datetime import date, datetime
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from .counters import answer_deltas, apply_deltas
+from .dashboard import add_responses
+from .models import Form, Response, Answer, ChangeRollup
+from .notifications import enqueue_response_notification
+from .schema import get_form_schema
+from .text_index import apply_term_deltas, term_deltas
+from .timeseries import apply_bucket_deltas, bucket_deltas
+
+CHOICE_TYPES = ['multiple_choice', 'dropdown']
+
+
+class ParsedAnswer:
+    """A single validated answer, ready to be written"""
+
+    __slots__ = ('question_id', 'answer_text', 'option_ids', 'file_upload')
+
+    def __init__(self, question_id, answer_text=None, option_ids=(), file_upload=None):
+        self.question_id = question_id
+        self.answer_text = answer_text
+        self.option_ids = list(option_ids)
+        self.file_upload = file_upload
+
+
+class Submission:
+    """A validated form submission held in memory before it is saved"""
+
+    def __init__(self, answers, respondent_email=None, respondent_name='', ip_address=None, user_agent='',
+                 change_date=None, submitted_at=None, spool_id=None):
+        self.answers = answers
+        self.respondent_email = respondent_email
+        self.respondent_name = respondent_name
+        self.ip_address = ip_address
+        self.user_agent = user_agent
+        self.change_date = change_date or date.today()
+        self.submitted_at = submitted_at or timezone.now()
+        # Set when the submission was replayed from the write-behind spool
+        self.spool_id = spool_id
+
+    @property
+    def has_files(self):
+        return any(parsed.file_upload for parsed in self.answers)
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_change_date(value):
+    """The respondent-chosen change date, falling back to today"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return date.today()
+
+
+def parse_submission(form_obj, schema, post, files, meta):
+    """Validate POST data against the form's compiled schema without touching the database
+
+    Option ids that are malformed or belong to another question are ignored,
+    matching the old behaviour of skipping unknown options.
+    """
+    option_map = schema.option_map
+
+    answers = []
+    for question in schema.questions:
+        field_name = question.field_name
+
+        if question.question_type in CHOICE_TYPES:
+            option_id = _to_int(post.get(field_name))
+            if option_id is not None and option_map.get(option_id) == question.id:
+                answers.append(ParsedAnswer(question.id, option_ids=[option_id]))
+
+        elif question.question_type == 'checkboxes':
+            option_ids = []
+            for value in post.getlist(field_name):
+                option_id = _to_int(value)
+                if option_id is not None and option_map.get(option_id) == question.id and option_id not in option_ids:
+                    option_ids.append(option_id)
+            if post.getlist(field_name):
+                answers.append(ParsedAnswer(question.id, option_ids=option_ids))
+
+        elif question.question_type == 'file_upload':
+            if field_name in files:
+                answers.append(ParsedAnswer(question.id, file_upload=files[field_name]))
+
+        else:  # Text-based answers (short_text, long_text, date, time, linear_scale)
+            value = post.get(field_name, '').strip()
+            if value:
+                answers.append(ParsedAnswer(question.id, answer_text=value))
+
+    return Submission(
+        answers,
+        respondent_email=post.get('respondent_email', '') if form_obj.collect_email else None,
+        respondent_name=post.get('respondent_name', ''),
+        ip_address=meta.get('REMOTE_ADDR'),
+        user_agent=meta.get('HTTP_USER_AGENT', ''),
+        change_date=parse_change_date(post.get('change_date')),
+    )
+
+
+def record_changes(form_obj, change_dates):
+    """Add submissions to the per-day rollup counters
+
+    One UPDATE per distinct date; the row is only inserted the first time a
+    form sees a given date.
+    """
+    for change_date, count in Counter(change_dates).items():
+        rollup = ChangeRollup.objects.filter(form=form_obj, change_date=change_date)
+        if rollup.update(count=F('count') + count):
+            continue
+        try:
+            with transaction.atomic():
+                ChangeRollup.objects.create(form=form_obj, change_date=change_date, count=count)
+        except IntegrityError:
+            # Another request created the row first
+            rollup.update(count=F('count') + count)
+
+
+def _actual_response_counts():
+    return Coalesce(Subquery(
+        Response.objects.filter(form=OuterRef('pk')).order_by().values('form').annotate(n=Count('id')).values('n')
+    ), 0)
+
+
+def shift_response_count(form_id, count):
+    """Move Form.response_count by `count` in place"""
+    if count >= 0:
+        Form.objects.filter(pk=form_id).update(response_count=F('response_count') + count)
+    else:
+        # A count that has drifted low must not make a delete fail
+        Form.objects.filter(pk=form_id).update(response_count=Greatest(F('response_count') + count, 0))
+
+
+def reconcile_response_counts(forms=None, check=False):
+    """{form id: (stored, actual)} for forms whose response_count is off, fixing them unless `check`"""
+    forms = Form.objects.all() if forms is None else forms
+    mismatched = {
+        form_id: (stored, actual)
+        for form_id, stored, actual in (
+            forms
+            .annotate(actual=_actual_response_counts())
+            .exclude(response_count=F('actual'))
+            .values_list('id', 'response_count', 'actual')
+            .order_by('id')
+        )
+    }
+    if mismatched and not check:
+        # Recounted inside the UPDATE, so submissions since the check are included
+        Form.objects.filter(pk__in=list(mismatched)).update(response_count=_actual_response_counts())
+    return mismatched
+
+
+def _typed_columns(schema, parsed):
+    question = schema.question(parsed.question_id)
+    return question.typed_columns(parsed.answer_text) if question else {}
+
+
+def _question_type(schema, question_id):
+    question = schema.question(question_id)
+    return question.question_type if question else None
+
+
+def save_submissions(form_obj, submissions, responses_url=None):
+    """Write a batch of submissions for one form in a single transaction
+
+    Responses, Answers and selected-option links are written with
+    bulk_create, and the form's response count and the hourly/daily response,
+    analytics, text-term and dashboard counters are bumped in place, so those
+    writes take a fixed number of queries whatever the size of the batch (up
+    to UPDATE_CHUNK_SIZE counter keys). The daily change rollup costs one
+    UPDATE per distinct change date in the batch. Typed answer columns come
+    from the cached form schema. When responses_url is given the owner's
+    notifications are queued in the same transaction.
+    """
+    through = Answer.selected_options.through
+    schema = get_form_schema(form_obj) if any(submission.answers for submission in submissions) else None
+
+    with transaction.atomic():
+        responses = Response.objects.bulk_create([
+            Response(
+                form=form_obj,
+                submitted_at=submission.submitted_at,
+                respondent_email=submission.respondent_email,
+                respondent_name=submission.respondent_name,
+                ip_address=submission.ip_address,
+                user_agent=submission.user_agent,
+                spool_id=submission.spool_id,
+            )
+            for submission in submissions
+        ])
+
+        pairs = [
+            (Answer(
+                response=response,
+                question_id=parsed.question_id,
+                answer_text=parsed.answer_text,
+                file_upload=parsed.file_upload,
+                **_typed_columns(schema, parsed),
+            ), parsed)
+            for response, submission in zip(responses, submissions)
+            for parsed in submission.answers
+        ]
+        answers = Answer.objects.bulk_create([answer for answer, _ in pairs])
+
+        links = [
+            through(answer_id=answer.id, option_id=option_id)
+            for answer, (_, parsed) in zip(answers, pairs)
+            for option_id in parsed.option_ids
+        ]
+        if links:
+            through.objects.bulk_create(links)
+
+        record_changes(form_obj, [submission.change_date for submission in submissions])
+        apply_bucket_deltas(bucket_deltas(form_obj.id, [submission.submitted_at for submission in submissions]))
+        apply_deltas(answer_deltas(
+            (answer.question_id, answer.answer_number, parsed.option_ids) for answer, parsed in pairs
+        ))
+        apply_term_deltas(term_deltas(
+            (answer.question_id, _question_type(schema, answer.question_id), answer.answer_text) for answer, _ in pairs
+        ))
+        shift_response_count(form_obj.id, len(responses))
+        add_responses(form_obj.id, len(responses))
+
+        if responses_url:
+            enqueue_response_notification(form_obj, responses_url, count=len(submissions))
+
+    return responses
+
+
+def save_submission(form_obj, submission, responses_url=None):
+    """Write one submission; see save_submissions"""
+    return save_submissions(form_obj, [submission], responses_url)[0]
@@ -1,3 +1,1690 @@
 from django.test import TestCase
 
 # Create your tests here.
+import csv
+import io
+import json
+import math
+import re
+import statistics
+import socketserver
+import tempfile
+import threading
+import zipfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from concurrent.futures import Future
+from unittest import mock, skipUnless
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, OperationalError, connection
+from django.db.models import Avg
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import UserProfile
+from .models import (
+    Form, Question, Option, Response, Answer, AnswerCounter, ChangeRollup, DashboardStats, ExportJob, Notification,
+    ResponseBucket, TextTermCount,
+)
+from . import spool
+from . import crosstab
+from .analytics import check_counters, form_analytics_data
+from .dashboard import refresh_dashboard_stats
+from . import export_jobs, exports
+from .exports import iter_responses, stream_csv
+from .crosstab import CrosstabError, build_crosstab, chi_square, chi_square_p_value, contingency_table, fetch_codes
+from .notifications import claim_digests, deliver_digests, deliver_pending, digest_deadline
+from . import pagination
+from .pagination import EstimatedCountPaginator, estimated_row_count, keyset_page
+from .page_cache import CSRF_PLACEHOLDER, page_cache_key, page_cache_stats, reset_page_cache_stats
+from .schema import get_form_schema
+from .search import ResponseFilters, rebuild_search_index, search_backend, search_responses
+from .stats import ScaleStats
+from .text_index import check_text_index, tokenize, top_terms
+from .timeseries import backfill_buckets, series
+from .submissions import ParsedAnswer, Submission, reconcile_response_counts, save_submissions
+
+
+class SubmissionTestMixin:
+    """Helpers for building forms and posting responses in tests"""
+
+    def make_form(self, num_questions, **kwargs):
+        self.user, _ = User.objects.get_or_create(username='owner')
+        form_obj = Form.objects.create(user=self.user, title='Survey', is_published=True, **kwargs)
+        types = ['short_text', 'checkboxes', 'multiple_choice', 'linear_scale']
+        for i in range(num_questions):
+            question = Question.objects.create(
+                form=form_obj, text=f'Q{i}', question_type=types[i % len(types)], order=i,
+            )
+            if question.question_type in ('checkboxes', 'multiple_choice'):
+                for j in range(4):
+                    Option.objects.create(question=question, text=f'Option {j}', order=j)
+        return form_obj
+
+    def answer_all(self, form_obj):
+        data = {}
+        for question in form_obj.questions.all():
+            field_name = f'question_{question.id}'
+            option_ids = [str(option.id) for option in question.options.all()]
+            if question.question_type == 'checkboxes':
+                data[field_name] = option_ids[:2]
+            elif question.question_type == 'multiple_choice':
+                data[field_name] = option_ids[0]
+            elif question.question_type == 'linear_scale':
+                data[field_name] = '4'
+            else:
+                data[field_name] = 'Hello world'
+        return data
+
+    def submit(self, form_obj, data):
+        return self.client.post(reverse('form_public_view', kwargs={'form_uuid': form_obj.uuid}), data)
+
+
+class SubmissionEngineTests(SubmissionTestMixin, TestCase):
+
+    def count_submission_queries(self, num_questions):
+        form_obj = self.make_form(num_questions)
+        data = self.answer_all(form_obj)
+        with CaptureQueriesContext(connection) as ctx:
+            self.submit(form_obj, data)
+        return len(ctx.captured_queries)
+
+    def test_query_count_is_constant(self):
+        self.assertEqual(self.count_submission_queries(4), self.count_submission_queries(40))
+
+    def test_answers_and_options_are_saved(self):
+        form_obj = self.make_form(4)
+        self.submit(form_obj, self.answer_all(form_obj))
+
+        response = Response.objects.get(form=form_obj)
+        answers = {answer.question.question_type: answer for answer in response.answers.all()}
+        self.assertEqual(answers['short_text'].answer_text, 'Hello world')
+        self.assertEqual(answers['linear_scale'].answer_text, '4')
+        self.assertEqual(answers['checkboxes'].selected_options.count(), 2)
+        self.assertEqual(answers['multiple_choice'].selected_options.count(), 1)
+
+    def test_options_from_other_questions_are_ignored(self):
+        form_obj = self.make_form(4)
+        other = self.make_form(4)
+        foreign = Option.objects.filter(question__form=other).first()
+        data = self.answer_all(form_obj)
+        choice = form_obj.questions.get(question_type='multiple_choice')
+        data[f'question_{choice.id}'] = str(foreign.id)
+        self.submit(form_obj, data)
+
+        self.assertFalse(Answer.objects.filter(question=choice).exists())
+
+    def test_failed_submission_leaves_no_partial_response(self):
+        form_obj = self.make_form(4)
+        with mock.patch('forms.models.Answer.objects.bulk_create', side_effect=RuntimeError):
+            response = self.submit(form_obj, self.answer_all(form_obj))
+
+        self.assertContains(response, 'There was an error submitting your response')
+        self.assertFalse(Response.objects.filter(form=form_obj).exists())
+
+
+class ChangeRollupTests(SubmissionTestMixin, TestCase):
+
+    def test_submissions_share_one_row_per_day(self):
+        form_obj = self.make_form(2)
+        data = self.answer_all(form_obj)
+        for change_date in ['2026-03-01', '2026-03-01', '2026-03-01', '2026-03-02']:
+            self.submit(form_obj, {**data, 'change_date': change_date})
+
+        counts = dict(ChangeRollup.objects.filter(form=form_obj).values_list('change_date', 'count'))
+        self.assertEqual(counts, {date(2026, 3, 1): 3, date(2026, 3, 2): 1})
+
+    def test_batch_is_counted_per_date(self):
+        form_obj = self.make_form(1)
+        ChangeRollup.objects.create(form=form_obj, change_date=date(2026, 3, 1), count=5)
+        submissions = [Submission([], change_date=date(2026, 3, d)) for d in (1, 1, 2)]
+
+        # One update per date, plus the insert for the date seen for the first time
+        with CaptureQueriesContext(connection) as ctx:
+            save_submissions(form_obj, submissions)
+        rollup_queries = [q for q in ctx.captured_queries if 'forms_changerollup' in q['sql']]
+        self.assertEqual(len(rollup_queries), 3)
+
+        counts = dict(ChangeRollup.objects.filter(form=form_obj).values_list('change_date', 'count'))
+        self.assertEqual(counts, {date(2026, 3, 1): 7, date(2026, 3, 2): 1})
+
+
+class FormSchemaTests(SubmissionTestMixin, TestCase):
+
+    def setUp(self):
+        self.form_obj = self.make_form(8)
+        self.url = reverse('form_public_view', kwargs={'form_uuid': self.form_obj.uuid})
+
+    def test_cached_schema_needs_no_schema_queries(self):
+        self.client.get(self.url)
+        # Only the form lookup itself remains
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Option 3')
+
+    def test_schema_contains_options_and_scale_values(self):
+        schema = get_form_schema(self.form_obj)
+        scale = next(q for q in schema.questions if q.question_type == 'linear_scale')
+        choice = next(q for q in schema.questions if q.question_type == 'multiple_choice')
+        self.assertEqual(list(scale.scale_values), [1, 2, 3, 4, 5])
+        self.assertEqual([option.text for option in choice.options], ['Option 0', 'Option 1', 'Option 2', 'Option 3'])
+        self.assertEqual(schema.option_map[choice.options[0].id], choice.id)
+
+    def test_editing_questions_invalidates_schema(self):
+        self.client.force_login(self.user)
+        self.client.get(self.url)
+        self.client.post(
+            reverse('add_question', kwargs={'form_uuid': self.form_obj.uuid}),
+            data='{"text": "Brand new question", "question_type": "short_text"}',
+            content_type='application/json',
+        )
+        self.assertContains(self.client.get(self.url), 'Brand new question')
+
+        question = self.form_obj.questions.get(text='Brand new question')
+        self.client.delete(reverse('delete_question', kwargs={'question_id': question.id}))
+        self.assertNotContains(self.client.get(self.url), 'Brand new question')
+
+    def test_edits_outside_the_views_invalidate_schema(self):
+        # As the admin's list_editable and option inline do
+        self.client.get(self.url)
+        question = self.form_obj.questions.filter(question_type='multiple_choice').first()
+        question.text = 'Renamed in the admin'
+        question.save()
+        self.assertContains(self.client.get(self.url), 'Renamed in the admin')
+
+        option = question.options.get(text='Option 3')
+        option.text = 'Option three'
+        option.save()
+        self.assertContains(self.client.get(self.url), 'Option three')
+
+        option.delete()
+        self.assertNotContains(self.client.get(self.url), 'Option three')
+        self.form_obj.refresh_from_db()
+        self.assertEqual(len(get_form_schema(self.form_obj).question(question.id).options), 3)
+
+
+class FormPageCacheTests(SubmissionTestMixin, TestCase):
+
+    def setUp(self):
+        self.form_obj = self.make_form(4)
+        self.url = reverse('form_public_view', kwargs={'form_uuid': self.form_obj.uuid})
+        reset_page_cache_stats()
+
+    def test_cached_page_gets_a_fresh_csrf_token(self):
+        client = self.client_class(enforce_csrf_checks=True)
+        client.get(self.url)
+        page = client.get(self.url).content.decode()
+
+        self.assertNotIn(CSRF_PLACEHOLDER, page)
+        token = page.split('name="csrfmiddlewaretoken" value="')[1].split('"')[0]
+        data = self.answer_all(self.form_obj)
+        data['csrfmiddlewaretoken'] = token
+        response = client.post(self.url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Response.objects.filter(form=self.form_obj).count(), 1)
+
+    def test_hits_and_misses_are_counted(self):
+        for _ in range(3):
+            self.client.get(self.url)
+        self.assertEqual(page_cache_stats(), {'hits': 2, 'misses': 1, 'hit_rate': 0.6667})
+
+    def test_publish_warms_and_unpublish_evicts(self):
+        self.client.force_login(self.user)
+        publish_url = reverse('publish_form', kwargs={'form_uuid': self.form_obj.uuid})
+
+        self.client.get(publish_url)
+        self.form_obj.refresh_from_db()
+        self.assertFalse(self.form_obj.is_published)
+        self.assertIsNone(cache.get(page_cache_key(self.form_obj)))
+
+        self.client.get(publish_url)
+        self.form_obj.refresh_from_db()
+        self.assertIn(CSRF_PLACEHOLDER, cache.get(page_cache_key(self.form_obj)))
+
+    def test_closed_form_is_not_served_from_cache(self):
+        self.client.get(self.url)
+        Form.objects.filter(pk=self.form_obj.pk).update(close_date=timezone.now() - timezone.timedelta(days=1))
+        self.assertTemplateUsed(self.client.get(self.url), 'forms/form_closed.html')
+
+
+class NotificationQueueTests(SubmissionTestMixin, TestCase):
+
+    def setUp(self):
+        self.form_obj = self.make_form(2)
+        self.user.email = 'owner@example.com'
+        self.user.save()
+
+    def test_submission_only_enqueues(self):
+        self.submit(self.form_obj, self.answer_all(self.form_obj))
+
+        self.assertEqual(len(mail.outbox), 0)
+        notification = Notification.objects.get()
+        self.assertEqual(notification.status, 'pending')
+        self.assertIn(str(self.form_obj.uuid), notification.body)
+
+    def test_worker_sends_batch_over_one_connection(self):
+        for _ in range(5):
+            self.submit(self.form_obj, self.answer_all(self.form_obj))
+
+        with mock.patch('forms.notifications.get_connection', wraps=mail.get_connection) as get_connection:
+            self.assertEqual(deliver_pending(batch_size=10), (5, 0))
+        self.assertEqual(get_connection.call_count, 1)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(Notification.objects.exclude(status='sent').exists())
+
+    def test_failed_delivery_is_retried_with_backoff(self):
+        self.submit(self.form_obj, self.answer_all(self.form_obj))
+
+        with mock.patch('django.core.mail.EmailMessage.send', side_effect=OSError('SMTP down')):
+            self.assertEqual(deliver_pending(), (0, 1))
+        notification = Notification.objects.get()
+        self.assertEqual(notification.status, 'pending')
+        self.assertEqual(notification.attempts, 1)
+        self.assertEqual(notification.last_error, 'SMTP down')
+        self.assertGreater(notification.next_attempt_at, timezone.now())
+
+        # Not due yet, so a second run leaves it alone
+        self.assertEqual(deliver_pending(), (0, 0))
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """Minimal SMTP stand-in that records connections and delivered messages"""
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        self.connections = 0
+        self.messages = []
+        super().__init__(('127.0.0.1', 0), LocalSMTPHandler)
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
+class LocalSMTPHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 localhost stand-in')
+        while True:
+            line = self.rfile.readline().decode().strip()
+            command = line[:4].upper()
+            if not line or command == 'QUIT':
+                self.reply('221 bye')
+                return
+            if command == 'DATA':
+                self.reply('354 go ahead')
+                body = []
+                while (data := self.rfile.readline().decode()) not in ('.\r\n', ''):
+                    body.append(data)
+                self.server.messages.append(''.join(body))
+            self.reply('250 ok')
+
+
+class NotificationDigestTests(SubmissionTestMixin, TestCase):
+
+    def setUp(self):
+        self.form_obj = self.make_form(2)
+        self.user.email = 'owner@example.com'
+        self.user.save()
+        self.profile = UserProfile.objects.create(user=self.user, notification_digest_minutes=60)
+
+    def test_profile_opt_out_is_respected(self):
+        self.profile.email_notifications = False
+        self.profile.save()
+        self.submit(self.form_obj, self.answer_all(self.form_obj))
+        self.assertFalse(Notification.objects.exists())
+
+    def test_digest_entry_waits_for_window(self):
+        self.submit(self.form_obj, self.answer_all(self.form_obj))
+        notification = Notification.objects.get()
+        self.assertTrue(notification.is_digest)
+        self.assertEqual(notification.next_attempt_at, digest_deadline(notification.created_at, 60))
+        self.assertEqual(deliver_pending(), (0, 0))
+
+    def test_ten_thousand_responses_become_a_handful_of_messages(self):
+        owners = [self.user] + [
+            User.objects.create(username=f'owner{i}', email=f'owner{i}@example.com') for i in range(2)
+        ]
+        forms_by_owner = [
+            Form.objects.create(user=owner, title=f'Form {i}', is_published=True)
+            for owner in owners for i in range(2)
+        ]
+        due = timezone.now() - timezone.timedelta(minutes=1)
+        Notification.objects.bulk_create([
+            Notification(form=form_obj, recipient=form_obj.user.email, subject='New Response',
+                         body='http://testserver/responses/', is_digest=True, next_attempt_at=due)
+            for i in range(10_000)
+            for form_obj in [forms_by_owner[i % len(forms_by_owner)]]
+        ], batch_size=1000)
+
+        with LocalSMTPServer() as server, override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=server.server_address[1], EMAIL_USE_TLS=False,
+        ):
+            self.assertEqual(deliver_pending(), (3, 0))
+
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(len(server.messages), 3)
+        totals = [int(re.search(r'You have received (\d+) new', message).group(1)) for message in server.messages]
+        self.assertEqual(sum(totals), 10_000)
+        self.assertFalse(Notification.objects.filter(status='pending').exists())
+
+    def due_entries(self, count):
+        due = timezone.now() - timezone.timedelta(minutes=1)
+        Notification.objects.bulk_create([
+            Notification(form=self.form_obj, recipient=self.user.email, subject='New Response',
+                         body='http://testserver/responses/', is_digest=True, next_attempt_at=due)
+            for _ in range(count)
+        ])
+
+    def test_claimed_entries_are_skipped_by_an_overlapping_run(self):
+        self.due_entries(3)
+        # Another worker got there first
+        self.assertIsNotNone(claim_digests(timezone.now()))
+        self.assertEqual(deliver_digests(), (0, 0))
+        self.assertEqual(len(mail.outbox), 0)
+
+        self.due_entries(2)
+        self.assertEqual(deliver_digests(), (1, 0))
+        self.assertIn('received 2 new', mail.outbox[0].body)
+        self.assertEqual(Notification.objects.filter(status='pending').count(), 3)
+
+    def test_unreachable_relay_gives_up_after_max_attempts(self):
+        self.due_entries(2)
+        relay = mock.Mock()
+        relay.open.side_effect = OSError('Connection refused')
+        with mock.patch('forms.notifications.get_connection', return_value=relay):
+            for attempt in range(1, 4):
+                self.assertEqual(deliver_digests(max_attempts=3), (0, 1))
+                self.assertEqual(set(Notification.objects.values_list('attempts', flat=True)), {attempt})
+                Notification.objects.update(next_attempt_at=timezone.now() - timezone.timedelta(seconds=1))
+        self.assertEqual(set(Notification.objects.values_list('status', flat=True)), {'failed'})
+        self.assertEqual(deliver_digests(max_attempts=3), (0, 0))
+
+
+class SubmissionSpoolTests(SubmissionTestMixin, TestCase):
+
+    def setUp(self):
+        self.form_obj = self.make_form(4)
+        self.spool_file = tempfile.mkdtemp() + '/spool.sqlite3'
+        self.settings_override = override_settings(SUBMISSION_SPOOL_ENABLED=True, SUBMISSION_SPOOL_PATH=self.spool_file)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def test_submission_is_spooled_then_flushed(self):
+        response = self.submit(self.form_obj, self.answer_all(self.form_obj))
+        self.assertTemplateUsed(response, 'forms/form_submitted.html')
+        self.assertFalse(Response.objects.exists())
+        self.assertEqual(spool.pending(), 1)
+
+        self.assertEqual(spool.flush_all(), 1)
+        saved = Response.objects.get()
+        self.assertEqual(saved.answers.count(), 4)
+        self.assertEqual(Answer.selected_options.through.objects.filter(answer__response=saved).count(), 3)
+        self.assertEqual(spool.pending(), 0)
+
+    def test_replay_after_crash_is_exactly_once(self):
+        for _ in range(3):
+            self.submit(self.form_obj, self.answer_all(self.form_obj))
+
+        # Simulate a crash after the database commit but before the spool delete
+        real_connect = spool.connect
+
+        class CrashBeforeDelete:
+            def __init__(self, conn):
+                self.conn = conn
+
+            def execute(self, sql, *args):
+                if sql.startswith('DELETE'):
+                    raise RuntimeError('crashed')
+                return self.conn.execute(sql, *args)
+
+        with mock.patch('forms.spool.connect', lambda path=None: CrashBeforeDelete(real_connect(path))):
+            with self.assertRaises(RuntimeError):
+                spool.flush()
+        self.assertEqual(Response.objects.count(), 3)
+        self.assertEqual(spool.pending(), 3)
+
+        spool.flush_all()
+        self.assertEqual(Response.objects.count(), 3)
+        self.assertEqual(spool.pending(), 0)
+
+    def test_deleted_question_does_not_block_the_spool(self):
+        for _ in range(2):
+            self.submit(self.form_obj, self.answer_all(self.form_obj))
+        self.form_obj.questions.filter(question_type='multiple_choice').delete()
+
+        self.assertEqual(spool.flush_all(), 2)
+        self.assertEqual(spool.pending(), 0)
+        self.assertEqual(Response.objects.count(), 2)
+        self.assertEqual(Answer.objects.count(), 2 * self.form_obj.questions.count())
+
+    def test_failed_entries_are_moved_to_dead_letter(self):
+        for _ in range(4):
+            self.submit(self.form_obj, self.answer_all(self.form_obj))
+        spool_ids = [row[0] for row in spool.connect().execute('SELECT id FROM spool ORDER BY id')]
+        # Not only constraint violations: any error would otherwise block the spool
+        errors = {
+            spool_ids[0]: IntegrityError('FOREIGN KEY constraint failed'),
+            spool_ids[2]: OperationalError('database is locked'),
+        }
+        save_submissions = spool.save_submissions
+
+        def reject_bad_entries(form_obj, submissions, responses_url=None):
+            for submission in submissions:
+                if submission.spool_id in errors:
+                    raise errors[submission.spool_id]
+            return save_submissions(form_obj, submissions, responses_url)
+
+        with mock.patch('forms.spool.save_submissions', side_effect=reject_bad_entries):
+            self.assertEqual(spool.flush_all(), 4)
+        self.assertEqual(set(Response.objects.values_list('spool_id', flat=True)), {spool_ids[1], spool_ids[3]})
+        self.assertEqual(spool.pending(), 0)
+        self.assertEqual(spool.dead_letters(), 2)
+        rows = spool.connect().execute('SELECT id, error, failed_at FROM dead_letter ORDER BY id').fetchall()
+        self.assertEqual([row[:2] for row in rows], [
+            (spool_ids[0], 'IntegrityError: FOREIGN KEY constraint failed'),
+            (spool_ids[2], 'OperationalError: database is locked'),
+        ])
+        self.assertTrue(timezone.is_aware(datetime.fromisoformat(rows[0][2])))
+
+
+class FormAnalyticsTests(SubmissionTestMixin, TestCase):
+
+    def analytics_queries(self, num_questions):
+        form_obj = self.make_form(num_questions)
+        for _ in range(3):
+            self.submit(form_obj, self.answer_all(form_obj))
+        get_form_schema(form_obj)
+        with CaptureQueriesContext(connection) as ctx:
+            form_analytics_data(form_obj)
+        return len(ctx.captured_queries)
+
+    def test_query_count_is_constant(self):
+        self.assertEqual(self.analytics_queries(4), self.analytics_queries(40))
+
+    def test_tallies_match_submissions(self):
+        form_obj = self.make_form(4)
+        data = self.answer_all(form_obj)
+        self.submit(form_obj, data)
+        self.submit(form_obj, {**data, f'question_{form_obj.questions.get(order=3).id}': '2'})
+
+        analytics = form_analytics_data(form_obj)
+        text, checkboxes, choice, scale = form_obj.questions.order_by('order')
+        self.assertEqual(analytics[text.id]['answers'], ['Hello world', 'Hello world'])
+        self.assertEqual(analytics[checkboxes.id]['data'],
+                         {'Option 0': 2, 'Option 1': 2, 'Option 2': 0, 'Option 3': 0})
+        self.assertEqual(analytics[choice.id]['data'],
+                         {'Option 0': 2, 'Option 1': 0, 'Option 2': 0, 'Option 3': 0})
+        self.assertEqual(analytics[scale.id]['data'], {'1': 0, '2': 1, '3': 0, '4': 1, '5': 0})
+
+    def test_text_samples_are_limited_per_question(self):
+        form_obj = self.make_form(1)
+        for i in range(12):
+            self.submit(form_obj, {f'question_{form_obj.questions.get().id}': f'Answer {i}'})
+
+        answers = form_analytics_data(form_obj)[form_obj.questions.get().id]['answers']
+        self.assertEqual(answers, [f'Answer {i}' for i in range(10)])
+
+    def test_api_answers_conditional_requests_without_aggregating(self):
+        cache.clear()
+        form_obj = self.make_form(4)
+        data = self.answer_all(form_obj)
+        self.submit(form_obj, data)
+        url = reverse('form_analytics_api', kwargs={'form_uuid': form_obj.uuid})
+        self.client.force_login(self.user)
+
+        first = self.client.get(url)
+        self.assertEqual(first.json()['total_responses'], 1)
+        etag = first['ETag']
+        with CaptureQueriesContext(connection) as ctx:
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertFalse([q for q in ctx.captured_queries
+                          if 'forms_answercounter' in q['sql'] or 'forms_answer"' in q['sql']])
+
+        # Without If-None-Match the payload still comes from the cache
+        with CaptureQueriesContext(connection) as ctx:
+            again = self.client.get(url)
+        self.assertFalse([q for q in ctx.captured_queries if 'forms_answercounter' in q['sql']])
+        self.assertEqual(again.json()['questions'], first.json()['questions'])
+
+        self.submit(form_obj, data)
+        after_submission = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(after_submission.status_code, 200)
+        self.assertEqual(after_submission.json()['total_responses'], 2)
+
+        # Deleting an older response leaves the newest id alone but still changes the ETag
+        etag = after_submission['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Response.objects.filter(form=form_obj).order_by('id').first().delete()
+        after_delete = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(after_delete.status_code, 200)
+
+        # The version is read from the database, so a process with an empty cache agrees on it
+        cache.clear()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=after_delete['ETag']).status_code, 304)
+
+        other, _ = User.objects.get_or_create(username='someone-else')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class ResponseGridTests(SubmissionTestMixin, TestCase):
+
+    def page_queries(self, num_questions, num_responses=21):
+        form_obj = self.make_form(num_questions)
+        data = self.answer_all(form_obj)
+        for _ in range(num_responses):
+            self.submit(form_obj, data)
+        self.client.force_login(self.user)
+        url = reverse('view_responses', kwargs={'form_uuid': form_obj.uuid})
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            page = self.client.get(url)
+        return page, len(ctx.captured_queries)
+
+    def test_query_count_is_capped(self):
+        _, small = self.page_queries(4)
+        page, large = self.page_queries(40)
+        self.assertEqual(small, large)
+        # Session, user, profile, form, count, page, answers, selected options and recent export jobs
+        self.assertLessEqual(large, 9)
+        self.assertEqual(len(page.context['rows']), 20)
+
+    def test_cells_follow_question_order(self):
+        form_obj = self.make_form(4)
+        data = self.answer_all(form_obj)
+        del data[f'question_{form_obj.questions.get(order=3).id}']
+        self.submit(form_obj, data)
+        self.client.force_login(self.user)
+
+        page = self.client.get(reverse('view_responses', kwargs={'form_uuid': form_obj.uuid}))
+        [row] = page.context['rows']
+        self.assertEqual(row.cells, ('Hello world', 'Option 0, Option 1', 'Option 0', None))
+
+
+class DashboardStatsTests(SubmissionTestMixin, TestCase):
+
+    def setUp(self):
+        self.form_obj = self.make_form(2)
+        self.client.force_login(self.user)
+
+    def header(self):
+        context = self.client.get(reverse('dashboard')).context
+        return context['total_forms'], context['published_forms'], context['total_responses']
+
+    def test_totals_follow_submissions_publishing_and_deletes(self):
+        self.assertEqual(self.header(), (1, 1, 0))
+        data = self.answer_all(self.form_obj)
+        for _ in range(3):
+            self.submit(self.form_obj, data)
+        draft = Form.objects.create(user=self.user, title='Draft')
+        self.assertEqual(self.header(), (2, 1, 3))
+
+        self.client.get(reverse('publish_form', kwargs={'form_uuid': draft.uuid}))
+        self.form_obj.responses.first().delete()
+        self.assertEqual(self.header(), (2, 2, 2))
+
+        self.form_obj.delete()
+        self.assertEqual(self.header(), (1, 1, 0))
+
+    def test_header_queries_do_not_grow_with_forms(self):
+        def dashboard_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get(reverse('dashboard'))
+            return len(ctx.captured_queries)
+
+        self.client.get(reverse('dashboard'))
+        few = dashboard_queries()
+        for i in range(30):
+            Form.objects.create(user=self.user, title=f'Form {i}')
+        self.assertEqual(dashboard_queries(), few)
+
+    def test_cards_count_questions_without_loading_them(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual([form.num_questions for form in response.context['forms']], [2])
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('SELECT "forms_question"')])
+
+    def test_check_and_rebuild(self):
+        self.header()
+        DashboardStats.objects.filter(user=self.user).update(total_responses=5)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_analytics_counters', check=True, stdout=StringIO())
+        call_command('rebuild_analytics_counters', stdout=StringIO())
+        self.assertEqual(self.header(), (1, 1, 0))
+
+    def test_recount_is_a_single_update(self):
+        self.header()
+        self.submit(self.form_obj, self.answer_all(self.form_obj))
+        DashboardStats.objects.filter(user=self.user).update(total_forms=7, published_forms=7, total_responses=7)
+        with CaptureQueriesContext(connection) as ctx:
+            refresh_dashboard_stats(self.user.pk)
+        self.assertEqual([q['sql'].split()[0] for q in ctx.captured_queries], ['UPDATE'])
+        self.assertEqual(self.header(), (1, 1, 1))
+
+        Form.objects.filter(user=self.user).delete()
+        self.assertEqual(self.header(), (0, 0, 0))
+
+
+class ResponseCountTests(SubmissionTestMixin, TestCase):
+
+    def setUp(self):
+        self.form_obj = self.make_form(2)
+        self.data = self.answer_all(self.form_obj)
+
+    def stored_count(self):
+        return Form.objects.values_list('response_count', flat=True).get(pk=self.form_obj.pk)
+
+    def test_submissions_and_deletes_move_the_count(self):
+        stale = Form.objects.get(pk=self.form_obj.pk)
+        for _ in range(3):
+            self.submit(self.form_obj, self.data)
+        self.assertEqual(self.stored_count(), 3)
+
+        # Saving a copy loaded before the submissions keeps them
+        stale.title = 'Renamed'
+        stale.save()
+        self.assertEqual(self.stored_count(), 3)
+
+        self.form_obj.responses.first().delete()
+        self.assertEqual(self.stored_count(), 2)
+        Form.objects.filter(pk=self.form_obj.pk).update(response_count=0)
+        self.form_obj.responses.first().delete()
+        self.assertEqual(self.stored_count(), 0)
+
+    def test_readers_use_the_column(self):
+        self.submit(self.form_obj, self.data)
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('form_analytics_api', kwargs={'form_uuid': self.form_obj.uuid}))
+        self.assertEqual(response.json()['total_responses'], 1)
+        self.assertFalse([q for q in ctx.captured_queries if 'COUNT(' in q['sql'] and 'FROM "forms_response"' in q['sql']])
+
+    def test_reconcile(self):
+        for _ in range(2):
+            self.submit(self.form_obj, self.data)
+        Form.objects.filter(pk=self.form_obj.pk).update(response_count=7)
+
+        self.assertEqual(reconcile_response_counts(check=True), {self.form_obj.pk: (7, 2)})
+        self.assertEqual(self.stored_count(), 7)
+        with self.assertRaises(CommandError):
+            call_command('reconcile_response_counts', check=True, stdout=StringIO())
+        call_command('reconcile_response_counts', stdout=StringIO())
+        self.assertEqual(self.stored_count(), 2)
+        self.assertEqual(reconcile_response_counts(), {})
+
+
+class KeysetPaginationTests(SubmissionTestMixin, TestCase):
+
+    def setUp(self):
+        self.form_obj = self.make_form(1)
+        # Pairs of responses share a timestamp, so pages must break ties on id
+        moments = [datetime(2026, 1, 1, tzinfo=dt_timezone.utc) + timedelta(minutes=i // 2) for i in range(25)]
+        save_submissions(self.form_obj, [Submission([], submitted_at=moment) for moment in moments])
+        self.expected = list(self.form_obj.responses.order_by('-submitted_at', '-id').values_list('id', flat=True))
+
+    def page(self, cursor=None):
+        return keyset_page(self.form_obj.responses.all(), 'submitted_at', cursor, 10)
+
+    def test_walks_forward_and_back_over_every_response(self):
+        pages = [self.page()]
+        while pages[-1].has_next:
+            pages.append(self.page(pages[-1].next_cursor))
+        self.assertEqual([response.id for page in pages for response in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertFalse(pages[0].has_previous)
+
+        back = self.page(pages[2].previous_cursor)
+        self.assertEqual([response.id for response in back], self.expected[10:20])
+        self.assertEqual([response.id for response in self.page(back.previous_cursor)], self.expected[:10])
+
+    def test_tampered_cursor_starts_from_the_newest(self):
+        cursor = self.page().next_cursor
+        self.assertEqual([response.id for response in self.page(cursor[:-2] + 'xx')], self.expected[:10])
+
+    def test_pages_are_served_by_the_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('query plan checked on SQLite')
+        queryset = self.form_obj.responses.all()
+        cursor = self.page().next_cursor
+        with CaptureQueriesContext(connection) as ctx:
+            keyset_page(queryset, 'submitted_at', cursor, 10)
+        with connection.cursor() as db:
+            db.execute('EXPLAIN QUERY PLAN ' + ctx.captured_queries[-1]['sql'])
+            plan = ' '.join(str(row) for row in db.fetchall())
+        self.assertIn('response_form_recent_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_responses_page_links(self):
+        self.client.force_login(self.user)
+        url = reverse('view_responses', kwargs={'form_uuid': self.form_obj.uuid})
+        first = self.client.get(url)
+        self.assertEqual(first.context['total_responses'], 25)
+        second = self.client.get(url, {'cursor': first.context['responses'].next_cursor})
+        self.assertEqual([row.response.id for row in second.context['rows']], self.expected[20:])
+
+
+class ResponseSearchTests(SubmissionTestMixin, TestCase):
+
+    def setUp(self):
+        self.form_obj = self.make_form(3)
+        self.text, self.checkboxes, self.choice = self.form_obj.questions.order_by('order')
+        self.options = list(self.choice.options.values_list('id', flat=True))
+        rows = [
+            ('Refund took three weeks', 'Alice Martin', 'alice@example.com', 0, datetime(2026, 2, 1, 12)),
+            ('Great café, friendly staff', 'Bob', 'bob@example.org', 1, datetime(2026, 2, 10, 12)),
+            ('Refunds should be faster', '', None, 1, datetime(2026, 3, 1, 12)),
+        ]
+        self.responses = save_submissions(self.form_obj, [
+            Submission(
+                [ParsedAnswer(self.text.id, answer_text=text), ParsedAnswer(self.choice.id, option_ids=[self.options[option]])],
+                respondent_name=name, respondent_email=email,
+                submitted_at=timezone.make_aware(moment),
+            )
+            for text, name, email, option, moment in rows
+        ])
+
+    def search(self, backend=None, **filters):
+        found = search_responses(self.form_obj, ResponseFilters(**filters), backend)
+        return sorted(self.responses.index(response) for response in found)
+
+    def test_fts_index_is_used_on_sqlite(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('FTS5 is SQLite only')
+        self.assertEqual(search_backend(), 'fts5')
+
+    def test_text_matches_answers_and_respondents_by_prefix(self):
+        for backend in (None, 'like'):
+            self.assertEqual(self.search(backend, text='refund'), [0, 2])
+            self.assertEqual(self.search(backend, text='REFUND weeks'), [0])
+            self.assertEqual(self.search(backend, text='alice'), [0])
+            self.assertEqual(self.search(backend, text='example.org'), [1])
+            self.assertEqual(self.search(backend, text='nothing'), [])
+        self.assertEqual(self.search(text='cafe'), [1])
+
+    def test_index_follows_edits_and_deletes(self):
+        Answer.objects.filter(response=self.responses[1], question=self.text).update(answer_text='Refund please')
+        self.assertEqual(self.search(text='refund'), [0, 1, 2])
+        self.responses[0].delete()
+        self.responses.pop(0)
+        self.assertEqual(self.search(text='refund'), [0, 1])
+
+    def test_rebuild_restores_dropped_triggers(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('FTS5 is SQLite only')
+        # What a SQLite table rebuild in a migration leaves behind
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER forms_answer_fts_update')
+        Answer.objects.filter(response=self.responses[1], question=self.text).update(answer_text='Refund please')
+        self.assertTrue(rebuild_search_index())
+        self.assertEqual(self.search(text='refund'), [0, 1, 2])
+        Answer.objects.filter(response=self.responses[1], question=self.text).update(answer_text='Great café')
+        self.assertEqual(self.search(text='refund'), [0, 2])
+
+    def test_structured_filters(self):
+        self.assertEqual(self.search(option_ids=[self.options[1]]), [1, 2])
+        self.assertEqual(self.search(option_ids=[self.options[1]], text='refund'), [2])
+        self.assertEqual(self.search(date_from=date(2026, 2, 5), date_to=date(2026, 2, 28)), [1])
+        self.assertEqual(self.search(date_to=date(2026, 2, 1)), [0])
+
+    def test_view_filters_and_keeps_them_in_links(self):
+        self.client.force_login(self.user)
+        url = reverse('view_responses', kwargs={'form_uuid': self.form_obj.uuid})
+        page = self.client.get(url, {'q': 'refund', 'from': '2026-02-15', 'to': 'not a date'})
+        self.assertEqual([row.response.id for row in page.context['rows']], [self.responses[2].id])
+        self.assertEqual(page.context['matching_responses'], 1)
+        self.assertEqual(page.context['filter_query'], 'q=refund&from=2026-02-15')
+
+    def test_view_stops_counting_matches_at_the_cap(self):
+        self.client.force_login(self.user)
+        url = reverse('view_responses', kwargs={'form_uuid': self.form_obj.uuid})
+        with mock.patch('forms.views.MAX_FILTERED_COUNT', 1):
+            page = self.client.get(url, {'option': self.options[1]})
+        self.assertEqual(len(page.context['rows']), 2)
+        self.assertEqual((page.context['matching_responses'], page.context['matching_capped']), (1, True))
+        self.assertContains(page, '1+ matching')
+
+
+class ResponseExportTests(SubmissionTestMixin, TestCase):
+
+    def setUp(self):
+        self.form_obj = self.make_form(4, collect_email=True)
+        data = self.answer_all(self.form_obj)
+        for i in range(5):
+            self.submit(self.form_obj, {**data, 'respondent_email': f'r{i}@example.com'})
+        self.client.force_login(self.user)
+
+    def export(self, export_format, **params):
+        url = reverse('export_responses', kwargs={'form_uuid': self.form_obj.uuid, 'export_format': export_format})
+        return self.client.get(url, params)
+
+    def test_csv_has_one_column_per_question(self):
+        response = self.export('csv')
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="survey-responses.csv"', response['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+        self.assertEqual(rows[0], ['Response ID', 'Submitted at', 'Name', 'Email', 'Q0', 'Q1', 'Q2', 'Q3'])
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[1][3:], ['r0@example.com', 'Hello world', 'Option 0; Option 1', 'Option 0', '4'])
+
+    def test_jsonl_keeps_lists_and_numbers(self):
+        lines = b''.join(self.export('jsonl').streaming_content).decode().splitlines()
+        record = json.loads(lines[-1])
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(record['respondent_email'], 'r4@example.com')
+        self.assertEqual(record['answers'], {'Q0': 'Hello world', 'Q1': ['Option 0', 'Option 1'], 'Q2': 'Option 0', 'Q3': 4})
+
+    def test_header_is_sent_before_any_query_and_chunks_are_bounded(self):
+        questions = get_form_schema(self.form_obj).questions
+        with CaptureQueriesContext(connection) as ctx:
+            rows = stream_csv(self.form_obj, questions, iter_responses(self.form_obj, chunk_size=2))
+            next(rows)
+            self.assertEqual(len(ctx.captured_queries), 0)
+            self.assertEqual(len(list(rows)), 5)
+        # Responses, answers and options for each of the three chunks
+        self.assertEqual(len(ctx.captured_queries), 3 * 3)
+
+    def test_filters_and_unknown_formats(self):
+        lines = b''.join(self.export('jsonl', q='r3').streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['respondent_email'] for line in lines], ['r3@example.com'])
+        self.assertEqual(self.export('xlsx').status_code, 404)
+
+
+@skipUnless(exports.pa is not None, 'pyarrow is not installed')
+class ColumnarExportTests(SubmissionTestMixin, TestCase):
+
+    def setUp(self):
+        self.form_obj = self.make_form(4)
+        self.date_question = Question.objects.create(form=self.form_obj, text='When', question_type='date', order=4)
+        self.time_question = Question.objects.create(form=self.form_obj, text='At', question_type='time', order=5)
+        data = self.answer_all(self.form_obj)
+        data.update({f'question_{self.date_question.id}': '2026-04-01', f'question_{self.time_question.id}': '09:30'})
+        self.submit(self.form_obj, data)
+        del data[f'question_{self.form_obj.questions.get(order=1).id}']
+        self.submit(self.form_obj, data)
+        self.client.force_login(self.user)
+
+    def export(self, export_format):
+        url = reverse('export_responses', kwargs={'form_uuid': self.form_obj.uuid, 'export_format': export_format})
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def check_table(self, table):
+        pa = exports.pa
+        self.assertEqual(table.schema.field('Q3').type, pa.int16())
+        self.assertEqual(table.schema.field('When').type, pa.date32())
+        self.assertEqual(table.schema.field('At').type, pa.time64('us'))
+        self.assertEqual(table.schema.field('Q2').type, pa.dictionary(pa.int32(), pa.string()))
+        self.assertEqual(table.schema.field('Q1').type, pa.list_(pa.dictionary(pa.int32(), pa.string())))
+
+        rows = table.to_pylist()
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['Q1'], ['Option 0', 'Option 1'])
+        self.assertIsNone(rows[1]['Q1'])
+        self.assertEqual((rows[0]['Q0'], rows[0]['Q2'], rows[0]['Q3']), ('Hello world', 'Option 0', 4))
+        self.assertEqual((rows[0]['When'], rows[0]['At']), (date(2026, 4, 1), datetime(2026, 1, 1, 9, 30).time()))
+        self.assertEqual(table.column('Q2').chunk(0).dictionary.to_pylist(), [f'Option {i}' for i in range(4)])
+
+    def test_parquet(self):
+        self.check_table(exports.pq.read_table(io.BytesIO(self.export('parquet'))))
+
+    def test_arrow_stream(self):
+        self.check_table(exports.pa.ipc.open_stream(self.export('arrow')).read_all())
+
+
+class AnswerFileBundleTests(SubmissionTestMixin, TestCase):
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.form_obj = self.make_form(1, collect_email=True)
+        self.upload = Question.objects.create(form=self.form_obj, text='Upload', question_type='file_upload', order=1)
+        self.contents = [b'first file', bytes(range(256)) * 1000]
+        for i, content in enumerate(self.contents):
+            self.submit(self.form_obj, {
+                f'question_{self.upload.id}': SimpleUploadedFile(f'doc{i}.bin', content),
+                'respondent_email': f'r{i}@example.com',
+            })
+        self.client.force_login(self.user)
+
+    def bundle(self, **params):
+        response = self.client.get(reverse('export_answer_files', kwargs={'form_uuid': self.form_obj.uuid}), params)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        chunks = list(response.streaming_content)
+        return zipfile.ZipFile(io.BytesIO(b''.join(chunks))), chunks
+
+    def test_files_are_grouped_by_response(self):
+        archive, chunks = self.bundle()
+        responses = list(self.form_obj.responses.order_by('id'))
+        self.assertEqual(archive.namelist(), [
+            f'response_{response.id}/q{self.upload.id}-doc{i}.bin' for i, response in enumerate(responses)
+        ])
+        self.assertEqual([archive.read(name) for name in archive.namelist()], self.contents)
+        self.assertIsNone(archive.testzip())
+        # The 256 KB file went out in blocks, not as one piece
+        self.assertGreater(len(chunks), 4)
+
+    def test_manifest_lists_missing_files(self):
+        missing = Answer.objects.filter(question=self.upload).order_by('id').first()
+        missing.file_upload.delete(save=False)
+
+        archive, _ = self.bundle(manifest='1')
+        self.assertEqual(len(archive.namelist()), 2)
+        rows = list(csv.reader(io.StringIO(archive.read('manifest.csv').decode())))
+        self.assertEqual(rows[0], ['Response ID', 'Submitted at', 'Question', 'File', 'Path', 'Size', 'Status'])
+        self.assertEqual([row[6] for row in rows[1:]], ['missing', 'included'])
+        self.assertEqual(rows[2][2:4], ['Upload', 'doc1.bin'])
+        self.assertEqual(rows[2][5], str(len(self.contents[1])))
+
+        # Rows beyond the in-memory part of the spool are read back from disk
+        with mock.patch.object(exports, 'MANIFEST_SPOOL_SIZE', 16):
+            spilled, _ = self.bundle(manifest='1')
+        self.assertEqual(spilled.read('manifest.csv'), archive.read('manifest.csv'))
+
+    def test_filters_and_owner_only(self):
+        archive, _ = self.bundle(q='r1')
+        self.assertEqual([name.rsplit('-', 1)[1] for name in archive.namelist()], ['doc1.bin'])
+
+        other, _ = User.objects.get_or_create(username='someone-else')
+        self.client.force_login(other)
+        url = reverse('export_answer_files', kwargs={'form_uuid': self.form_obj.uuid})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class InlineExecutor:
+    """Runs submitted jobs at once, in the test database"""
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+class ExportJobTests(SubmissionTestMixin, TestCase):
+
+    def setUp(self):
+        export_root = tempfile.TemporaryDirectory()
+        self.addCleanup(export_root.cleanup)
+        settings_override = override_settings(EXPORT_ROOT=export_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.form_obj = self.make_form(4)
+        self.data = self.answer_all(self.form_obj)
+        for _ in range(5):
+            self.submit(self.form_obj, self.data)
+        self.client.force_login(self.user)
+
+    def start(self, export_format='csv'):
+        url = reverse('start_export_job', kwargs={'form_uuid': self.form_obj.uuid, 'export_format': export_format})
+        return self.client.post(url)
+
+    def run_worker(self):
+        return export_jobs.process_export_jobs(InlineExecutor(), {})
+
+    def finished_job(self):
+        job_id = self.start().json()['job']['id']
+        self.run_worker()
+        return ExportJob.objects.get(pk=job_id)
+
+    def test_worker_writes_the_export_and_it_is_reused_until_a_new_response(self):
+        response = self.start()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual((response.json()['reused'], response.json()['job']['status']), (False, 'pending'))
+        self.assertEqual(self.run_worker(), 1)
+
+        job = ExportJob.objects.get(pk=response.json()['job']['id'])
+        path = export_jobs.job_file(job)
+        self.assertEqual((job.status, job.written, job.total, job.progress), ('done', 5, 5, 100))
+        self.assertEqual(job.file_size, path.stat().st_size)
+        self.assertEqual(len(list(csv.reader(io.StringIO(path.read_text())))), 6)
+        self.assertFalse(path.with_name(path.name + '.part').exists())
+
+        response = self.start()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['reused'], response.json()['job']['id']), (True, job.pk))
+
+        self.submit(self.form_obj, self.data)
+        response = self.start()
+        self.assertFalse(response.json()['reused'])
+        self.run_worker()
+        # The superseded export and its file are gone
+        self.assertFalse(ExportJob.objects.filter(pk=job.pk).exists())
+        self.assertFalse(path.exists())
+        self.assertEqual(ExportJob.objects.get(pk=response.json()['job']['id']).written, 6)
+
+    def test_data_version_does_not_depend_on_the_cache(self):
+        cache.clear()
+        job = self.finished_job()
+        # A worker process starts with a cache of its own
+        cache.clear()
+        self.assertEqual(export_jobs.data_version(Form.objects.get(pk=self.form_obj.pk)), job.data_version)
+        self.assertTrue(self.start().json()['reused'])
+
+        Response.objects.filter(form=self.form_obj).order_by('id').first().delete()
+        cache.clear()
+        self.assertFalse(self.start().json()['reused'])
+
+    def test_concurrent_exports_are_capped(self):
+        for export_format in ('csv', 'jsonl', 'csv'):
+            ExportJob.objects.create(form=self.form_obj, export_format=export_format)
+        executor = mock.Mock()
+        executor.submit.side_effect = lambda fn, job_id: Future()
+        running = {}
+
+        self.assertEqual(export_jobs.process_export_jobs(executor, running, max_workers=2), 2)
+        self.assertEqual(export_jobs.process_export_jobs(executor, running, max_workers=2), 0)
+        self.assertEqual(ExportJob.objects.filter(status='running').count(), 2)
+        # A second runner process counts the first one's jobs against the same cap
+        self.assertEqual(export_jobs.process_export_jobs(executor, {}, max_workers=2), 0)
+
+        finished_id, finished = next(iter(running.items()))
+        ExportJob.objects.filter(pk=finished_id).update(status='done')
+        finished.set_result(True)
+        self.assertEqual(export_jobs.process_export_jobs(executor, running, max_workers=2), 1)
+        self.assertEqual(len(running), 2)
+        self.assertFalse(ExportJob.objects.filter(status='pending').exists())
+
+    def test_progress_and_stale_jobs(self):
+        job = ExportJob.objects.create(form=self.form_obj, export_format='csv', status='running')
+        with mock.patch.object(export_jobs, 'PROGRESS_EVERY', 2):
+            rows = export_jobs._Progress(job.pk).track(iter(range(5)))
+            for _ in range(3):
+                next(rows)
+        job.refresh_from_db()
+        self.assertEqual(job.written, 2)
+
+        ExportJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(export_jobs.requeue_stale_jobs(exclude=[job.pk]), 0)
+        self.assertEqual(export_jobs.requeue_stale_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.written), ('pending', 0))
+
+    def test_status_and_failures(self):
+        job = ExportJob.objects.create(form=self.form_obj, export_format='xlsx')
+        self.assertEqual(self.start('xlsx').status_code, 400)
+        self.run_worker()
+
+        status = self.client.get(reverse('export_job_status', args=[job.pk])).json()
+        self.assertEqual(status['status'], 'failed')
+        self.assertIn('xlsx', status['error'])
+        self.assertIsNone(status['download_url'])
+
+    def test_download_supports_byte_ranges(self):
+        job = self.finished_job()
+        url = reverse('export_job_download', args=[job.pk])
+        content = export_jobs.job_file(job).read_bytes()
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(b''.join(response.streaming_content), content)
+
+        response = self.client.get(url, HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE=response['ETag'])
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(content)}')
+        self.assertEqual(b''.join(response.streaming_content), content[10:20])
+
+        response = self.client.get(url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), content[-5:])
+        response = self.client.get(url, HTTP_RANGE=f'bytes={len(content)}-')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, f'bytes */{len(content)}'))
+        # A stale If-Range gets the whole file
+        response = self.client.get(url, HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"export-0-0"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_only_the_owner_sees_exports(self):
+        job = self.finished_job()
+        other, _ = User.objects.get_or_create(username='someone-else')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse('export_job_status', args=[job.pk])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('export_job_download', args=[job.pk])).status_code, 404)
+        self.assertEqual(self.start().status_code, 404)
+
+
+class AnswerCounterTests(SubmissionTestMixin, TestCase):
+
+    def setUp(self):
+        self.form_obj = self.make_form(4)
+        self.data = self.answer_all(self.form_obj)
+        self.text, self.checkboxes, self.choice, self.scale = self.form_obj.questions.order_by('order')
+
+    def counter(self, question, key):
+        return AnswerCounter.objects.get(question=question, key=key).count
+
+    def test_submissions_update_counters(self):
+        for _ in range(3):
+            self.submit(self.form_obj, self.data)
+
+        first_option = self.checkboxes.options.order_by('order').first()
+        self.assertEqual(self.counter(self.text, 'answered'), 3)
+        self.assertEqual(self.counter(self.checkboxes, f'option:{first_option.id}'), 3)
+        self.assertEqual(self.counter(self.scale, 'value:4'), 3)
+        self.assertEqual(check_counters(self.form_obj), {})
+
+    def test_deleting_responses_decrements_counters(self):
+        for _ in range(3):
+            self.submit(self.form_obj, self.data)
+        Response.objects.filter(form=self.form_obj).first().delete()
+
+        self.assertEqual(self.counter(self.scale, 'value:4'), 2)
+        self.assertEqual(check_counters(self.form_obj), {})
+
+        Response.objects.filter(form=self.form_obj).delete()
+        self.assertEqual(check_counters(self.form_obj), {})
+        self.assertEqual(self.counter(self.text, 'answered'), 0)
+
+    def test_deleting_form_and_options_removes_counters(self):
+        self.submit(self.form_obj, self.data)
+        self.checkboxes.options.first().delete()
+        self.assertEqual(check_counters(self.form_obj), {})
+
+        self.form_obj.delete()
+        self.assertFalse(AnswerCounter.objects.exists())
+
+    def test_deleting_single_answers_decrements_counters(self):
+        for _ in range(2):
+            self.submit(self.form_obj, self.data)
+        # As the answer admin's delete and delete_selected do
+        Answer.objects.filter(question=self.checkboxes).first().delete()
+        Answer.objects.filter(question__in=[self.scale, self.text]).delete()
+
+        self.assertEqual(self.counter(self.checkboxes, 'answered'), 1)
+        self.assertEqual(self.counter(self.scale, 'value:4'), 0)
+        self.assertEqual(check_counters(self.form_obj), {})
+        self.assertEqual(check_text_index(self.form_obj), {})
+
+    def test_bulk_deletes_cost_the_same_whatever_their_size(self):
+        other = self.make_form(4)
+        other_data = self.answer_all(other)
+
+        def delete_queries(count):
+            for _ in range(count):
+                self.submit(self.form_obj, self.data)
+                self.submit(other, other_data)
+            with CaptureQueriesContext(connection) as ctx:
+                Response.objects.filter(form__in=[self.form_obj, other]).delete()
+            return len(ctx.captured_queries)
+
+        self.assertEqual(delete_queries(2), delete_queries(10))
+        for form_obj in (self.form_obj, other):
+            self.assertEqual(check_counters(form_obj), {})
+            self.assertEqual(check_text_index(form_obj), {})
+        self.assertEqual(Form.objects.filter(response_count=0).count(), 2)
+        self.assertEqual(ResponseBucket.objects.filter(count__gt=0).count(), 0)
+
+        self.submit(self.form_obj, self.data)
+        with CaptureQueriesContext(connection) as ctx:
+            Answer.objects.filter(question__form=self.form_obj).delete()
+        self.assertEqual(check_counters(self.form_obj), {})
+        # One INSERT and one UPDATE for every answer of the form
+        self.assertEqual(len([q for q in ctx.captured_queries if 'forms_answercounter' in q['sql']]), 2)
+
+    def test_deleting_the_owner_leaves_the_counters_alone(self):
+        for _ in range(3):
+            self.submit(self.form_obj, self.data)
+        with CaptureQueriesContext(connection) as ctx:
+            self.user.delete()
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')])
+        self.assertFalse(AnswerCounter.objects.exists())
+
+    def test_non_numeric_scale_answers_are_not_counted(self):
+        self.submit(self.form_obj, {**self.data, f'question_{self.scale.id}': 'x' * 100})
+        self.assertEqual(self.counter(self.scale, 'answered'), 1)
+        self.assertFalse(AnswerCounter.objects.filter(question=self.scale, key__startswith='value:').exists())
+        self.assertEqual(check_counters(self.form_obj), {})
+
+    def test_check_and_rebuild_command(self):
+        for _ in range(2):
+            self.submit(self.form_obj, self.data)
+        AnswerCounter.objects.filter(question=self.scale, key='value:4').update(count=99)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_analytics_counters', '--check', stdout=StringIO())
+
+        call_command('rebuild_analytics_counters', form_uuid=str(self.form_obj.uuid), stdout=StringIO())
+        self.assertEqual(self.counter(self.scale, 'value:4'), 2)
+        call_command('rebuild_analytics_counters', '--check', stdout=StringIO())
+
+    def test_legacy_selections_of_foreign_options_are_ignored(self):
+        other = self.make_form(4)
+        foreign_option = other.questions.get(order=1).options.first()
+        self.submit(self.form_obj, self.data)
+        answer = Answer.objects.get(question=self.checkboxes)
+        # Left behind by older code that did not check which question an option belongs to
+        Answer.selected_options.through.objects.create(answer=answer, option=foreign_option)
+
+        call_command('rebuild_analytics_counters', stdout=StringIO())
+        call_command('rebuild_analytics_counters', '--check', stdout=StringIO())
+        self.assertFalse(AnswerCounter.objects.filter(key=f'option:{foreign_option.id}').exists())
+
+        answer.delete()
+        self.assertEqual(check_counters(self.form_obj), {})
+        self.assertFalse(AnswerCounter.objects.filter(key=f'option:{foreign_option.id}').exists())
+
+
+class TypedAnswerColumnTests(SubmissionTestMixin, TestCase):
+
+    def setUp(self):
+        self.form_obj = self.make_form(0)
+        self.scale = Question.objects.create(form=self.form_obj, text='Score', question_type='linear_scale',
+                                             scale_min=1, scale_max=10, order=0)
+        self.date = Question.objects.create(form=self.form_obj, text='Day', question_type='date', order=1)
+        self.time = Question.objects.create(form=self.form_obj, text='Time', question_type='time', order=2)
+
+    def answer(self, question):
+        return Answer.objects.filter(question=question).latest('id')
+
+    def test_columns_are_filled_from_question_type(self):
+        self.submit(self.form_obj, {
+            f'question_{self.scale.id}': '7',
+            f'question_{self.date.id}': '2026-02-14',
+            f'question_{self.time.id}': '09:30',
+        })
+
+        self.assertEqual(self.answer(self.scale).answer_number, 7)
+        self.assertEqual(self.answer(self.date).answer_date, date(2026, 2, 14))
+        self.assertEqual(self.answer(self.time).answer_time.strftime('%H:%M'), '09:30')
+        self.assertIsNone(self.answer(self.scale).answer_date)
+
+    def test_unparseable_values_stay_null(self):
+        self.submit(self.form_obj, {
+            f'question_{self.scale.id}': '11',
+            f'question_{self.date.id}': 'soon',
+            f'question_{self.time.id}': 'noon',
+        })
+
+        self.assertIsNone(self.answer(self.scale).answer_number)
+        self.assertEqual(self.answer(self.scale).answer_text, '11')
+        self.assertIsNone(self.answer(self.date).answer_date)
+        self.assertIsNone(self.answer(self.time).answer_time)
+
+    def test_range_filters_run_in_the_database(self):
+        for value in ['2', '8', '10']:
+            self.submit(self.form_obj, {f'question_{self.scale.id}': value})
+
+        answers = Answer.objects.filter(question=self.scale)
+        self.assertEqual(answers.filter(answer_number__gte=8).count(), 2)
+        self.assertEqual(answers.aggregate(mean=Avg('answer_number'))['mean'], 20 / 3)
+
+
+class ScaleStatsTests(SubmissionTestMixin, TestCase):
+
+    def test_matches_list_based_statistics(self):
+        answers = [1, 2, 2, 3, 5, 5, 5, 4, 1, 3, 4, 5]
+        stats = ScaleStats(1, 5)
+        stats.update(answers)
+
+        self.assertAlmostEqual(stats.mean, statistics.fmean(answers))
+        self.assertAlmostEqual(stats.std, statistics.pstdev(answers))
+        self.assertEqual(stats.median, statistics.median(answers))
+        quartiles = statistics.quantiles(answers, n=4, method='inclusive')
+        self.assertEqual([stats.percentile(25), stats.percentile(50), stats.percentile(75)], quartiles)
+
+    def test_percentiles_interpolate_between_answers(self):
+        stats = ScaleStats(1, 5)
+        stats.update([1, 2, 3, 4])
+        self.assertEqual(stats.median, 2.5)
+        self.assertEqual(stats.percentile(0), 1)
+        self.assertEqual(stats.percentile(100), 4)
+
+    def test_net_promoter_buckets(self):
+        stats = ScaleStats(0, 10)
+        stats.update([10, 9, 8, 7, 6, 0])
+        self.assertEqual(stats.buckets(), {'promoters': 2, 'passives': 2, 'detractors': 2})
+        self.assertEqual(stats.nps, 0)
+
+    def test_values_outside_the_scale_are_rejected(self):
+        with self.assertRaises(ValueError):
+            ScaleStats(1, 5).add(6)
+
+    def test_empty_stats(self):
+        self.assertIsNone(ScaleStats(1, 5).mean)
+        self.assertIsNone(ScaleStats(1, 5).as_dict()['median'])
+        inverted = ScaleStats(5, 1).as_dict()
+        self.assertEqual((inverted['count'], inverted['mean'], inverted['histogram']), (0, None, {}))
+
+    def test_inverted_scale_renders_empty_stats(self):
+        form_obj = self.make_form(4)
+        self.submit(form_obj, self.answer_all(form_obj))
+        scale = form_obj.questions.get(order=3)
+        scale.scale_min, scale.scale_max = 5, 1
+        scale.save()
+        self.client.force_login(self.user)
+        for name in ('form_analytics', 'form_analytics_api', 'form_scale_stats'):
+            response = self.client.get(reverse(name, kwargs={'form_uuid': form_obj.uuid}))
+            self.assertEqual(response.status_code, 200, name)
+        self.assertIsNone(response.json()['questions'][str(scale.id)]['median'])
+
+    def test_json_endpoint_is_owner_only(self):
+        form_obj = self.make_form(4)
+        data = self.answer_all(form_obj)
+        scale = form_obj.questions.get(order=3)
+        for value in ['1', '2', '5']:
+            self.submit(form_obj, {**data, f'question_{scale.id}': value})
+
+        url = reverse('form_scale_stats', kwargs={'form_uuid': form_obj.uuid})
+        self.client.force_login(self.user)
+        stats = self.client.get(url).json()['questions'][str(scale.id)]
+        self.assertEqual(stats['count'], 3)
+        self.assertEqual(stats['median'], 2)
+        self.assertEqual(stats['histogram'], {'1': 1, '2': 1, '3': 0, '4': 0, '5': 1})
+        self.assertContains(self.client.get(reverse('form_analytics', kwargs={'form_uuid': form_obj.uuid})), 'Median')
+
+        self.client.force_login(User.objects.create(username='someone-else'))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class TextIndexTests(SubmissionTestMixin, TestCase):
+
+    def setUp(self):
+        self.form_obj = self.make_form(0)
+        self.department = Question.objects.create(form=self.form_obj, text='Department', question_type='short_text', order=0)
+        self.feedback = Question.objects.create(form=self.form_obj, text='Feedback', question_type='long_text', order=1)
+
+    def respond(self, department, feedback):
+        self.submit(self.form_obj, {
+            f'question_{self.department.id}': department,
+            f'question_{self.feedback.id}': feedback,
+        })
+
+    def test_tokenize_drops_stop_words_and_case(self):
+        self.assertEqual(tokenize("The Coffee machine is broken, isn't it?"), ['coffee', 'machine', 'broken', "isn't"])
+
+    def test_terms_bigrams_and_values_are_counted_per_answer(self):
+        self.respond('Sales', 'Coffee machine broken. Coffee is cold')
+        self.respond(' sales ', 'The coffee machine works')
+        self.respond('Engineering', 'More coffee please')
+
+        index = top_terms(self.form_obj)
+        self.assertEqual(index[self.feedback.id]['term'][0], ('coffee', 3))
+        self.assertEqual(index[self.feedback.id]['bigram'][0], ('coffee machine', 2))
+        self.assertEqual(index[self.department.id]['value'], [('sales', 2), ('engineering', 1)])
+        self.assertEqual(index[self.department.id]['distinct_values'], 2)
+        self.assertEqual(index[self.feedback.id]['value'], [])
+
+        analytics = form_analytics_data(self.form_obj)
+        self.assertEqual(analytics[self.department.id]['values'], [('sales', 2), ('engineering', 1)])
+        self.assertEqual(check_text_index(self.form_obj), {})
+
+    def test_deleting_responses_updates_the_index(self):
+        self.respond('Sales', 'Coffee machine broken')
+        self.respond('Sales', 'Coffee please')
+        Response.objects.filter(form=self.form_obj).order_by('id').first().delete()
+
+        self.assertEqual(top_terms(self.form_obj)[self.feedback.id]['term'], [('coffee', 1), ('please', 1)])
+        self.assertEqual(check_text_index(self.form_obj), {})
+
+    def test_top_lists_are_cut_per_question_and_kind(self):
+        self.respond('Sales', 'coffee machine broken')
+        self.respond('Support', 'coffee machine slow')
+        self.respond('Sales', 'tea please')
+        self.respond('Engineering', 'tea')
+
+        index = top_terms(self.form_obj, limit=2)
+        self.assertEqual(index[self.feedback.id]['term'], [('coffee', 2), ('machine', 2)])
+        self.assertEqual(index[self.feedback.id]['bigram'], [('coffee machine', 2), ('machine broken', 1)])
+        self.assertEqual(index[self.department.id]['term'], [('sales', 2), ('engineering', 1)])
+        # Values are kept up to VALUE_TALLY_LIMIT whatever the term limit
+        self.assertEqual(index[self.department.id]['value'], [('sales', 2), ('engineering', 1), ('support', 1)])
+        self.assertEqual(index[self.department.id]['distinct_values'], 3)
+
+    def test_changing_the_question_type_recounts_its_terms(self):
+        self.respond('Sales', 'Coffee machine broken')
+        self.department.question_type = 'long_text'
+        self.department.save()
+        self.assertFalse(TextTermCount.objects.filter(question=self.department, kind='value').exists())
+        self.assertEqual(check_text_index(self.form_obj), {})
+
+        self.feedback.question_type = 'date'
+        self.feedback.save()
+        self.assertFalse(TextTermCount.objects.filter(question=self.feedback).exists())
+        self.assertEqual(check_text_index(self.form_obj), {})
+
+    def test_large_batches_are_applied_in_chunks(self):
+        with mock.patch('forms.counters.UPDATE_CHUNK_SIZE', 3):
+            self.respond('Sales', 'one two three four five six seven eight')
+            self.respond('Sales', 'two three four')
+        self.assertEqual(check_text_index(self.form_obj), {})
+        self.assertEqual(TextTermCount.objects.get(question=self.feedback, kind='term', term='three').count, 2)
+
+    def test_rebuild_restores_the_index(self):
+        self.respond('Sales', 'Coffee machine broken')
+        TextTermCount.objects.all().delete()
+        self.assertNotEqual(check_text_index(self.form_obj), {})
+
+        call_command('rebuild_analytics_counters', chunk_size=1, stdout=StringIO())
+        self.assertEqual(check_text_index(self.form_obj), {})
+
+
+@override_settings(TIME_ZONE='America/New_York')
+class ResponseTimeSeriesTests(SubmissionTestMixin, TestCase):
+
+    def setUp(self):
+        self.form_obj = self.make_form(1)
+
+    def save_at(self, *moments):
+        return save_submissions(self.form_obj, [Submission([], submitted_at=moment) for moment in moments])
+
+    def buckets(self, granularity):
+        return {
+            timezone.localtime(bucket.bucket_start).strftime('%Y-%m-%d %H:%M'): bucket.count
+            for bucket in ResponseBucket.objects.filter(form=self.form_obj, granularity=granularity, count__gt=0)
+        }
+
+    def test_buckets_follow_the_local_clock(self):
+        # 03:30 UTC on March 8th is still March 7th in New York
+        self.save_at(
+            datetime(2026, 3, 8, 3, 30, tzinfo=dt_timezone.utc),
+            datetime(2026, 3, 8, 3, 45, tzinfo=dt_timezone.utc),
+            datetime(2026, 3, 8, 15, 0, tzinfo=dt_timezone.utc),
+        )
+        self.assertEqual(self.buckets('day'), {'2026-03-07 00:00': 2, '2026-03-08 00:00': 1})
+        self.assertEqual(self.buckets('hour'), {'2026-03-07 22:00': 2, '2026-03-08 11:00': 1})
+
+    def test_deleting_a_response_and_backfill_agree(self):
+        responses = self.save_at(*[datetime(2026, 5, 1, hour, tzinfo=dt_timezone.utc) for hour in (12, 13, 13)])
+        Response.objects.get(pk=responses[0].pk).delete()
+        ingested = self.buckets('hour'), self.buckets('day')
+
+        backfill_buckets(self.form_obj)
+        self.assertEqual((self.buckets('hour'), self.buckets('day')), ingested)
+        self.assertEqual(ingested[1], {'2026-05-01 00:00': 2})
+
+    def test_series_fills_empty_buckets_across_dst(self):
+        self.save_at(datetime(2026, 3, 9, 12, tzinfo=dt_timezone.utc))
+        start = datetime(2026, 3, 7, tzinfo=timezone.get_default_timezone())
+        points = series(self.form_obj, 'day', start, start + timedelta(days=4))
+        self.assertEqual([(p.strftime('%m-%d %H:%M'), n) for p, n in points],
+                         [('03-07 00:00', 0), ('03-08 00:00', 0), ('03-09 00:00', 1), ('03-10 00:00', 0)])
+        # The night the clocks go forward has 23 hours
+        hours = series(self.form_obj, 'hour', start + timedelta(days=1), start + timedelta(days=2))
+        self.assertEqual(len(hours), 23)
+
+    def test_endpoint(self):
+        self.save_at(timezone.now(), timezone.now())
+        url = reverse('form_response_timeseries', kwargs={'form_uuid': self.form_obj.uuid})
+        self.client.force_login(self.user)
+
+        daily = self.client.get(url).json()
+        self.assertEqual(daily['total'], 2)
+        self.assertEqual(len(daily['buckets']), 30)
+        self.assertEqual(self.client.get(url, {'granularity': 'hour', 'days': 2}).json()['total'], 2)
+        self.assertEqual(self.client.get(url, {'granularity': 'hour', 'days': 365}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'granularity': 'week'}).status_code, 400)
+
+
+class CrosstabTests(SubmissionTestMixin, TestCase):
+
+    def setUp(self):
+        self.form_obj = self.make_form(4)
+        self.checkboxes = self.form_obj.questions.get(question_type='checkboxes')
+        self.choice = self.form_obj.questions.get(question_type='multiple_choice')
+        self.box_options = list(self.checkboxes.options.values_list('id', flat=True))
+        self.choice_options = list(self.choice.options.values_list('id', flat=True))
+
+    def answer(self, boxes, choice):
+        data = self.answer_all(self.form_obj)
+        data[f'question_{self.checkboxes.id}'] = [str(self.box_options[i]) for i in boxes]
+        data[f'question_{self.choice.id}'] = str(self.choice_options[choice])
+        self.submit(self.form_obj, data)
+
+    def test_counts_totals_and_percentages(self):
+        self.answer([0, 1], 0)
+        self.answer([0], 1)
+        self.answer([], 1)
+        result = build_crosstab(self.form_obj, self.checkboxes.id, self.choice.id)
+
+        self.assertEqual(result['counts'], [[1, 1, 0, 0], [1, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]])
+        self.assertEqual(result['row_totals'], [2, 1, 0, 0])
+        self.assertEqual(result['column_totals'], [2, 1, 0, 0])
+        self.assertEqual(result['row_percentages'][0], [50.0, 50.0, 0.0, 0.0])
+        self.assertEqual(result['column_percentages'][0], [50.0, 100.0, 0.0, 0.0])
+        self.assertEqual(result['columns']['labels'], ['Option 0', 'Option 1', 'Option 2', 'Option 3'])
+
+    def test_rejects_other_questions(self):
+        text = self.form_obj.questions.get(question_type='short_text')
+        with self.assertRaises(CrosstabError):
+            build_crosstab(self.form_obj, self.checkboxes.id, text.id)
+        with self.assertRaises(CrosstabError):
+            build_crosstab(self.form_obj, self.choice.id, self.choice.id)
+
+    def test_chi_square_against_known_values(self):
+        # 95th percentiles of the chi-square distribution
+        self.assertAlmostEqual(chi_square_p_value(3.841459, 1), 0.05, places=6)
+        self.assertAlmostEqual(chi_square_p_value(16.918978, 9), 0.05, places=6)
+        self.assertAlmostEqual(chi_square_p_value(0.5, 4), 1.25 * math.exp(-0.25), places=12)
+
+        stats = chi_square([[10, 20], [30, 40]])
+        self.assertAlmostEqual(stats['chi2'], 0.793650794, places=6)
+        self.assertEqual(stats['dof'], 1)
+        self.assertIsNone(chi_square([[5, 0], [0, 0]])['p_value'])
+
+    def test_deleted_options_are_left_out(self):
+        self.answer([0, 3], 2)
+        self.checkboxes.options.get(pk=self.box_options[3]).delete()
+        self.form_obj.refresh_from_db()
+        result = build_crosstab(self.form_obj, self.checkboxes.id, self.choice.id)
+        self.assertEqual(result['counts'], [[0, 0, 1, 0], [0, 0, 0, 0], [0, 0, 0, 0]])
+        self.assertEqual(fetch_codes(self.choice.id, self.choice_options[:2]), [])
+
+    @skipUnless(crosstab.np is not None, 'NumPy is not installed')
+    def test_numpy_and_python_agree(self):
+        def codes(pairs, num_options):
+            return [response_id * num_options + position for response_id, position in pairs]
+
+        rows = codes([(1, 0), (2, 2), (3, 0)], 3)
+        cols = codes([(1, 1), (2, 0), (4, 1), (5, 0)], 2)
+        # Response 6 ticked two column options (checkboxes); ids far apart take the sorted join
+        more_rows = rows + codes([(6, 1), (10 ** 9, 0)], 3)
+        more_cols = cols + codes([(6, 0), (6, 1), (10 ** 9, 0)], 2)
+        for row_codes, col_codes in ((rows, cols), (more_rows, more_cols)):
+            expected = contingency_table(row_codes, col_codes, 3, 2, use_numpy=False)
+            self.assertEqual(contingency_table(row_codes, col_codes, 3, 2, use_numpy=True), expected)
+        self.assertEqual(contingency_table(rows, cols, 3, 2), [[0, 1], [0, 0], [1, 0]])
+        self.assertEqual(contingency_table(more_rows, more_cols, 3, 2, use_numpy=False), [[1, 1], [1, 1], [1, 0]])
+
+    def test_endpoint(self):
+        self.answer([0], 0)
+        url = reverse('form_crosstab', kwargs={'form_uuid': self.form_obj.uuid})
+        self.client.force_login(self.user)
+
+        result = self.client.get(url, {'rows': self.checkboxes.id, 'cols': self.choice.id}).json()
+        self.assertEqual(result['total'], 1)
+        self.assertEqual(self.client.get(url, {'rows': self.checkboxes.id}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'rows': self.checkboxes.id, 'cols': 'x'}).status_code, 400)
+
+        other, _ = User.objects.get_or_create(username='someone-else')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(url, {'rows': self.checkboxes.id, 'cols': self.choice.id}).status_code, 404)
+
+
+class AdminChangelistTests(SubmissionTestMixin, TestCase):
+    # Queries per changelist page, whatever the number of rows
+    BUDGETS = {'form': 6, 'question': 6, 'response': 6, 'answer': 7, 'notification': 6}
+
+    def setUp(self):
+        self.form_obj = self.make_form(4)
+        self.data = self.answer_all(self.form_obj)
+        self.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        self.client.force_login(self.admin_user)
+
+    def changelist_queries(self, model_name, **params):
+        url = reverse(f'admin:forms_{model_name}_changelist')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, ctx.captured_queries
+
+    def test_query_budgets(self):
+        self.submit(self.form_obj, self.data)
+        few = {name: len(self.changelist_queries(name)[1]) for name in self.BUDGETS}
+        for _ in range(10):
+            self.submit(self.form_obj, self.data)
+        for i in range(5):
+            self.make_form(4)
+        for name, budget in self.BUDGETS.items():
+            queries = len(self.changelist_queries(name)[1])
+            self.assertEqual(queries, few[name], name)
+            self.assertLessEqual(queries, budget, name)
+
+    def test_form_filter_uses_autocomplete(self):
+        other = Form.objects.create(user=self.user, title='Other survey')
+        self.submit(self.form_obj, self.data)
+        response, _ = self.changelist_queries('response', form__id__exact=self.form_obj.pk)
+        self.assertEqual(list(response.context['cl'].result_list), list(self.form_obj.responses.all()))
+        content = response.content.decode()
+        self.assertIn('data-lookup="form__id__exact"', content)
+        self.assertIn(f'<option value="{self.form_obj.pk}" selected>Survey</option>', content)
+        self.assertNotIn(other.title, content)
+
+        other_survey = self.make_form(2)
+        self.submit(other_survey, self.answer_all(other_survey))
+        response, _ = self.changelist_queries('answer', response__form__id__exact=self.form_obj.pk)
+        answers = list(response.context['cl'].result_list)
+        self.assertEqual({answer.response.form_id for answer in answers}, {self.form_obj.pk})
+        self.assertEqual(len(answers), Answer.objects.filter(response__form=self.form_obj).count())
+
+    def test_invalid_form_filter_redirects(self):
+        for model_name, lookup in (('response', 'form__id__exact'), ('answer', 'response__form__id__exact')):
+            url = reverse(f'admin:forms_{model_name}_changelist')
+            response = self.client.get(url, {lookup: 'abc'})
+            self.assertRedirects(response, f'{url}?e=1', fetch_redirect_response=False)
+
+    def test_large_tables_are_not_counted(self):
+        for _ in range(3):
+            self.submit(self.form_obj, self.data)
+        max_id = Answer.objects.order_by('-id').values_list('id', flat=True).first()
+        self.assertEqual(estimated_row_count(Answer), max_id)
+
+        with mock.patch.object(pagination, 'ESTIMATED_COUNT_THRESHOLD', 1):
+            response, queries = self.changelist_queries('answer')
+        self.assertEqual(response.context['cl'].result_count, max_id)
+        self.assertFalse([q for q in queries if 'COUNT(' in q['sql'] and 'FROM "forms_answer"' in q['sql']])
+
+        with mock.patch.object(pagination, 'MAX_FILTERED_COUNT', 2):
+            paginator = EstimatedCountPaginator(Response.objects.filter(form=self.form_obj).order_by('id'), 100)
+            self.assertEqual(paginator.count, 2)
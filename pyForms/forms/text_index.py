@@ -0,0 +1,206 @@
+"""Term, bigram and value frequencies for free-text answers
+
+Each short_text/long_text answer is tokenized when it is saved and counted
+once per distinct term and bigram it contains; short answers are also
+counted as whole values, which gives exact tallies for questions like
+"department". Deleting a response or an answer takes it back out, changing
+a question's type recounts that question, and rebuild_text_index
+recomputes a form from a streaming pass over Answer.
+"""
+import re
+from collections import Counter
+from django.db import connections, transaction
+from django.db.models import Count, Q
+from .counters import apply_counts
+from .models import Answer, Question, TextTermCount
+
+TEXT_QUESTION_TYPES = ('short_text', 'long_text')
+
+# Longest term or value stored; anything longer is cut (terms) or skipped (values)
+MAX_TERM_LENGTH = 100
+
+# Cap on distinct terms taken from one answer, so a pasted essay stays cheap
+MAX_TERMS_PER_ANSWER = 200
+
+# Value tallies are shown when a short_text question has at most this many distinct answers
+VALUE_TALLY_LIMIT = 25
+
+TOP_TERMS = 10
+
+STOP_WORDS = frozenset('''
+a about an and are as at be been but by can could did do does for from had has have he her his how i if in into is it
+its just me my no not of on or our she so than that the their them then there these they this to too us was we were
+what when which who will with would you your
+'''.split())
+
+WORD_RE = re.compile(r"\w[\w'-]*")
+
+
+def tokenize(text):
+    """Lowercased words of a text, without stop words and single characters"""
+    words = (word.strip("'-") for word in WORD_RE.findall(text.casefold()))
+    return [word[:MAX_TERM_LENGTH] for word in words if len(word) > 1 and word not in STOP_WORDS]
+
+
+def normalize_value(text):
+    return ' '.join(text.split()).casefold()
+
+
+def answer_terms(question_type, answer_text):
+    """The distinct (kind, term) pairs one answer contributes"""
+    if question_type not in TEXT_QUESTION_TYPES or not answer_text:
+        return set()
+
+    words = tokenize(answer_text)
+    terms = {('term', word) for word in words[:MAX_TERMS_PER_ANSWER]}
+    terms.update(
+        ('bigram', f'{first} {second}'[:MAX_TERM_LENGTH])
+        for first, second in list(zip(words, words[1:]))[:MAX_TERMS_PER_ANSWER]
+    )
+    if question_type == 'short_text':
+        value = normalize_value(answer_text)
+        if value and len(value) <= MAX_TERM_LENGTH:
+            terms.add(('value', value))
+    return terms
+
+
+def term_deltas(answers, sign=1):
+    """Counter of (question id, kind, term) -> n for (question id, question type, answer text) triples"""
+    deltas = Counter()
+    for question_id, question_type, answer_text in answers:
+        for kind, term in answer_terms(question_type, answer_text):
+            deltas[question_id, kind, term] += sign
+    return deltas
+
+
+def apply_term_deltas(deltas):
+    apply_counts(TextTermCount, ('question_id', 'kind', 'term'), deltas)
+
+
+def removed_term_deltas(answers):
+    """Counter taking the text answers of an Answer queryset back out of the index"""
+    answers = (
+        answers
+        .filter(question__question_type__in=TEXT_QUESTION_TYPES)
+        .values_list('question_id', 'question__question_type', 'answer_text')
+    )
+    return term_deltas(answers, sign=-1)
+
+
+def response_term_deltas(responses):
+    """Counter taking the text answers of a Response queryset back out of the index"""
+    return removed_term_deltas(Answer.objects.filter(response__in=responses))
+
+
+def recount_terms(form_obj, chunk_size=2000, question=None):
+    """Index contents computed from Answer in one streaming pass
+
+    Memory grows with the vocabulary, not with the number of answers.
+    """
+    answers = Answer.objects.filter(question__form=form_obj)
+    if question is not None:
+        answers = answers.filter(question=question)
+    answers = (
+        answers
+        .filter(question__question_type__in=TEXT_QUESTION_TYPES)
+        .exclude(Q(answer_text__isnull=True) | Q(answer_text=''))
+        .values_list('question_id', 'question__question_type', 'answer_text')
+        .iterator(chunk_size=chunk_size)
+    )
+    return term_deltas(answers)
+
+
+def stored_terms(form_obj):
+    return Counter({
+        (question_id, kind, term): count
+        for question_id, kind, term, count in TextTermCount.objects.filter(question__form=form_obj, count__gt=0)
+        .values_list('question_id', 'kind', 'term', 'count')
+    })
+
+
+def check_text_index(form_obj, chunk_size=2000):
+    """Differences between the stored index and a recount, as {(question id, kind, term): (stored, actual)}"""
+    stored = stored_terms(form_obj)
+    actual = recount_terms(form_obj, chunk_size)
+    return {
+        key: (stored.get(key, 0), actual.get(key, 0))
+        for key in stored.keys() | actual.keys()
+        if stored.get(key, 0) != actual.get(key, 0)
+    }
+
+
+def rebuild_text_index(form_obj, chunk_size=2000, question=None):
+    """Replace the form's term counts, or only one question's, with a recount"""
+    counts = recount_terms(form_obj, chunk_size, question)
+    stored = TextTermCount.objects.filter(question__form=form_obj)
+    if question is not None:
+        stored = stored.filter(question=question)
+    with transaction.atomic():
+        stored.delete()
+        TextTermCount.objects.bulk_create(
+            [
+                TextTermCount(question_id=question_id, kind=kind, term=term, count=count)
+                for (question_id, kind, term), count in counts.items()
+            ],
+            batch_size=1000,
+        )
+
+
+def top_terms(form_obj, limit=TOP_TERMS):
+    """The most frequent terms, bigrams and values of every text question (three queries)
+
+    Returns {question id: {'term': [(term, count)], 'bigram': [...], 'value': [...],
+    'distinct_values': n}}. Each top-N list is one ORDER BY count DESC LIMIT n
+    read straight off the (question, kind, -count) index, and the lists are
+    fetched together in one UNION ALL, so their cost does not grow with the
+    vocabulary. distinct_values is not a stored number: it is a COUNT over
+    the question's value rows, read from the same index, so that third query
+    grows with the number of distinct short answers.
+    """
+    questions = list(
+        Question.objects
+        .filter(form=form_obj, question_type__in=TEXT_QUESTION_TYPES)
+        .order_by()
+        .values_list('id', 'question_type')
+    )
+    parts = []
+    for question_id, question_type in questions:
+        kinds = [('term', limit), ('bigram', limit)]
+        if question_type == 'short_text':
+            kinds.append(('value', max(limit, VALUE_TALLY_LIMIT)))
+        for kind, n in kinds:
+            top = (
+                TextTermCount.objects
+                .filter(question_id=question_id, kind=kind, count__gt=0)
+                .order_by('-count', 'term')
+                .values_list('question_id', 'kind', 'term', 'count')[:n]
+            )
+            parts.append(top.query.sql_with_params())
+
+    index = {
+        question_id: {'term': [], 'bigram': [], 'value': [], 'distinct_values': 0}
+        for question_id, _ in questions
+    }
+    if not parts:
+        return index
+    # Compound statements cannot carry a LIMIT per part on every backend,
+    # so each part is wrapped as a derived table
+    sql = ' UNION ALL '.join(f'SELECT * FROM ({part_sql}) AS top_{i}' for i, (part_sql, _) in enumerate(parts))
+    params = [param for _, part_params in parts for param in part_params]
+    with connections[TextTermCount.objects.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    for question_id, kind, term, count in sorted(rows, key=lambda row: (row[0], row[1], -row[3], row[2])):
+        index[question_id][kind].append((term, count))
+
+    distinct = (
+        TextTermCount.objects
+        .filter(question__form=form_obj, kind='value', count__gt=0)
+        .values('question_id')
+        .annotate(n=Count('id'))
+        .order_by()
+    )
+    for row in distinct:
+        if row['question_id'] in index:
+            index[row['question_id']]['distinct_values'] = row['n']
+    return index
@@ -0,0 +1,92 @@
+"""Per-form response counts by hour and by day
+
+Buckets follow the wall clock of settings.TIME_ZONE, so a "day" is a local
+day even across DST changes. Counts are added as responses are saved and
+taken back out when they are deleted; backfill_buckets rebuilds a form from
+Response.submitted_at.
+"""
+from collections import Counter
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from .counters import apply_counts
+from .models import Response, ResponseBucket
+
+GRANULARITIES = ('hour', 'day')
+
+# Longest range the endpoint will serve at each granularity
+MAX_RANGE_DAYS = {'hour': 31, 'day': 3 * 366}
+
+
+def bucket_start(moment, granularity, tz=None):
+    """Start of the local hour or day containing `moment`"""
+    local = timezone.localtime(moment, tz or timezone.get_default_timezone())
+    if granularity == 'hour':
+        return local.replace(minute=0, second=0, microsecond=0)
+    return local.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_bucket(start, granularity, tz=None):
+    if granularity == 'hour':
+        # Step in UTC: wall-clock arithmetic would land on skipped DST hours
+        return bucket_start(start.astimezone(dt_timezone.utc) + timedelta(hours=1), granularity, tz)
+    local_day = timezone.localtime(start, tz or timezone.get_default_timezone()).date() + timedelta(days=1)
+    return datetime.combine(local_day, time(0), tzinfo=tz or timezone.get_default_timezone())
+
+
+def bucket_deltas(form_id, moments, sign=1):
+    """Counter of (form id, granularity, bucket start) -> n"""
+    deltas = Counter()
+    for moment in moments:
+        for granularity in GRANULARITIES:
+            deltas[form_id, granularity, bucket_start(moment, granularity)] += sign
+    return deltas
+
+
+def apply_bucket_deltas(deltas):
+    apply_counts(ResponseBucket, ('form_id', 'granularity', 'bucket_start'), deltas)
+
+
+def backfill_buckets(form_obj):
+    """Rebuild a form's buckets by grouping its responses in the database"""
+    tz = timezone.get_default_timezone()
+    buckets = []
+    for granularity in GRANULARITIES:
+        rows = (
+            Response.objects
+            .filter(form=form_obj)
+            .annotate(bucket=Trunc('submitted_at', granularity, tzinfo=tz))
+            .values('bucket')
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+        buckets.extend(
+            ResponseBucket(form=form_obj, granularity=granularity, bucket_start=row['bucket'], count=row['count'])
+            for row in rows
+        )
+    with transaction.atomic():
+        ResponseBucket.objects.filter(form=form_obj).delete()
+        ResponseBucket.objects.bulk_create(buckets, batch_size=1000)
+    return len(buckets)
+
+
+def series(form_obj, granularity, start, end):
+    """[(bucket start, count)] for every bucket in [start, end), zeros included
+
+    Reads one row per non-empty bucket: at most 744 for a month of hours or
+    366 for a year of days.
+    """
+    tz = timezone.get_default_timezone()
+    current = bucket_start(start, granularity, tz)
+    counts = dict(
+        ResponseBucket.objects
+        .filter(form=form_obj, granularity=granularity, bucket_start__gte=current, bucket_start__lt=end)
+        .values_list('bucket_start', 'count')
+    )
+    points = []
+    while current < end:
+        points.append((current, counts.get(current, 0)))
+        current = next_bucket(current, granularity, tz)
+    return points
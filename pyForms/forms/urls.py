@@ -21,10 +21,20 @@ urlpatterns = [
     
     # CRITICAL: Public form access (MUST be accessible to anonymous users)
     path('form/<uuid:form_uuid>/', views.form_public_view, name='form_public_view'),
+    path('stats/page-cache/', views.form_page_cache_stats, name='form_page_cache_stats'),
     
     # Response management (ONLY for form owner)
     path('responses/<uuid:form_uuid>/', views.view_responses, name='view_responses'),
+    path('responses/<uuid:form_uuid>/export/<str:export_format>/', views.export_responses, name='export_responses'),
+    path('responses/<uuid:form_uuid>/export/<str:export_format>/jobs/', views.start_export_job, name='start_export_job'),
+    path('responses/<uuid:form_uuid>/files/', views.export_answer_files, name='export_answer_files'),
+    path('exports/<int:job_id>/', views.export_job_status, name='export_job_status'),
+    path('exports/<int:job_id>/download/', views.export_job_download, name='export_job_download'),
     path('analytics/<uuid:form_uuid>/', views.form_analytics, name='form_analytics'),
+    path('analytics/<uuid:form_uuid>/data/', views.form_analytics_api, name='form_analytics_api'),
+    path('analytics/<uuid:form_uuid>/scale-stats/', views.form_scale_stats, name='form_scale_stats'),
+    path('analytics/<uuid:form_uuid>/timeseries/', views.form_response_timeseries, name='form_response_timeseries'),
+    path('analytics/<uuid:form_uuid>/crosstab/', views.form_crosstab, name='form_crosstab'),
     
     # Theme toggle
     path('toggle-dark-mode/', views.toggle_dark_mode, name='toggle_dark_mode'),
@@ -1,22 +1,36 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
-from django.core.mail import send_mail
+from django.http import JsonResponse, HttpResponse, Http404, StreamingHttpResponse, FileResponse
 from django.conf import settings
 from django.utils import timezone
+from django.utils.text import slugify
 from django.db.models import Count, Q
-from django.core.paginator import Paginator
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import condition, require_http_methods
 from django.urls import reverse
 from django import forms
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Layout, Fieldset, Submit, ButtonHolder, HTML
 from crispy_forms.bootstrap import FormActions
-from datetime import date
+from datetime import timedelta
+from urllib.parse import urlencode
 import json
-from .models import Form, Question, Option, Response, Answer, Change
+from .models import Form, Question, Option, ExportJob
+from . import spool
+from .analytics import analytics_etag, cached_analytics_data, scale_stats_data
+from .crosstab import CrosstabError, build_crosstab
+from .dashboard import dashboard_stats
+from .export_jobs import byte_range, job_file, job_status, request_export
+from .exports import EXPORT_FORMATS, iter_responses, stream_answer_files
+from .pagination import MAX_FILTERED_COUNT, capped_count, keyset_page
+from .page_cache import evict_form_page, get_form_page, page_cache_stats, warm_form_page
+from .response_grid import build_response_grid
+from .schema import CHOICE_QUESTION_TYPES, get_form_schema, invalidate_form_schema
+from .search import ResponseFilters, search_responses
+from .submissions import parse_submission, save_submission
+from .timeseries import GRANULARITIES, MAX_RANGE_DAYS, next_bucket, series
 
 try:
     from accounts.models import UserProfile
@@ -78,25 +92,21 @@ def dashboard(request):
     user_forms = (
         Form.objects
         .filter(user=request.user)
-        .annotate(num_responses=Count('responses'))
+        .annotate(num_questions=Count('questions'))
         .order_by('-created_at')
     )
 
     # Pagination
-    paginator = Paginator(user_forms, 12)
-    page_number = request.GET.get('page')
-    forms = paginator.get_page(page_number)
+    forms = keyset_page(user_forms, 'created_at', request.GET.get('cursor'), 12)
     
-    # Statistics
-    total_forms = user_forms.count()
-    total_responses = sum(form.num_responses for form in user_forms)
-    published_forms = user_forms.filter(is_published=True).count()
+    # Statistics, from the user's stored totals
+    stats = dashboard_stats(request.user)
     
     context = {
         'forms': forms,
-        'total_forms': total_forms,
-        'total_responses': total_responses,
-        'published_forms': published_forms,
+        'total_forms': stats.total_forms,
+        'total_responses': stats.total_responses,
+        'published_forms': stats.published_forms,
     }
     return render(request, 'forms/dashboard.html', context)
 
@@ -164,6 +174,7 @@ def update_form_settings(request, form_uuid):
         if 'send_email_notifications' in data:
             form_obj.send_email_notifications = str(data['send_email_notifications']).lower() == 'true'
         
+        invalidate_form_schema(form_obj)
         form_obj.save()
         
         return JsonResponse({
@@ -213,6 +224,9 @@ def add_question(request, form_uuid):
                         order=i
                     )
 
+        invalidate_form_schema(form_obj)
+        form_obj.save(update_fields=['updated_at'])
+
         return JsonResponse({
             'success': True,
             'question_id': question.id,
@@ -229,7 +243,7 @@ def add_question(request, form_uuid):
 @require_http_methods(["POST", "PUT"])
 def update_question(request, question_id):
     """Update a question via AJAX"""
-    question = get_object_or_404(Question, id=question_id, form__user=request.user)
+    question = get_object_or_404(Question.objects.select_related('form'), id=question_id, form__user=request.user)
     
     try:
         data = json.loads(request.body)
@@ -255,6 +269,9 @@ def update_question(request, question_id):
                         order=i
                     )
 
+        invalidate_form_schema(question.form)
+        question.form.save(update_fields=['updated_at'])
+
         return JsonResponse({
             'success': True,
             'message': 'Question updated successfully!'
@@ -270,10 +287,13 @@ def update_question(request, question_id):
 @require_http_methods(["DELETE"])
 def delete_question(request, question_id):
     """Delete a question via AJAX"""
-    question = get_object_or_404(Question, id=question_id, form__user=request.user)
+    question = get_object_or_404(Question.objects.select_related('form'), id=question_id, form__user=request.user)
     
     try:
+        form_obj = question.form
         question.delete()
+        invalidate_form_schema(form_obj)
+        form_obj.save(update_fields=['updated_at'])
         return JsonResponse({
             'success': True,
             'message': 'Question deleted successfully!'
@@ -288,9 +308,14 @@ def delete_question(request, question_id):
 def publish_form(request, form_uuid):
     """Publish/unpublish form"""
     form_obj = get_object_or_404(Form, uuid=form_uuid, user=request.user)
+    evict_form_page(form_obj)
     form_obj.is_published = not form_obj.is_published
     form_obj.save()
     
+    # Pre-render the public page so the first respondents hit the cache
+    if form_obj.is_published:
+        warm_form_page(form_obj)
+    
     status = 'published' if form_obj.is_published else 'unpublished'
     messages.success(request, f'Form {status} successfully!')
     return redirect('edit_form', form_uuid=form_uuid)
@@ -307,89 +332,22 @@ def form_public_view(request, form_uuid):
     if not form_obj.is_open:
         return render(request, 'forms/form_closed.html', {'form': form_obj})
     
-    questions = form_obj.questions.all().order_by('order')
-    
     if request.method == 'POST':
+        # Compiled once per form version; no schema queries on a cache hit
+        schema = get_form_schema(form_obj)
+        questions = schema.questions
+        
         try:
-            # Create response (works for both anonymous and logged-in users)
-            response = Response.objects.create(
-                form=form_obj,
-                respondent_email=request.POST.get('respondent_email', '') if form_obj.collect_email else None,
-                respondent_name=request.POST.get('respondent_name', ''),
-                ip_address=request.META.get('REMOTE_ADDR'),
-                user_agent=request.META.get('HTTP_USER_AGENT', ''),
-            )
-
-            # Process each question's answer
-            for question in questions:
-                field_name = f'question_{question.id}'
-                
-                if question.question_type in ['multiple_choice', 'dropdown']:
-                    if field_name in request.POST and request.POST[field_name]:
-                        try:
-                            option = Option.objects.get(id=request.POST[field_name])
-                            answer = Answer.objects.create(response=response, question=question)
-                            answer.selected_options.add(option)
-                        except Option.DoesNotExist:
-                            pass
-                
-                elif question.question_type == 'checkboxes':
-                    option_ids = request.POST.getlist(field_name)
-                    if option_ids:
-                        answer = Answer.objects.create(response=response, question=question)
-                        for option_id in option_ids:
-                            try:
-                                option = Option.objects.get(id=option_id)
-                                answer.selected_options.add(option)
-                            except Option.DoesNotExist:
-                                pass
-                
-                elif question.question_type == 'file_upload':
-                    if field_name in request.FILES:
-                        Answer.objects.create(
-                            response=response,
-                            question=question,
-                            file_upload=request.FILES[field_name]
-                        )
-                
-                else:  # Text-based answers (short_text, long_text, date, time, linear_scale)
-                    if field_name in request.POST and request.POST[field_name].strip():
-                        Answer.objects.create(
-                            response=response,
-                            question=question,
-                            answer_text=request.POST[field_name].strip()
-                        )
-
-            # NEW: Handle Change model - get date from form or use current date
-            change_date_value = request.POST.get('change_date', '')
-            if change_date_value:
-                # User provided a date, parse it
-                from datetime import datetime
-                try:
-                    parsed_date = datetime.strptime(change_date_value, '%Y-%m-%d').date()
-                    Change.objects.create(change_date=parsed_date)
-                    print(f"Change record created with user-selected date: {parsed_date}")  # Debug
-                except ValueError:
-                    # Invalid date format, use current date
-                    Change.objects.create(change_date=date.today())
-                    print(f"Invalid date format, created change with current date: {date.today()}")  # Debug
+            # Validate in memory, then write everything in one transaction.
+            # The response, its daily change count and the owner's notification are
+            # saved together; `manage.py send_notifications` delivers the email.
+            submission = parse_submission(form_obj, schema, request.POST, request.FILES, request.META)
+            responses_url = request.build_absolute_uri(reverse("view_responses", kwargs={"form_uuid": form_obj.uuid}))
+            if spool.accepts(submission):
+                # Burst mode: append to the local spool, flushed in batches later
+                spool.append(form_obj, submission, responses_url)
             else:
-                # No date provided, use current date
-                Change.objects.create(change_date=date.today())
-                print(f"No date provided, created change with current date: {date.today()}")  # Debug
-
-            # Send email notification to form owner
-            if form_obj.send_email_notifications and form_obj.user.email:
-                try:
-                    send_mail(
-                        subject=f'New Response: {form_obj.title}',
-                        message=f'You have received a new response for your form "{form_obj.title}".\n\nView responses: {request.build_absolute_uri(reverse("view_responses", kwargs={"form_uuid": form_obj.uuid}))}',
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        recipient_list=[form_obj.user.email],
-                        fail_silently=True,
-                    )
-                except:
-                    pass  # Fail silently if email sending fails
+                save_submission(form_obj, submission, responses_url)
 
             return render(request, 'forms/form_submitted.html', {'form': form_obj})
             
@@ -401,94 +359,215 @@ def form_public_view(request, form_uuid):
                 'error': 'There was an error submitting your response. Please try again.'
             })
     
-    # GET request - show the form
-    context = {
-        'form': form_obj,
-        'questions': questions,
-    }
-    return render(request, 'forms/form_public.html', context)
+    # GET request - served from the rendered page cache
+    return HttpResponse(get_form_page(request, form_obj))
 
 @login_required
 def view_responses(request, form_uuid):
     """View form responses - ONLY for form owner"""
     form_obj = get_object_or_404(Form, uuid=form_uuid, user=request.user)
-    responses = form_obj.responses.all().order_by('-submitted_at')
+    filters = ResponseFilters.from_query(request.GET)
+    responses = search_responses(form_obj, filters) if filters else form_obj.responses.all()
     
     # Pagination
-    paginator = Paginator(responses, 20)
-    page_number = request.GET.get('page')
-    responses_page = paginator.get_page(page_number)
+    responses_page = keyset_page(responses, 'submitted_at', request.GET.get('cursor'), 20)
+    # A broad search over a large form is not counted to the end
+    matching_responses = capped_count(responses, MAX_FILTERED_COUNT) if filters else None
     
-    questions = form_obj.questions.all().order_by('order')
+    questions = get_form_schema(form_obj).questions
     
     context = {
         'form': form_obj,
         'responses': responses_page,
+        'rows': build_response_grid(responses_page, questions),
         'questions': questions,
-        'total_responses': responses.count(),
+        'choice_questions': [question for question in questions if question.question_type in CHOICE_QUESTION_TYPES],
+        'filters': filters,
+        'filter_query': urlencode(filters.query_params()),
+        'export_formats': [(name, export.label) for name, export in EXPORT_FORMATS.items()],
+        'export_jobs': [job_status(job) for job in form_obj.export_jobs.exclude(status='failed')[:5]],
+        'has_file_questions': any(question.question_type == 'file_upload' for question in questions),
+        'matching_responses': matching_responses,
+        'matching_capped': matching_responses == MAX_FILTERED_COUNT,
+        'total_responses': form_obj.response_count,
     }
     return render(request, 'forms/view_responses.html', context)
 
 @login_required
-def form_analytics(request, form_uuid):
-    """Form analytics and statistics - ONLY for form owner"""
+def export_responses(request, form_uuid, export_format):
+    """Download responses (optionally filtered) as a streamed file, e.g. CSV or Parquet - ONLY for form owner"""
     form_obj = get_object_or_404(Form, uuid=form_uuid, user=request.user)
-    questions = form_obj.questions.all().order_by('order')
+    if export_format not in EXPORT_FORMATS:
+        raise Http404('Unknown export format')
+    export = EXPORT_FORMATS[export_format]
     
-    analytics_data = {}
+    filters = ResponseFilters.from_query(request.GET)
+    responses = iter_responses(form_obj, search_responses(form_obj, filters) if filters else None, typed=export.typed)
     
-    for question in questions:
-        if question.question_type in ['multiple_choice', 'dropdown', 'checkboxes']:
-            # Get option counts
-            option_counts = {}
-            for option in question.options.all():
-                count = Answer.objects.filter(
-                    question=question,
-                    selected_options=option
-                ).count()
-                option_counts[option.text] = count
-            
-            analytics_data[question.id] = {
-                'type': 'chart',
-                'question': question.text,
-                'data': option_counts
-            }
-        
-        elif question.question_type == 'linear_scale':
-            # Get scale counts
-            scale_counts = {}
-            scale_min = question.scale_min or 1
-            scale_max = question.scale_max or 5
-            
-            for i in range(scale_min, scale_max + 1):
-                count = Answer.objects.filter(
-                    question=question,
-                    answer_text=str(i)
-                ).count()
-                scale_counts[str(i)] = count
-            
-            analytics_data[question.id] = {
-                'type': 'chart',
-                'question': question.text,
-                'data': scale_counts
-            }
-        
-        else:
-            # Text responses
-            answers = Answer.objects.filter(question=question).exclude(answer_text__isnull=True).exclude(answer_text='').values_list('answer_text', flat=True)
-            analytics_data[question.id] = {
-                'type': 'text',
-                'question': question.text,
-                'answers': list(answers)[:10]  # Show first 10 responses
-            }
+    response = StreamingHttpResponse(
+        export.stream(form_obj, get_form_schema(form_obj).questions, responses),
+        content_type=export.content_type,
+    )
+    response['Content-Disposition'] = f'attachment; filename="{slugify(form_obj.title) or "form"}-responses.{export.extension}"'
+    return response
+
+@login_required
+def export_answer_files(request, form_uuid):
+    """Download every uploaded file as a streamed ZIP, optionally with manifest.csv - ONLY for form owner"""
+    form_obj = get_object_or_404(Form, uuid=form_uuid, user=request.user)
+    filters = ResponseFilters.from_query(request.GET)
+    response = StreamingHttpResponse(
+        stream_answer_files(
+            form_obj,
+            search_responses(form_obj, filters) if filters else None,
+            manifest=request.GET.get('manifest') == '1',
+        ),
+        content_type='application/zip',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{slugify(form_obj.title) or "form"}-files.zip"'
+    return response
+
+@login_required
+@require_http_methods(["POST"])
+def start_export_job(request, form_uuid, export_format):
+    """Queue a background export of all responses, or hand back the one still current - ONLY for form owner"""
+    form_obj = get_object_or_404(Form, uuid=form_uuid, user=request.user)
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'success': False, 'message': 'Unknown export format'}, status=400)
+    job, reused = request_export(form_obj, export_format)
+    return JsonResponse({'success': True, 'reused': reused, 'job': job_status(job)}, status=200 if reused else 202)
+
+@login_required
+def export_job_status(request, job_id):
+    """Progress of a background export, polled by the responses page"""
+    job = get_object_or_404(ExportJob, pk=job_id, form__user=request.user)
+    return JsonResponse(job_status(job))
+
+def _file_range(file, first, last, block_size=64 * 1024):
+    try:
+        file.seek(first)
+        remaining = last - first + 1
+        while remaining > 0:
+            data = file.read(min(block_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+    finally:
+        file.close()
+
+@login_required
+def export_job_download(request, job_id):
+    """A finished export file; supports single byte ranges so interrupted downloads can resume"""
+    job = get_object_or_404(ExportJob, pk=job_id, form__user=request.user, status='done')
+    path = job_file(job)
+    if path is None or not path.exists():
+        raise Http404('Export file is gone')
+    size = path.stat().st_size
+    etag = f'"export-{job.pk}-{size}"'
+    export = EXPORT_FORMATS.get(job.export_format)
+    content_type = export.content_type if export else 'application/octet-stream'
+    filename = f'{slugify(job.form.title) or "form"}-responses{path.suffix}'
+    
+    # A Range is only honoured while If-Range (when sent) still names this file
+    if_range = request.headers.get('If-Range')
+    try:
+        requested = byte_range(request.headers.get('Range'), size) if if_range in (None, etag) else None
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    
+    if requested is None:
+        response = FileResponse(path.open('rb'), as_attachment=True, filename=filename, content_type=content_type)
+    else:
+        first, last = requested
+        response = StreamingHttpResponse(_file_range(path.open('rb'), first, last), status=206,
+                                         content_type=content_type)
+        response['Content-Range'] = f'bytes {first}-{last}/{size}'
+        response['Content-Length'] = last - first + 1
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    return response
+
+@login_required
+def form_analytics(request, form_uuid):
+    """Form analytics and statistics - ONLY for form owner"""
+    form_obj = get_object_or_404(Form, uuid=form_uuid, user=request.user)
+    analytics_data = cached_analytics_data(form_obj)
+    choice_questions = [
+        question for question in get_form_schema(form_obj).questions
+        if question.question_type in CHOICE_QUESTION_TYPES
+    ]
     
     context = {
         'form': form_obj,
         'analytics_data': analytics_data,
+        'choice_questions': choice_questions,
         'total_responses': form_obj.response_count,
     }
     return render(request, 'forms/analytics.html', context)
 
+def _analytics_etag(request, form_uuid):
+    form_obj = Form.objects.filter(uuid=form_uuid, user=request.user).first()
+    return analytics_etag(form_obj) if form_obj else None
+
+@login_required
+@condition(etag_func=_analytics_etag)
+def form_analytics_api(request, form_uuid):
+    """Form analytics as JSON, with an ETag for conditional polling - ONLY for form owner"""
+    form_obj = get_object_or_404(Form, uuid=form_uuid, user=request.user)
+    return JsonResponse({
+        'success': True,
+        'total_responses': form_obj.response_count,
+        'questions': cached_analytics_data(form_obj),
+    })
+
+@login_required
+def form_scale_stats(request, form_uuid):
+    """Mean, median, spread and NPS buckets for each linear scale question - ONLY for form owner"""
+    form_obj = get_object_or_404(Form, uuid=form_uuid, user=request.user)
+    return JsonResponse({'questions': scale_stats_data(form_obj)})
+
+@login_required
+def form_crosstab(request, form_uuid):
+    """Cross-tabulate two choice questions, with chi-square - ONLY for form owner"""
+    form_obj = get_object_or_404(Form, uuid=form_uuid, user=request.user)
+    try:
+        crosstab = build_crosstab(form_obj, int(request.GET.get('rows', '')), int(request.GET.get('cols', '')))
+    except ValueError as e:
+        message = str(e) if isinstance(e, CrosstabError) else 'rows and cols must be question ids'
+        return JsonResponse({'success': False, 'message': message}, status=400)
+    return JsonResponse({'success': True, **crosstab})
+
+@login_required
+def form_response_timeseries(request, form_uuid):
+    """Responses per hour or per day, in settings.TIME_ZONE - ONLY for form owner"""
+    form_obj = get_object_or_404(Form, uuid=form_uuid, user=request.user)
+    granularity = request.GET.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        return JsonResponse({'success': False, 'message': 'granularity must be "hour" or "day"'}, status=400)
+    try:
+        days = int(request.GET.get('days', 7 if granularity == 'hour' else 30))
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'days must be a number'}, status=400)
+    if not 1 <= days <= MAX_RANGE_DAYS[granularity]:
+        return JsonResponse({
+            'success': False,
+            'message': f'days must be between 1 and {MAX_RANGE_DAYS[granularity]} for {granularity} buckets',
+        }, status=400)
+
+    end = next_bucket(timezone.now(), 'day')
+    points = series(form_obj, granularity, end - timedelta(days=days), end)
+    return JsonResponse({
+        'success': True,
+        'granularity': granularity,
+        'time_zone': settings.TIME_ZONE,
+        'total': sum(count for _, count in points),
+        'buckets': [{'start': start.isoformat(), 'count': count} for start, count in points],
+    })
+
 @login_required
 def delete_form(request, form_uuid):
     """Delete a form"""
@@ -531,6 +610,11 @@ def get_user_theme(request):
             pass
     return {'dark_mode': False}
 
+@staff_member_required
+def form_page_cache_stats(request):
+    """Hit/miss counters for the public form page cache"""
+    return JsonResponse(page_cache_stats())
+
 # Context processor for theme
 def theme_context(request):
     return get_user_theme(request)
@@ -149,4 +149,17 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 # EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 # EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 
-DEFAULT_FROM_EMAIL = 'pyForms <noreply@pyforms.com>'
\ No newline at end of file
+DEFAULT_FROM_EMAIL = 'pyForms <noreply@pyforms.com>'
+
+# Write-behind submission spool (see forms/spool.py). When enabled, public
+# submissions are appended to a local WAL-mode SQLite file and written to the
+# main database by `python manage.py flush_submission_spool --loop`.
+SUBMISSION_SPOOL_ENABLED = False
+SUBMISSION_SPOOL_PATH = BASE_DIR / 'spool' / 'submissions.sqlite3'
+
+# Background exports (see forms/export_jobs.py), written to EXPORT_ROOT by
+# `python manage.py run_export_jobs --loop`. At most EXPORT_MAX_WORKERS run at
+# once, however many runners are started, so exports cannot starve
+# submission traffic.
+EXPORT_ROOT = BASE_DIR / 'exports'
+EXPORT_MAX_WORKERS = 2
\ No newline at end of file